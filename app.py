@@ -8,11 +8,14 @@ import pandas as pd
 from datetime import datetime, timedelta
 from modules.drive_manager import DriveManager
 from modules.file_processor import FileProcessor
+from modules.master_query import FiltroMaster, get_master_query_engine
+from modules.master_store import get_master_cache
+from modules.report_generator import (
+    build_cached_excel_report, build_cached_export, fingerprint_hojas, get_cached_excel_report, get_cached_export
+)
 from modules.simple_auth import SimpleAuthManager
-import tempfile
 import os
 import time
-from io import BytesIO
 
 # Configuración de la página
 st.set_page_config(
@@ -191,10 +194,14 @@ if 'stats' not in st.session_state:
     st.session_state.stats = None
 if 'datos_por_hoja' not in st.session_state:
     st.session_state.datos_por_hoja = None
+if 'huella_datos_por_hoja' not in st.session_state:
+    st.session_state.huella_datos_por_hoja = None
 if 'metadata' not in st.session_state:
     st.session_state.metadata = None
-if 'master_data' not in st.session_state:
-    st.session_state.master_data = None
+if 'master_handle' not in st.session_state:
+    st.session_state.master_handle = None
+if 'master_filtro' not in st.session_state:
+    st.session_state.master_filtro = None
 if 'master_loaded' not in st.session_state:
     st.session_state.master_loaded = False
 
@@ -217,6 +224,32 @@ def get_drive_manager():
     except:
         return None
 
+# ==================== HELPERS DEL MASTER ====================
+
+def get_master_version():
+    """Versión del Master referenciada por la sesión (None si no hay datos cargados)"""
+    handle = st.session_state.get('master_handle')
+    return get_master_cache().resolve(handle) if handle else None
+
+def liberar_master():
+    """Suelta la referencia de la sesión al Master y los resultados filtrados"""
+    handle = st.session_state.get('master_handle')
+    if handle:
+        get_master_cache().release(handle)
+    st.session_state.master_handle = None
+    st.session_state.master_filtro = None
+    st.session_state.pop('reporte_exportado', None)
+
+def get_master_filtrado():
+    """Reconstruye el reporte filtrado de la sesión a partir de la consulta guardada"""
+    filtro = st.session_state.get('master_filtro')
+    version_master = get_master_version()
+    if not filtro or version_master is None:
+        return None
+    motor_consultas = get_master_query_engine()
+    return motor_consultas.reporte(version_master, motor_consultas.ejecutar(version_master, filtro['consulta']))
+
+
 # ==================== HELPER FUNCTIONS PARA UI ====================
 
 def create_card(title, content, card_type="default", icon=""):
@@ -762,94 +795,65 @@ def render_file_upload_section():
                     else:
                         with st.spinner("⏳ Procesando archivos... Esto puede tomar unos segundos."):
                             try:
-                                # Crear directorio temporal
-                                with tempfile.TemporaryDirectory() as tmpdir:
-                                    # Guardar archivos temporalmente (opcional)
-                                    netsuite_path = None
-                                    if archivo_netsuite:
-                                        netsuite_path = os.path.join(tmpdir, archivo_netsuite.name)
-                                        with open(netsuite_path, 'wb') as f:
-                                            f.write(archivo_netsuite.getbuffer())
-
-                                    facturas_path = None
-                                    if archivo_facturas:
-                                        facturas_path = os.path.join(tmpdir, archivo_facturas.name)
-                                        with open(facturas_path, 'wb') as f:
-                                            f.write(archivo_facturas.getbuffer())
-
-                                    notas_path = None
-                                    if archivo_notas:
-                                        notas_path = os.path.join(tmpdir, archivo_notas.name)
-                                        with open(notas_path, 'wb') as f:
-                                            f.write(archivo_notas.getbuffer())
-
-                                    netsuite_nc_path = None
-                                    if archivo_netsuite_nc:
-                                        netsuite_nc_path = os.path.join(tmpdir, archivo_netsuite_nc.name)
-                                        with open(netsuite_nc_path, 'wb') as f:
-                                            f.write(archivo_netsuite_nc.getbuffer())
-
-                                    # Inicializar procesador
-                                    processor = FileProcessor(
-                                        column_mapping_path='config/column_mapping.json',
-                                        classification_rules_path='config/classification_rules.json',
-                                        product_classification_path='config/product_classification.json'
-                                    )
+                                # Inicializar procesador
+                                processor = FileProcessor(
+                                    column_mapping_path='config/column_mapping.json',
+                                    classification_rules_path='config/classification_rules.json',
+                                    product_classification_path='config/product_classification.json'
+                                )
 
-                                    # Leer archivos Netsuite Facturas (opcional)
-                                    df_netsuite = None
-                                    if netsuite_path:
-                                        df_netsuite = processor.read_netsuite_file(netsuite_path)
-
-                                    # Leer archivos Noova Facturas (opcional)
-                                    df_facturas = None
-                                    if facturas_path:
-                                        df_facturas = processor.read_noova_file(facturas_path, 'facturas')
-
-                                    # Leer Noova Notas Crédito (opcional)
-                                    df_notas = None
-                                    if notas_path:
-                                        df_notas = processor.read_noova_file(notas_path, 'notas_credito')
-
-                                    # Leer Netsuite Notas Crédito (opcional)
-                                    df_netsuite_nc = None
-                                    if netsuite_nc_path:
-                                        df_netsuite_nc = processor.read_netsuite_nc_file(netsuite_nc_path)
-
-                                    # Consolidar (incluye los 4 archivos)
-                                    df_consolidated = processor.consolidate_data(
-                                        df_netsuite,
-                                        df_facturas,
-                                        df_notas,
-                                        df_netsuite_nc
-                                    )
+                                # Leer los archivos cargados en paralelo (uno por proceso),
+                                # directamente desde memoria sin copiarlos a disco
+                                dataframes, tiempos_lectura = processor.read_files_parallel({
+                                    'netsuite_facturas': archivo_netsuite,
+                                    'netsuite_nc': archivo_netsuite_nc,
+                                    'noova_facturas': archivo_facturas,
+                                    'noova_nc': archivo_notas
+                                })
+                                df_netsuite = dataframes['netsuite_facturas']
+                                df_netsuite_nc = dataframes['netsuite_nc']
+                                df_facturas = dataframes['noova_facturas']
+                                df_notas = dataframes['noova_nc']
+
+                                # Consolidar (incluye los 4 archivos)
+                                df_consolidated = processor.consolidate_data(
+                                    df_netsuite,
+                                    df_facturas,
+                                    df_notas,
+                                    df_netsuite_nc
+                                )
 
-                                    # Preparar para archivo maestro
-                                    datos_por_hoja = processor.prepare_for_master_sheet(df_consolidated)
-
-                                    # Obtener estadísticas
-                                    stats = processor.get_statistics(df_consolidated)
-
-                                    # Crear metadata del procesamiento
-                                    metadata = {
-                                        'fecha_procesamiento': datetime.now().isoformat(),
-                                        'archivos_procesados': {
-                                            'netsuite_facturas': archivo_netsuite.name,
-                                            'netsuite_nc': archivo_netsuite_nc.name if archivo_netsuite_nc else None,
-                                            'noova_facturas': archivo_facturas.name,
-                                            'noova_nc': archivo_notas.name if archivo_notas else None
-                                        },
-                                        'usuario': 'Alejandro',
-                                        'total_facturas': stats.get('total_facturas', 0),
-                                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                                    }
-
-                                    # Guardar en session_state
-                                    st.session_state.consolidated_data = df_consolidated
-                                    st.session_state.datos_por_hoja = datos_por_hoja
-                                    st.session_state.stats = stats
-                                    st.session_state.metadata = metadata
-                                    st.session_state.processed = True
+                                # Preparar para archivo maestro
+                                datos_por_hoja = processor.prepare_for_master_sheet(df_consolidated)
+
+                                # Obtener estadísticas
+                                stats = processor.get_statistics(df_consolidated)
+
+                                # Crear metadata del procesamiento
+                                metadata = {
+                                    'fecha_procesamiento': datetime.now().isoformat(),
+                                    'archivos_procesados': {
+                                        'netsuite_facturas': archivo_netsuite.name,
+                                        'netsuite_nc': archivo_netsuite_nc.name if archivo_netsuite_nc else None,
+                                        'noova_facturas': archivo_facturas.name,
+                                        'noova_nc': archivo_notas.name if archivo_notas else None
+                                    },
+                                    'usuario': 'Alejandro',
+                                    'total_facturas': stats.get('total_facturas', 0),
+                                    'tiempos_lectura': tiempos_lectura,
+                                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                                }
+
+                                # Guardar en session_state
+                                st.session_state.consolidated_data = df_consolidated
+                                st.session_state.datos_por_hoja = datos_por_hoja
+                                # Huella de los datos: se calcula una vez y la usa la caché del reporte
+                                st.session_state.huella_datos_por_hoja = fingerprint_hojas(datos_por_hoja)
+                                st.session_state.stats = stats
+                                st.session_state.metadata = metadata
+                                st.session_state.processed = True
+                                # Liberar el reporte de un procesamiento anterior
+                                st.session_state.pop('reporte_excel', None)
 
                                 st.balloons()
                                 st.success("✅ ¡Archivos procesados exitosamente!")
@@ -866,6 +870,11 @@ def render_file_upload_section():
                                 with col3:
                                     st.metric("Sin Clasificar", stats.get('sin_clasificar', 0))
 
+                                if tiempos_lectura:
+                                    st.caption("⏱️ Lectura: " + " · ".join(
+                                        f"{tipo} {segundos:.1f}s" for tipo, segundos in tiempos_lectura.items()
+                                    ))
+
                             except Exception as e:
                                 st.error(f"❌ Error al procesar archivos: {str(e)}")
                                 with st.expander("Ver detalles del error"):
@@ -912,19 +921,6 @@ def render_file_upload_section():
             </div>
         """, unsafe_allow_html=True)
 
-        # Generar archivo Excel
-        timestamp = datetime.now().strftime('%Y-%m-%d_%H%M%S')
-        file_name = f"Reporte_Facturacion_Automatizado_{timestamp}.xlsx"
-
-        buffer_maestro = BytesIO()
-        with pd.ExcelWriter(buffer_maestro, engine='openpyxl') as writer:
-            for hoja_nombre, hoja_df in datos_por_hoja.items():
-                # Excel tiene límite de 31 caracteres para nombres de hoja
-                sheet_name = hoja_nombre[:31] if len(hoja_nombre) > 31 else hoja_nombre
-                hoja_df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-        file_bytes = buffer_maestro.getvalue()
-
         # Botón de descarga
         st.markdown("""
             <div style='background: #F9FAFB; border: 1px solid #D1D5DB; border-radius: 8px; padding: 16px; margin-bottom: 12px;'>
@@ -937,14 +933,27 @@ def render_file_upload_section():
             </div>
         """, unsafe_allow_html=True)
 
-        st.download_button(
-            label="💾 Descargar Reporte",
-            data=file_bytes,
-            file_name=file_name,
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            use_container_width=True,
-            key="btn_descargar_local_master"
-        )
+        # El Excel se genera solo cuando se pide y se reutiliza mientras los datos no cambien
+        huella_datos = st.session_state.huella_datos_por_hoja
+        reporte = get_cached_excel_report(huella_datos, st.session_state)
+
+        if reporte is None:
+            if st.button("⚙️ Generar Reporte", use_container_width=True, key="btn_generar_reporte_master"):
+                with st.spinner("⏳ Generando archivo Excel..."):
+                    reporte = build_cached_excel_report(datos_por_hoja, huella_datos, st.session_state)
+
+        if reporte is not None:
+            timestamp = reporte['generado'].strftime('%Y-%m-%d_%H%M%S')
+            file_name = f"Reporte_Facturacion_Automatizado_{timestamp}.xlsx"
+
+            st.download_button(
+                label="💾 Descargar Reporte",
+                data=reporte['bytes'],
+                file_name=file_name,
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True,
+                key="btn_descargar_local_master"
+            )
 
         # VISTA PREVIA DEL REPORTE
         st.markdown("<div style='margin-top: 2rem;'></div>", unsafe_allow_html=True)
@@ -1082,16 +1091,24 @@ elif seleccion == "📊 Reportes desde Master":
             st.markdown("<div style='margin-top: 1rem;'></div>", unsafe_allow_html=True)
 
             # Verificar si ya hay datos cargados
-            if st.session_state.get('master_loaded') and st.session_state.get('master_data'):
+            version_master = get_master_version() if st.session_state.get('master_loaded') else None
+            dataframes_master = version_master.hojas if version_master else None
+            if dataframes_master:
                 st.success("✅ Datos del Master ya cargados en memoria")
                 col1, col2 = st.columns(2)
                 with col1:
-                    total_registros = sum(len(df) for df in st.session_state.master_data.values())
+                    total_registros = sum(len(df) for df in dataframes_master.values())
                     st.metric("Registros en memoria", f"{total_registros:,}")
+                    memoria_master = st.session_state.get('master_memoria')
+                    if memoria_master:
+                        st.caption(
+                            f"💾 Memoria: {memoria_master['original'] / 1024 / 1024:.1f} MB → "
+                            f"{memoria_master['compacta'] / 1024 / 1024:.1f} MB"
+                        )
                 with col2:
                     if st.button("🔄 Recargar Datos", use_container_width=True, key="btn_recargar_master"):
                         st.session_state.master_loaded = False
-                        st.session_state.master_data = None
+                        liberar_master()
                         st.rerun()
             else:
                 if st.button("📥 Cargar Datos del Master", use_container_width=True, key="btn_cargar_master"):
@@ -1099,9 +1116,13 @@ elif seleccion == "📊 Reportes desde Master":
                         dataframes_master = drive_manager.read_master_file()
 
                         if dataframes_master:
-                            # Guardar en session_state
-                            st.session_state.master_data = dataframes_master
-                            st.session_state.master_loaded = True
+                            # La sesión guarda solo una referencia a la copia compartida del proceso
+                            liberar_master()
+                            st.session_state.master_handle = get_master_cache().acquire(master_metadata['id'])
+                            st.session_state.master_loaded = st.session_state.master_handle is not None
+                            version_master = get_master_version()
+                            dataframes_master = version_master.hojas if version_master else None
+                            st.session_state.master_memoria = version_master.memoria if version_master else None
 
                             st.balloons()
                             st.success("✅ ¡Archivo Master cargado exitosamente!")
@@ -1110,7 +1131,7 @@ elif seleccion == "📊 Reportes desde Master":
 
             # Filtros y generación de reportes (solo si hay datos cargados)
             st.markdown("<div style='margin-top: 1.5rem;'></div>", unsafe_allow_html=True)
-            if st.session_state.get('master_loaded') and st.session_state.get('master_data'):
+            if dataframes_master:
                 st.markdown("""
                     <div style='background: #F5F8FE; border: 1px solid #77A1E2; border-radius: 12px; padding: 20px; margin-bottom: 24px;'>
                         <h3 style='font-size: 18px; font-weight: 600; color: #0C147B; margin-bottom: 8px;'>
@@ -1122,16 +1143,14 @@ elif seleccion == "📊 Reportes desde Master":
                     </div>
                 """, unsafe_allow_html=True)
 
-                dataframes_master = st.session_state.master_data
 
                 # Inicializar flag de búsqueda si no existe
                 # Mantener activo si ya hay resultados guardados (persistencia después de descargar)
                 if 'mostrar_resultados_filtros' not in st.session_state:
                     # Si ya hay resultados guardados, mantener visualización activa
                     st.session_state.mostrar_resultados_filtros = (
-                        'df_filtrado_master' in st.session_state and
-                        st.session_state.df_filtrado_master is not None and
-                        len(st.session_state.df_filtrado_master) > 0
+                        st.session_state.get('master_filtro') is not None and
+                        len(st.session_state.master_filtro['posiciones']) > 0
                     )
 
                 # Inicializar flag de limpieza si no existe
@@ -1149,36 +1168,14 @@ elif seleccion == "📊 Reportes desde Master":
                 )
 
                 # Determinar DataFrame según selección
+                # El consolidado (columnas unificadas + 'Tipo Factura') se arma una sola vez al cargar
+                # (compartido y de solo lectura: aquí solo se consulta su tamaño)
+                df_seleccionado = version_master.hojas.get(tipo_seleccionado, version_master.consolidado)
                 if tipo_seleccionado == "📊 Consolidado (Todas)":
-                    # Consolidar todas las hojas
-                    dfs_a_consolidar = []
-                    for nombre_hoja, df_hoja in dataframes_master.items():
-                        if df_hoja is not None and not df_hoja.empty:
-                            df_temp = df_hoja.copy()
-                            df_temp['Tipo Factura'] = nombre_hoja  # Agregar columna de tipo
-                            dfs_a_consolidar.append(df_temp)
-
-                    if not dfs_a_consolidar:
+                    nombre_seleccion = "Consolidado"
+                    if df_seleccionado.empty:
                         st.error("❌ No hay datos para consolidar")
-                        df_seleccionado = pd.DataFrame()
-                        nombre_seleccion = "Consolidado"
-                    else:
-                        try:
-                            # Concatenar con axis=0 para unir filas
-                            df_seleccionado = pd.concat(dfs_a_consolidar, axis=0, ignore_index=True, sort=False)
-                            nombre_seleccion = "Consolidado"
-                        except Exception as e:
-                            st.error(f"❌ Error al consolidar: {str(e)}")
-                            # Debug info
-                            with st.expander("🔍 Ver detalles para debug"):
-                                st.write(f"Número de DataFrames a consolidar: {len(dfs_a_consolidar)}")
-                                for i, df in enumerate(dfs_a_consolidar):
-                                    st.write(f"DataFrame {i}: {df.shape} - Columnas: {len(df.columns)}")
-                                    st.write(f"Tipos de datos: {df.dtypes.to_dict()}")
-                            df_seleccionado = pd.DataFrame()
-                            nombre_seleccion = "Consolidado"
                 else:
-                    df_seleccionado = dataframes_master[tipo_seleccionado].copy()
                     nombre_seleccion = tipo_seleccionado
 
                 # Mostrar estadística
@@ -1189,90 +1186,24 @@ elif seleccion == "📊 Reportes desde Master":
                 # Filtros: NIT, Código y Fecha
                 col_filtro1, col_filtro2, col_filtro3 = st.columns(3)
 
-                # Función helper para normalizar strings (quitar tildes y convertir a minúsculas)
-                def normalizar_texto(texto):
-                    """Normaliza texto eliminando tildes y convirtiendo a minúsculas"""
-                    if texto is None:
-                        return ""
-                    texto = str(texto)
-                    # Reemplazar tildes
-                    reemplazos = {
-                        'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
-                        'Á': 'a', 'É': 'e', 'Í': 'i', 'Ó': 'o', 'Ú': 'u',
-                        'ñ': 'n', 'Ñ': 'n'
-                    }
-                    for acento, sin_acento in reemplazos.items():
-                        texto = texto.replace(acento, sin_acento)
-                    return texto.lower().strip()
-
-                # Función helper para normalizar NITs (maneja float y string)
-                def normalizar_nit(valor):
-                    """Convierte NIT a string limpio, manejando floats y strings"""
-                    if pd.isna(valor):
-                        return None
-                    try:
-                        # Si es float, convertir a int primero para quitar decimales
-                        if isinstance(valor, float):
-                            valor = int(valor)
-                        # Convertir a string y limpiar
-                        return str(valor).strip()
-                    except:
-                        return str(valor).strip() if str(valor).strip() else None
-
-                # Detectar columna NIT de forma flexible
-                columna_nit = None
-                for col in df_seleccionado.columns:
-                    col_normalizado = normalizar_texto(col)
-                    # Buscar variaciones de "nit"
-                    if 'nit' in col_normalizado:
-                        columna_nit = col
-                        break
-
-                # Detectar columna de Código de desembolso de forma flexible
-                columnas_codigo_encontradas = []
-                for col in df_seleccionado.columns:
-                    col_normalizado = normalizar_texto(col)
-                    # Buscar si contiene "codigo" y "desembolso"
-                    if 'codigo' in col_normalizado and 'desembolso' in col_normalizado:
-                        columnas_codigo_encontradas.append(col)
-                    # O solo "codigo" si no hay otra opción
-                    elif col_normalizado == 'codigo':
-                        columnas_codigo_encontradas.append(col)
-
-                # Usar la primera encontrada como referencia
-                columna_codigo = columnas_codigo_encontradas[0] if columnas_codigo_encontradas else None
-
-                # Detectar TODAS las columnas de fecha disponibles
-                columnas_fecha_disponibles = []
-                for col in df_seleccionado.columns:
-                    col_normalizado = normalizar_texto(col)
-                    # Buscar cualquier columna que tenga "fecha"
-                    if 'fecha' in col_normalizado:
-                        columnas_fecha_disponibles.append(col)
-
-                # Normalizar columna NIT para filtrado consistente
-                if columna_nit:
-                    df_seleccionado['_NIT_normalizado'] = df_seleccionado[columna_nit].apply(normalizar_nit)
-
-                # IMPORTANTE: Unificar TODAS las columnas de código en una sola columna temporal
-                # Esto resuelve el problema cuando diferentes hojas tienen nombres ligeramente diferentes
-                if columnas_codigo_encontradas:
-                    # Crear columna unificada combinando todos los valores de código
-                    df_seleccionado['_Codigo_unificado'] = None
-                    for col_codigo in columnas_codigo_encontradas:
-                        df_seleccionado['_Codigo_unificado'] = df_seleccionado['_Codigo_unificado'].fillna(df_seleccionado[col_codigo])
-
-                    # Convertir a string y limpiar
-                    df_seleccionado['_Codigo_unificado'] = df_seleccionado['_Codigo_unificado'].astype(str).str.strip()
-                    df_seleccionado.loc[df_seleccionado['_Codigo_unificado'] == 'nan', '_Codigo_unificado'] = None
+                # Roles de las columnas (NIT, código, fechas) de la hoja o del consolidado:
+                # resueltos una vez al cargar el Master
+                esquema_master = version_master.esquema(tipo_seleccionado)
+                columna_nit = esquema_master.nit
+                columnas_codigo_encontradas = list(esquema_master.codigos)
+                columnas_fecha_disponibles = list(esquema_master.fechas)
+
+                # Opciones de NIT y código (ordenadas, y códigos por NIT) calculadas al cargar el
+                # Master, a partir del NIT normalizado y el código unificado del índice
+                indice_master = version_master.indice
+                facetas_master = indice_master.facetas_de(tipo_seleccionado)
 
                 with col_filtro1:
                     # Filtro por NIT
                     st.markdown("**👤 Filtro por NIT del Cliente**")
 
                     if columna_nit:
-                        nits_disponibles = [nit for nit in df_seleccionado['_NIT_normalizado'].dropna().unique() if nit]
-                        nits_disponibles = sorted(nits_disponibles)
+                        nits_disponibles = facetas_master.nits
 
                         filtro_nit = st.multiselect(
                             "Seleccionar NIT(s)",
@@ -1293,19 +1224,14 @@ elif seleccion == "📊 Reportes desde Master":
 
                     if columnas_codigo_encontradas:
                         # Si hay NITs seleccionados, filtrar los códigos por esos NITs
+                        # (códigos unificados: combinan todas las variaciones de la columna de código)
                         if filtro_nit and columna_nit:
-                            df_para_codigos = df_seleccionado[
-                                df_seleccionado['_NIT_normalizado'].isin(filtro_nit)
-                            ]
+                            codigos_disponibles = facetas_master.codigos_de(filtro_nit)
                             help_text = f"Códigos asociados a los {len(filtro_nit)} NIT(s) seleccionado(s)"
                         else:
-                            df_para_codigos = df_seleccionado
+                            codigos_disponibles = facetas_master.codigos
                             help_text = "Selecciona primero un NIT para ver solo sus códigos, o deja vacío para todos"
 
-                        # Usar columna unificada que combina todas las variaciones de código
-                        codigos_disponibles = [c for c in df_para_codigos['_Codigo_unificado'].dropna().unique() if c and str(c).strip() and str(c) != 'nan']
-                        codigos_disponibles = sorted(codigos_disponibles)
-
                         filtro_codigo = st.multiselect(
                             "Seleccionar Código(s)",
                             options=codigos_disponibles,
@@ -1326,37 +1252,15 @@ elif seleccion == "📊 Reportes desde Master":
                     # Filtro por Fecha - Busca en TODAS las columnas de fecha
                     st.markdown("**📅 Filtro por Fecha**")
 
-                    if columnas_fecha_disponibles:
-                        # Normalizar TODAS las columnas de fecha encontradas
-                        fechas_normalizadas_dict = {}
-                        for col_fecha in columnas_fecha_disponibles:
-                            try:
-                                df_seleccionado[f'_Fecha_{col_fecha}'] = pd.to_datetime(
-                                    df_seleccionado[col_fecha],
-                                    errors='coerce'
-                                )
-                                fechas_normalizadas_dict[col_fecha] = f'_Fecha_{col_fecha}'
-                            except:
-                                pass
-
-                        # Obtener rango de fechas de TODAS las columnas
-                        todas_fechas = []
-                        for col_normalizada in fechas_normalizadas_dict.values():
-                            fechas_col = df_seleccionado[col_normalizada].dropna()
-                            if len(fechas_col) > 0:
-                                todas_fechas.extend(fechas_col.tolist())
-
-                        columnas_fecha_normalizadas = list(fechas_normalizadas_dict.values())
-                    else:
-                        todas_fechas = []
-                        columnas_fecha_normalizadas = []
+                    # Las fechas de TODAS las columnas ya están parseadas y ordenadas en el
+                    # índice del Master: el rango mínimo/máximo no requiere recorrerlas
+                    limites_fecha = indice_master.fechas.limites(
+                        tipo_seleccionado if tipo_seleccionado in version_master.rangos else None
+                    ) if columnas_fecha_disponibles else None
 
-                    if todas_fechas:
-                        # Convertir a pandas Series para obtener min/max
-                        import pandas as pd
-                        todas_fechas_series = pd.Series(todas_fechas)
-                        fecha_min = todas_fechas_series.min().date()
-                        fecha_max = todas_fechas_series.max().date()
+                    if limites_fecha:
+                        fecha_min = limites_fecha[0].date()
+                        fecha_max = limites_fecha[1].date()
 
                         # Selector de rango de fechas
                         usar_filtro_fecha = st.checkbox(
@@ -1397,7 +1301,6 @@ elif seleccion == "📊 Reportes desde Master":
                         fecha_desde = None
                         fecha_hasta = None
                         usar_filtro_fecha = False
-                        columnas_fecha_normalizadas = []
 
                 st.markdown("---")
 
@@ -1461,9 +1364,9 @@ elif seleccion == "📊 Reportes desde Master":
                         # Limpiar flag de resultados
                         st.session_state.mostrar_resultados_filtros = False
 
-                        # Limpiar resultados guardados
-                        if 'df_filtrado_master' in st.session_state:
-                            del st.session_state.df_filtrado_master
+                        # Limpiar resultados guardados (y el archivo exportado)
+                        st.session_state.master_filtro = None
+                        st.session_state.pop('reporte_exportado', None)
 
                         # Borrar TODOS los keys de filtros (permite que widgets se reseteen)
                         filtros_a_limpiar = [
@@ -1494,181 +1397,47 @@ elif seleccion == "📊 Reportes desde Master":
                     st.info("👆 Configura los filtros arriba y presiona **'Buscar / Aplicar Filtros'** para ver los resultados")
                     st.stop()
 
-                # Aplicar filtros
-                df_filtrado = df_seleccionado.copy()
-                registros_inicial = len(df_filtrado)
-
-                # Aplicar filtro de NIT (usando columna normalizada Y buscando en código de desembolso)
-                if filtro_nit and columna_nit:
-                    # Filtro 1: Coincidencia directa en columna NIT
-                    filtro_por_columna_nit = df_filtrado['_NIT_normalizado'].isin(filtro_nit)
-
-                    # Filtro 2: Buscar NIT en código de desembolso (formato CO:nit:NUM:NUM:LETRAS)
-                    if columnas_codigo_encontradas and '_Codigo_unificado' in df_filtrado.columns:
-                        filtro_por_codigo = pd.Series([False] * len(df_filtrado), index=df_filtrado.index)
-
-                        for nit in filtro_nit:
-                            # Buscar el patrón "CO:nit:" en el código de desembolso
-                            filtro_por_codigo = filtro_por_codigo | df_filtrado['_Codigo_unificado'].str.contains(
-                                f'CO:{nit}:',
-                                na=False,
-                                case=False,
-                                regex=False
-                            )
-
-                        # Combinar ambos filtros con OR (incluir si cumple cualquiera de los dos)
-                        df_filtrado = df_filtrado[filtro_por_columna_nit | filtro_por_codigo]
-                    else:
-                        # Si no hay columna de código, solo usar filtro de NIT directo
-                        df_filtrado = df_filtrado[filtro_por_columna_nit]
-
-                # Aplicar filtro de Código (usando columna unificada)
-                registros_despues_nit = len(df_filtrado)
-                if filtro_codigo and columnas_codigo_encontradas:
-                    df_filtrado = df_filtrado[df_filtrado['_Codigo_unificado'].isin(filtro_codigo)]
-
-                # Aplicar filtro de Fecha (si está activado) - Busca en TODAS las columnas de fecha
-                registros_despues_codigo = len(df_filtrado)
-                if usar_filtro_fecha and columnas_fecha_normalizadas and fecha_desde and fecha_hasta:
-                    # Convertir fechas a datetime para comparación
-                    fecha_desde_dt = pd.to_datetime(fecha_desde)
-                    fecha_hasta_dt = pd.to_datetime(fecha_hasta) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)  # Incluir todo el día
-
-                    # Crear filtro combinado: incluir si CUALQUIER columna de fecha está en el rango
-                    filtro_fecha_combinado = pd.Series([False] * len(df_filtrado), index=df_filtrado.index)
-
-                    for col_fecha_norm in columnas_fecha_normalizadas:
-                        if col_fecha_norm in df_filtrado.columns:
-                            # Agregar registros donde esta columna de fecha esté en el rango
-                            filtro_fecha_combinado = filtro_fecha_combinado | (
-                                (df_filtrado[col_fecha_norm] >= fecha_desde_dt) &
-                                (df_filtrado[col_fecha_norm] <= fecha_hasta_dt)
-                            )
-
-                    df_filtrado = df_filtrado[filtro_fecha_combinado]
-
-                # Mostrar información de filtros aplicados
-                registros_final = len(df_filtrado)
+                # Aplicar filtros: el motor de consultas los evalúa sobre el índice del Master
+                # (el más selectivo primero) y guarda el resultado por especificación
+                filtro_master = FiltroMaster(
+                    hoja=tipo_seleccionado if tipo_seleccionado in version_master.rangos else None,
+                    nits=tuple(filtro_nit) if columna_nit else (),
+                    codigos=tuple(filtro_codigo) if columnas_codigo_encontradas else (),
+                    # Incluir todo el día final
+                    fecha_desde=pd.to_datetime(fecha_desde) if usar_filtro_fecha and fecha_desde and fecha_hasta else None,
+                    fecha_hasta=pd.to_datetime(fecha_hasta) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+                    if usar_filtro_fecha and fecha_desde and fecha_hasta else None
+                )
+                motor_consultas = get_master_query_engine()
+                resultado_master = motor_consultas.ejecutar(version_master, filtro_master)
 
                 with st.expander("🔍 Debug de Filtros", expanded=False):
-                    st.caption(f"📊 Registros iniciales: {registros_inicial:,}")
+                    st.caption(f"📊 Registros iniciales: {resultado_master.registros_inicial:,}")
 
                     # Mostrar distribución por tipo si es consolidado
-                    if nombre_seleccion == "Consolidado" and 'Tipo Factura' in df_seleccionado.columns:
+                    if nombre_seleccion == "Consolidado":
                         st.markdown("**Distribución inicial por tipo:**")
-                        dist_inicial = df_seleccionado['Tipo Factura'].value_counts()
-                        for tipo, count in dist_inicial.items():
+                        for tipo, count in sorted(resultado_master.por_hoja_inicial.items(), key=lambda item: -item[1]):
                             st.caption(f"  • {tipo}: {count:,} registros")
 
-                    if filtro_nit:
-                        st.caption(f"📊 Después de filtrar por NIT: {registros_despues_nit:,}")
-                        if nombre_seleccion == "Consolidado" and 'Tipo Factura' in df_filtrado.columns and registros_despues_nit > 0:
-                            dist_nit = df_filtrado['Tipo Factura'].value_counts()
-                            for tipo, count in dist_nit.items():
+                    # Pasos en el orden en que se evaluaron (del filtro más selectivo al menos)
+                    for paso in resultado_master.pasos:
+                        detalle = f" ({fecha_desde} a {fecha_hasta})" if paso.nombre == 'Fecha' else ""
+                        st.caption(f"📊 Después de filtrar por {paso.nombre}{detalle}: {paso.registros:,}")
+                        if nombre_seleccion == "Consolidado":
+                            for tipo, count in sorted(paso.por_hoja.items(), key=lambda item: -item[1]):
                                 st.caption(f"    → {tipo}: {count:,}")
 
-                    if filtro_codigo:
-                        st.caption(f"📊 Después de filtrar por Código: {registros_despues_codigo:,}")
-                        if nombre_seleccion == "Consolidado" and 'Tipo Factura' in df_filtrado.columns and registros_despues_codigo > 0:
-                            dist_codigo = df_filtrado['Tipo Factura'].value_counts()
-                            for tipo, count in dist_codigo.items():
-                                st.caption(f"    → {tipo}: {count:,}")
+                    st.caption(f"✅ **Total final: {len(resultado_master.posiciones):,} registros**")
 
-                    if usar_filtro_fecha:
-                        st.caption(f"📊 Después de filtrar por Fecha ({fecha_desde} a {fecha_hasta}): {registros_final:,}")
-                        if nombre_seleccion == "Consolidado" and 'Tipo Factura' in df_filtrado.columns and registros_final > 0:
-                            dist_fecha = df_filtrado['Tipo Factura'].value_counts()
-                            for tipo, count in dist_fecha.items():
-                                st.caption(f"    → {tipo}: {count:,}")
+                # Un solo DataFrame: filas del resultado, columnas de la hoja, columnas limpias
+                df_filtrado = motor_consultas.reporte(version_master, resultado_master)
 
-                    st.caption(f"✅ **Total final: {registros_final:,} registros**")
-
-                # Limpiar columnas temporales del resultado final
-                columnas_temporales = ['_NIT_normalizado', '_Codigo_unificado', '_Fecha_normalizada']
-                # Agregar todas las columnas de fecha normalizadas
-                if usar_filtro_fecha and columnas_fecha_normalizadas:
-                    columnas_temporales.extend(columnas_fecha_normalizadas)
-
-                for col_temp in columnas_temporales:
-                    if col_temp in df_filtrado.columns:
-                        df_filtrado = df_filtrado.drop(columns=[col_temp])
-
-                # ========== LIMPIEZA Y CONSOLIDACIÓN DE COLUMNAS ==========
-                def limpiar_columnas_reporte(df):
-                    """Limpia, consolida y reorganiza columnas del reporte"""
-                    df_clean = df.copy()
-
-                    # 1. Eliminar columnas Unnamed
-                    unnamed_cols = [col for col in df_clean.columns if 'Unnamed' in str(col) or col.startswith('Unnamed')]
-                    df_clean = df_clean.drop(columns=unnamed_cols, errors='ignore')
-
-                    # 2. Eliminar columnas innecesarias
-                    columnas_eliminar = [
-                        'Validacion Consecutivo', 'Revision', 'Estado', 'Envio',
-                        'Fac de la nota Crédito', 'Fecha Nota Credito', '# Nota Credito'
-                    ]
-                    df_clean = df_clean.drop(columns=columnas_eliminar, errors='ignore')
-
-                    # 3. Unificar columnas de Código de desembolso
-                    if 'Código del desembolso' in df_clean.columns and 'Codigo del desembolso' in df_clean.columns:
-                        # Combinar ambas columnas
-                        df_clean['Codigo del desembolso'] = df_clean['Codigo del desembolso'].fillna(df_clean['Código del desembolso'])
-                        df_clean = df_clean.drop(columns=['Código del desembolso'], errors='ignore')
-                    elif 'Código del desembolso' in df_clean.columns:
-                        df_clean = df_clean.rename(columns={'Código del desembolso': 'Codigo del desembolso'})
-
-                    # 4. Unificar columnas de Fecha (consolidar en "Fecha Factura")
-                    columnas_fecha = ['Fecha Factura', 'Fecha Facturacion', 'Fecha de desembolso']
-                    fecha_principal = None
-                    for col_fecha in columnas_fecha:
-                        if col_fecha in df_clean.columns:
-                            if fecha_principal is None:
-                                fecha_principal = col_fecha
-                                df_clean = df_clean.rename(columns={col_fecha: 'Fecha Factura'})
-                            else:
-                                # Rellenar valores faltantes con otras columnas de fecha
-                                df_clean['Fecha Factura'] = df_clean['Fecha Factura'].fillna(df_clean[col_fecha])
-                                df_clean = df_clean.drop(columns=[col_fecha], errors='ignore')
-
-                    # 5. Eliminar todas las columnas de "Mes Facturacion" (preferimos usar "Fecha Factura")
-                    mes_facturacion_cols = [col for col in df_clean.columns if 'Mes facturacion' in col or 'Mes Facturacion' in col or 'Mes facturación' in col]
-                    df_clean = df_clean.drop(columns=mes_facturacion_cols, errors='ignore')
-
-                    # 6. Unificar columnas de Moneda (eliminar duplicados)
-                    moneda_cols = [col for col in df_clean.columns if col == 'Moneda' or col.endswith('.1') and 'Moneda' in col]
-                    if len(moneda_cols) > 1:
-                        # Mantener solo la primera columna de Moneda
-                        for col in moneda_cols[1:]:
-                            df_clean = df_clean.drop(columns=[col], errors='ignore')
-
-                    # 7. Reorganizar columnas (las más importantes al principio)
-                    columnas_prioritarias = [
-                        'Tipo Factura',
-                        'Codigo del desembolso',
-                        'NIT',
-                        'Cliente',
-                        'Fecha Factura',
-                        '# Factura',
-                        'Numero de factura',
-                        'Moneda'
-                    ]
-
-                    # Columnas que existen y están en la lista prioritaria
-                    cols_ordenadas = [col for col in columnas_prioritarias if col in df_clean.columns]
-
-                    # Resto de columnas (que no están en prioritarias)
-                    cols_restantes = [col for col in df_clean.columns if col not in cols_ordenadas]
-
-                    # Reordenar
-                    df_clean = df_clean[cols_ordenadas + cols_restantes]
-
-                    return df_clean
-
-                # Aplicar limpieza de columnas
-                df_filtrado = limpiar_columnas_reporte(df_filtrado)
-
-                # Guardar en session_state para búsqueda de PDFs
-                st.session_state.df_filtrado_master = df_filtrado
+                # Guardar solo la consulta y las posiciones de las filas (para búsqueda de PDFs)
+                st.session_state.master_filtro = {
+                    'consulta': filtro_master,
+                    'posiciones': resultado_master.posiciones
+                }
 
                 if len(df_filtrado) == 0:
                     st.warning("⚠️ No hay registros que cumplan con los filtros seleccionados")
@@ -1745,24 +1514,55 @@ elif seleccion == "📊 Reportes desde Master":
                     st.markdown("---")
 
                     # Opción de descarga
-                    timestamp = datetime.now().strftime('%Y-%m-%d_%H%M%S')
-                    nombre_archivo = f"Reporte_Master_{nombre_seleccion.replace(' ', '_')}_{timestamp}"
-
                     st.markdown("### 📥 Descargar Reporte")
 
-                    # Generar Excel
-                    buffer_excel = BytesIO()
-                    with pd.ExcelWriter(buffer_excel, engine='openpyxl') as writer:
-                        df_filtrado.to_excel(writer, sheet_name=nombre_seleccion[:31], index=False)
-
-                    st.download_button(
-                        label="📥 Descargar Excel",
-                        data=buffer_excel.getvalue(),
-                        file_name=f"{nombre_archivo}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        use_container_width=True
+                    formatos_descarga = {
+                        'xlsx': "Excel (.xlsx)",
+                        'csv': "CSV",
+                        'csv.gz': "CSV comprimido (.csv.gz)",
+                        'parquet': "Parquet"
+                    }
+                    formato_descarga = st.radio(
+                        "Formato de descarga",
+                        options=list(formatos_descarga.keys()),
+                        format_func=formatos_descarga.get,
+                        horizontal=True,
+                        key="formato_descarga_master",
+                        help="CSV y Parquet se generan mucho más rápido que Excel; útiles para otras herramientas"
                     )
 
+                    # El archivo se genera solo cuando se pide (Excel en streaming si el filtro es
+                    # grande) y se reutiliza mientras no cambien el Master, los filtros ni el formato
+                    huella_exportacion = (version_master.clave, filtro_master)
+                    exportado = get_cached_export(huella_exportacion, formato_descarga, st.session_state)
+
+                    if exportado is None:
+                        if st.button(
+                            f"⚙️ Generar {formatos_descarga[formato_descarga]}",
+                            use_container_width=True,
+                            key="btn_generar_exportacion_master"
+                        ):
+                            with st.spinner(f"⏳ Generando {formatos_descarga[formato_descarga]}..."):
+                                try:
+                                    exportado = build_cached_export(
+                                        df_filtrado, formato_descarga, huella_exportacion,
+                                        st.session_state, nombre_hoja=nombre_seleccion
+                                    )
+                                except ValueError as e:
+                                    st.error(f"❌ {e}")
+
+                    if exportado is not None:
+                        timestamp = exportado['generado'].strftime('%Y-%m-%d_%H%M%S')
+                        nombre_archivo = f"Reporte_Master_{nombre_seleccion.replace(' ', '_')}_{timestamp}"
+
+                        st.download_button(
+                            label=f"📥 Descargar {formatos_descarga[formato_descarga]}",
+                            data=exportado['bytes'],
+                            file_name=f"{nombre_archivo}{exportado['extension']}",
+                            mime=exportado['mime'],
+                            use_container_width=True
+                        )
+
         # ========== BUSCAR PDFs EN DRIVE ==========
         st.markdown("<div style='margin-top: 2.5rem;'></div>", unsafe_allow_html=True)
         try:
@@ -1785,8 +1585,8 @@ elif seleccion == "📊 Reportes desde Master":
                     </div>
                 """, unsafe_allow_html=True)
 
-                if st.session_state.get('master_loaded') and st.session_state.get('df_filtrado_master') is not None and not st.session_state.df_filtrado_master.empty:
-                    df_filtrado = st.session_state.df_filtrado_master
+                df_filtrado = get_master_filtrado() if st.session_state.get('master_loaded') else None
+                if df_filtrado is not None and not df_filtrado.empty:
 
                     if st.button("🔍 Buscar PDFs del Reporte", use_container_width=True, key="btn_search_from_report_master"):
                         # Detectar columna de número de factura
@@ -0,0 +1,253 @@
+"""
+Registro de configuración compartido por proceso
+Mantiene los JSON de config/ parseados y precompilados una sola vez por proceso
+y los recarga solo cuando el archivo cambia (mtime + hash de contenido)
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Tuple
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """
+    Vista inmutable de la configuración de FileProcessor
+
+    Los diccionarios se exponen como MappingProxyType (listas como tuplas)
+    y la tabla de clasificación es compartida: no debe modificarse.
+    """
+    column_mapping: Mapping[str, Any]
+    classification_rules: Mapping[str, Any]
+    product_classification: Mapping[str, Any]
+    prefijos: Tuple[str, ...]
+    patron_factura: re.Pattern
+    tabla_clasificacion: pd.DataFrame
+    config_hash: str
+
+
+@dataclass(frozen=True)
+class _ArchivoConfig:
+    """Estado cacheado de un archivo JSON de configuración"""
+    mtime_ns: int
+    size: int
+    sha256: str
+    data: Mapping[str, Any]
+
+
+def _freeze(valor: Any) -> Any:
+    """Convierte dicts/listas anidados en estructuras de solo lectura"""
+    if isinstance(valor, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in valor.items()})
+    if isinstance(valor, list):
+        return tuple(_freeze(v) for v in valor)
+    return valor
+
+
+def build_prefijos(classification_rules: Mapping[str, Any]) -> Tuple[str, ...]:
+    """
+    Obtiene la lista de prefijos de factura ordenada (más largo primero)
+
+    Usa 'prefijos_factura' de classification_rules.json; si no existe,
+    usa las llaves de 'tipo_factura_por_prefijo'.
+
+    Args:
+        classification_rules: Reglas de clasificación
+
+    Returns:
+        Tupla de prefijos en orden de prioridad
+    """
+    prefijos = classification_rules.get('prefijos_factura')
+    if not prefijos:
+        prefijos = list(classification_rules.get('tipo_factura_por_prefijo', {}).keys())
+
+    prefijos = [str(p).strip().upper() for p in prefijos if str(p).strip()]
+
+    # Más largo primero para que 'NCFE' gane sobre 'FE' (orden estable)
+    return tuple(sorted(dict.fromkeys(prefijos), key=len, reverse=True))
+
+
+def compile_patron_factura(prefijos: Tuple[str, ...]) -> re.Pattern:
+    """
+    Compila la expresión regular anclada que extrae prefijo y consecutivo
+
+    Args:
+        prefijos: Prefijos en orden de prioridad (más largo primero)
+
+    Returns:
+        Patrón con grupos 'prefijo' (inicio) y 'consecutivo' (dígitos finales)
+    """
+    alternativas = '|'.join(re.escape(p) for p in prefijos) or '(?!)'
+    return re.compile(
+        rf'^(?P<prefijo>{alternativas})?.*?(?P<consecutivo>\d+)?$',
+        re.DOTALL
+    )
+
+
+def build_tabla_clasificacion(product_classification: Mapping[str, Any]) -> pd.DataFrame:
+    """
+    Construye la tabla de clasificación a partir de product_classification.json
+
+    Args:
+        product_classification: Clasificación de productos
+
+    Returns:
+        DataFrame indexado por código normalizado con columnas
+        categoria, columna_destino y descripcion
+    """
+    productos = product_classification.get('clasificacion_productos', {})
+    mapeo_columnas = product_classification.get('mapeo_categoria_columna', {})
+
+    filas = {}
+    for codigo, producto_info in productos.items():
+        categoria = producto_info.get('categoria', 'sin_clasificar')
+        filas[codigo] = {
+            'categoria': categoria,
+            'columna_destino': mapeo_columnas.get(categoria, 'Sin Clasificar'),
+            'descripcion': producto_info.get('descripcion', 'Sin descripcion')
+        }
+
+    tabla = pd.DataFrame.from_dict(
+        filas, orient='index', columns=['categoria', 'columna_destino', 'descripcion']
+    )
+    tabla.index.name = 'codigo_normalizado'
+    return tabla
+
+
+class ConfigRegistry:
+    """
+    Caché de configuración compartida por todas las sesiones del proceso
+
+    Cada consulta hace solo un os.stat por archivo; el archivo se vuelve a leer
+    si cambia su mtime o tamaño, y se vuelve a parsear solo si además cambia
+    el hash SHA-256 de su contenido.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._archivos: Dict[str, _ArchivoConfig] = {}
+        self._snapshots: Dict[Tuple[str, str, str], ConfigSnapshot] = {}
+
+    def _load_json(self, path: str) -> _ArchivoConfig:
+        """
+        Devuelve el JSON parseado de un archivo, recargándolo solo si cambió
+
+        Args:
+            path: Ruta absoluta al archivo JSON
+
+        Returns:
+            Estado cacheado del archivo
+        """
+        stat = os.stat(path)
+        cacheado = self._archivos.get(path)
+
+        if cacheado and cacheado.mtime_ns == stat.st_mtime_ns and cacheado.size == stat.st_size:
+            return cacheado
+
+        with open(path, 'rb') as f:
+            contenido = f.read()
+        sha256 = hashlib.sha256(contenido).hexdigest()
+
+        if cacheado and cacheado.sha256 == sha256:
+            # Solo cambió el mtime (ej: touch o checkout): reutilizar lo parseado
+            data = cacheado.data
+        else:
+            data = _freeze(json.loads(contenido.decode('utf-8')))
+            if cacheado:
+                logger.info(f"🔄 Configuración recargada: {path}")
+
+        archivo = _ArchivoConfig(
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            sha256=sha256,
+            data=data
+        )
+        self._archivos[path] = archivo
+        return archivo
+
+    def get_snapshot(
+        self,
+        column_mapping_path: str,
+        classification_rules_path: str,
+        product_classification_path: str
+    ) -> ConfigSnapshot:
+        """
+        Obtiene la configuración vigente para las tres rutas
+
+        Args:
+            column_mapping_path: Ruta al JSON de mapeo de columnas
+            classification_rules_path: Ruta al JSON de reglas de clasificación
+            product_classification_path: Ruta al JSON de clasificación de productos
+
+        Returns:
+            ConfigSnapshot inmutable (la misma instancia mientras no cambien los archivos)
+        """
+        rutas = tuple(os.path.abspath(p) for p in (
+            column_mapping_path, classification_rules_path, product_classification_path
+        ))
+
+        with self._lock:
+            archivos = [self._load_json(ruta) for ruta in rutas]
+            config_hash = hashlib.sha256(
+                ''.join(a.sha256 for a in archivos).encode('ascii')
+            ).hexdigest()
+
+            snapshot = self._snapshots.get(rutas)
+            if snapshot and snapshot.config_hash == config_hash:
+                return snapshot
+
+            column_mapping, classification_rules, product_classification = (a.data for a in archivos)
+            prefijos = build_prefijos(classification_rules)
+
+            snapshot = ConfigSnapshot(
+                column_mapping=column_mapping,
+                classification_rules=classification_rules,
+                product_classification=product_classification,
+                prefijos=prefijos,
+                patron_factura=compile_patron_factura(prefijos),
+                tabla_clasificacion=build_tabla_clasificacion(product_classification),
+                config_hash=config_hash
+            )
+            self._snapshots[rutas] = snapshot
+            return snapshot
+
+    def clear(self):
+        """Descarta toda la configuración cacheada (fuerza recarga completa)"""
+        with self._lock:
+            self._archivos.clear()
+            self._snapshots.clear()
+
+
+# Instancia única por proceso (compartida entre sesiones de Streamlit)
+_registry = ConfigRegistry()
+
+
+def get_config_snapshot(
+    column_mapping_path: str = 'config/column_mapping.json',
+    classification_rules_path: str = 'config/classification_rules.json',
+    product_classification_path: str = 'config/product_classification.json'
+) -> ConfigSnapshot:
+    """
+    Obtiene la configuración vigente desde el registro del proceso
+
+    Args:
+        column_mapping_path: Ruta al JSON de mapeo de columnas
+        classification_rules_path: Ruta al JSON de reglas de clasificación
+        product_classification_path: Ruta al JSON de clasificación de productos
+
+    Returns:
+        ConfigSnapshot inmutable
+    """
+    return _registry.get_snapshot(
+        column_mapping_path, classification_rules_path, product_classification_path
+    )
@@ -13,11 +13,24 @@ import io
 import pandas as pd
 from typing import List, Dict, Optional
 import zipfile
+import tempfile
 from datetime import datetime
 import time
 import os
 import json
+import logging
 from modules.config_helper import get_service_account_info, get_drive_folder_id
+from modules.config_registry import get_config_snapshot
+from modules.master_store import compact_master_sheets, get_master_cache, get_master_sidecar, read_master_sheets
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de cada petición de descarga en streaming (configurable con DRIVE_CHUNK_MB)
+CHUNK_DESCARGA_POR_DEFECTO = 8 * 1024 * 1024
+
+# Hasta este tamaño la descarga en streaming se mantiene en memoria; luego pasa a disco
+MAX_BYTES_DESCARGA_EN_MEMORIA = 16 * 1024 * 1024
+
 
 class DriveManager:
     """Gestiona la búsqueda, descarga y subida de archivos en Google Drive"""
@@ -36,6 +49,7 @@ class DriveManager:
         self.service = None
         self.folder_id = get_drive_folder_id()
         self.creds = None
+        self.ultima_descarga = None
 
         # Autenticar con cuenta de servicio automáticamente
         self._authenticate_with_service_account()
@@ -423,6 +437,75 @@ class DriveManager:
             st.error(f"❌ Error al descargar {file_name}: {str(e)}")
             return None
     
+    def download_file_to_spool(self, file_id: str, file_name: str, chunk_size: Optional[int] = None):
+        """Descarga un archivo por partes a un archivo temporal (sin copias completas en RAM)
+
+        El contenido se escribe a un SpooledTemporaryFile: queda en memoria hasta
+        MAX_BYTES_DESCARGA_EN_MEMORIA y luego pasa a disco. El rendimiento de cada
+        parte queda en self.ultima_descarga.
+
+        Args:
+            file_id: Id del archivo en Drive
+            file_name: Nombre del archivo (para mensajes)
+            chunk_size: Bytes por petición (None = DRIVE_CHUNK_MB o CHUNK_DESCARGA_POR_DEFECTO)
+
+        Returns:
+            Archivo temporal posicionado al inicio (el llamador debe cerrarlo) o None si falla
+        """
+        if not self.is_authenticated() or not file_id:
+            return None
+
+        if chunk_size is None:
+            chunk_mb = os.getenv('DRIVE_CHUNK_MB')
+            chunk_size = int(float(chunk_mb) * 1024 * 1024) if chunk_mb else CHUNK_DESCARGA_POR_DEFECTO
+
+        destino = tempfile.SpooledTemporaryFile(max_size=MAX_BYTES_DESCARGA_EN_MEMORIA)
+        try:
+            # IMPORTANTE: supportsAllDrives=True es necesario para carpetas compartidas
+            request = self.service.files().get_media(
+                fileId=file_id,
+                supportsAllDrives=True
+            )
+            downloader = MediaIoBaseDownload(destino, request, chunksize=chunk_size)
+
+            partes = []
+            inicio = time.perf_counter()
+            descargado = 0
+            done = False
+            while not done:
+                inicio_parte = time.perf_counter()
+                status, done = downloader.next_chunk()
+                segundos = time.perf_counter() - inicio_parte
+                bytes_parte = status.resumable_progress - descargado
+                descargado = status.resumable_progress
+                partes.append({
+                    'bytes': bytes_parte,
+                    'segundos': segundos,
+                    'mb_por_segundo': bytes_parte / 1024 / 1024 / segundos if segundos > 0 else None
+                })
+
+            total_segundos = time.perf_counter() - inicio
+            self.ultima_descarga = {
+                'archivo': file_name,
+                'bytes': descargado,
+                'segundos': total_segundos,
+                'mb_por_segundo': descargado / 1024 / 1024 / total_segundos if total_segundos > 0 else None,
+                'chunk_size': chunk_size,
+                'partes': partes
+            }
+            logger.info(
+                f"📶 {file_name}: {descargado / 1024 / 1024:.1f} MB en {total_segundos:.1f}s "
+                f"({len(partes)} partes de {chunk_size / 1024 / 1024:.0f} MB)"
+            )
+
+            destino.seek(0)
+            return destino
+
+        except Exception as e:
+            destino.close()
+            st.error(f"❌ Error al descargar {file_name}: {str(e)}")
+            return None
+
     def download_multiple_files(self, invoices: List[Dict], progress_bar=None, status_text=None) -> Optional[bytes]:
         """Descarga múltiples archivos en ZIP
 
@@ -693,51 +776,88 @@ class DriveManager:
             raise Exception(f"Error al buscar archivo Master: {str(e)}")
 
     def read_master_file(self) -> Optional[Dict[str, pd.DataFrame]]:
-        """Lee el archivo Master de Google Drive y devuelve un diccionario con los DataFrames por hoja"""
+        """Lee el archivo Master de Google Drive y devuelve un diccionario con los DataFrames por hoja
+
+        Las hojas parseadas se comparten entre sesiones: si el modifiedTime del
+        archivo no cambió desde la última lectura, se devuelven sin descargarlo.
+        Los DataFrames devueltos no deben modificarse (usar .copy()).
+        """
         if not self.is_authenticated():
             return None
 
         try:
-            # Obtener metadata del archivo
+            # Obtener metadata del archivo (única llamada para verificar si cambió)
             master_metadata = self.get_master_file_metadata()
             if not master_metadata:
                 return None
 
-            # Descargar el archivo
-            file_content = self.download_file(master_metadata['id'], master_metadata['nombre'])
-            if not file_content:
+            # La configuración de lectura forma parte de la versión cacheada
+            config = get_config_snapshot()
+            master_config = config.column_mapping['master']
+            file_id = master_metadata['id']
+            modified_time = master_metadata['ultima_modificacion']
+
+            master_cache = get_master_cache()
+            version = master_cache.get(file_id, modified_time, config.config_hash)
+            if version:
+                st.info(
+                    f"⚡ Master sin cambios desde {version.cargado.strftime('%H:%M:%S')}: "
+                    f"usando datos ya cargados"
+                )
+                return dict(version.hojas)
+
+            # Copia Parquet local de la misma versión: evita descargar y parsear el .xlsx
+            master_sidecar = get_master_sidecar()
+            if master_sidecar:
+                copia = master_sidecar.load(file_id, modified_time, config.config_hash)
+                if copia:
+                    hojas, memoria = copia
+                    for sheet_name, df in hojas.items():
+                        st.info(f"✅ Hoja '{sheet_name}' cargada: {len(df):,} registros")
+                    version = master_cache.put(
+                        file_id, modified_time, hojas, config.config_hash, memoria,
+                        master_config.get('columnas_canonicas', ())
+                    )
+                    return dict(version.hojas)
+
+            # Descargar el archivo por partes a un temporal y parsearlo desde ahí
+            archivo_master = self.download_file_to_spool(file_id, master_metadata['nombre'])
+            if archivo_master is None:
                 return None
 
-            # Leer el Excel desde bytes
-            excel_file = io.BytesIO(file_content)
-
-            # SOLO leer las dos hojas específicas de facturas
-            hojas_a_leer = [
-                "Relacion facturas costos fijos",
-                "Relacion facturas mandato"
-            ]
-
-            excel_data = pd.ExcelFile(excel_file)
-            dataframes = {}
-
-            # Leer solo las hojas específicas
-            # IMPORTANTE: header=2 porque las columnas están en la fila 3 (pandas cuenta desde 0)
-            for sheet_name in hojas_a_leer:
-                if sheet_name in excel_data.sheet_names:
-                    df = pd.read_excel(excel_file, sheet_name=sheet_name, header=2)
-                    dataframes[sheet_name] = df
-                    st.info(f"✅ Hoja '{sheet_name}' cargada: {len(df):,} registros")
+            if self.ultima_descarga and self.ultima_descarga['mb_por_segundo']:
+                st.caption(
+                    f"📶 Descarga: {self.ultima_descarga['bytes'] / 1024 / 1024:.1f} MB en "
+                    f"{self.ultima_descarga['segundos']:.1f}s ({self.ultima_descarga['mb_por_segundo']:.1f} MB/s)"
+                )
+
+            # Un solo parseo, solo las hojas y columnas usadas
+            with archivo_master:
+                dataframes, hojas_libro = read_master_sheets(archivo_master, master_config)
+
+            for sheet_name in master_config['sheets']:
+                if sheet_name in dataframes:
+                    st.info(f"✅ Hoja '{sheet_name}' cargada: {len(dataframes[sheet_name]):,} registros")
                 else:
                     st.warning(f"⚠️ Hoja '{sheet_name}' no encontrada en el archivo")
 
             if not dataframes:
                 st.error("❌ No se encontraron las hojas esperadas en el archivo")
                 st.info("📋 Hojas disponibles en el archivo:")
-                for name in excel_data.sheet_names:
+                for name in hojas_libro:
                     st.caption(f"  • {name}")
                 return None
 
-            return dataframes
+            # Tipos compactos (category, fechas ya parseadas, numéricos reducidos)
+            dataframes, memoria = compact_master_sheets(dataframes)
+
+            if master_sidecar:
+                master_sidecar.save(file_id, modified_time, dataframes, config.config_hash, memoria)
+            version = master_cache.put(
+                file_id, modified_time, dataframes, config.config_hash, memoria,
+                master_config.get('columnas_canonicas', ())
+            )
+            return dict(version.hojas)
 
         except Exception as e:
             st.error(f"Error al leer archivo Master: {str(e)}")
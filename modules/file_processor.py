@@ -4,17 +4,400 @@ Clase FileProcessor con funcionalidad completa de consolidación
 """
 
 import pandas as pd
+import numpy as np
 import json
 import re
-from datetime import datetime
-from typing import Dict, Tuple, Optional
+import importlib.util
+import io
+import os
+import shutil
+import tempfile
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, date
+from typing import BinaryIO, Dict, Tuple, Optional, Union
 import logging
+from modules.config_registry import get_config_snapshot
+from modules.upload_cache import get_upload_cache, hash_contenido
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Mapeo de meses en español (formato 'ago-25')
+MESES_ES = ['ene', 'feb', 'mar', 'abr', 'may', 'jun', 'jul', 'ago', 'sep', 'oct', 'nov', 'dic']
+
+# Especificación de las hojas del archivo maestro
+# - ruteo_categorias: {categoria: columna de valor}. None = mapeo_categoria_columna
+#   de product_classification.json
+# - columnas_fijas: columnas de valor constante que también suman al Valor Neto
+# - columnas: orden de salida (nombre_salida, origen). El origen es una columna del
+#   consolidado o una calculada: columnas de valor, 'Valor Neto Facturado',
+#   'Otros Concepto', 'Mes facturacion', 'Revision', 'Fac de la nota Credito'
+# - columnas_nuevas_antes_de: dónde insertar columnas de categorías no listadas
+ESPECIFICACION_HOJAS = {
+    'Relacion facturas Costos Fijos': {
+        'ruteo_categorias': None,
+        'columnas_fijas': {'(-) Retencion en la Fuente': 0.0},
+        'columnas_nuevas_antes_de': '(-) Retencion en la Fuente',
+        'columnas': [
+            ('Codigo del desembolso', 'codigo_operacion'),
+            ('Valor Costos Fijos', 'Valor Costos Fijos'),
+            ('Seguro + Iva', 'Seguro + Iva'),
+            ('Int. Corriente Facturado FK', 'Int. Corriente Facturado FK'),
+            ('Int. Mora Facturado FK', 'Int. Mora Facturado FK'),
+            ('(-) Retencion en la Fuente', '(-) Retencion en la Fuente'),
+            ('Valor Neto Facturado', 'Valor Neto Facturado'),
+            ('Fecha Facturacion', 'fecha_facturacion'),
+            ('# Factura', 'numero_factura'),
+            ('Validacion Consecutivo', 'consecutivo'),
+            ('Revision', 'Revision'),
+            ('Moneda', 'moneda'),
+            ('Codigo Tercero', 'nit_cliente'),
+            ('Otros Concepto', 'Otros Concepto'),
+            ('Otros Valor', 'Otros Valor'),
+            ('Estado', 'estado'),
+            ('Envio', 'envio'),
+            ('Fac de la nota Credito', 'Fac de la nota Credito')
+        ]
+    },
+    'Relación facturas mandato': {
+        'ruteo_categorias': {
+            'intereses_corriente': 'Interes Corriente Facturado',
+            'intereses_mora': 'Interes Mora Facturado Mandato',
+            'otros': 'Otros Valor'
+        },
+        'columnas_fijas': {},
+        'columnas': [
+            ('Codigo del desembolso', 'codigo_operacion'),
+            ('Mes facturacion', 'Mes facturacion'),
+            ('Interes Corriente Facturado', 'Interes Corriente Facturado'),
+            ('Interes Mora Facturado Mandato', 'Interes Mora Facturado Mandato'),
+            ('Valor Neto Facturado', 'Valor Neto Facturado'),
+            ('Fecha Factura', 'fecha_facturacion'),
+            ('# Factura', 'numero_factura'),
+            ('Validacion Consecutivo', 'consecutivo'),
+            ('Revision', 'Revision'),
+            ('Estado', 'estado'),
+            ('Envio', 'envio'),
+            ('Moneda', 'moneda'),
+            ('Codigo Tercero', 'nit_cliente'),
+            ('Otros Concepto', 'Otros Concepto'),
+            ('Otros Valor', 'Otros Valor'),
+            ('Fac de la nota Credito', 'Fac de la nota Credito')
+        ]
+    }
+}
+
+
+# Firmas de formato (primeros bytes del archivo)
+FIRMA_OLE2 = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'  # .xls binario (BIFF)
+FIRMA_ZIP = b'PK\x03\x04'  # .xlsx (OOXML)
+
+# Engine de pandas según formato detectado
+ENGINES_POR_FORMATO = {
+    'xls': 'xlrd',
+    'xlsx': 'openpyxl'
+}
+
+# Lector opcional en Rust (pip install python-calamine); pandas lo conoce desde 2.2
+PANDAS_MINIMO_CALAMINE = (2, 2)
+CALAMINE_DISPONIBLE = (
+    importlib.util.find_spec('python_calamine') is not None
+    and tuple(int(p) for p in re.findall(r'\d+', pd.__version__)[:2]) >= PANDAS_MINIMO_CALAMINE
+)
+_calamine_activo = CALAMINE_DISPONIBLE
+
+
+def usar_calamine() -> bool:
+    """Indica si se intenta leer con calamine (disponible y sin fallas previas en el proceso)"""
+    return _calamine_activo
+
+
+def desactivar_calamine(error: Exception, motivo: str) -> None:
+    """
+    Desactiva calamine para el resto del proceso después de una falla
+
+    Así una instalación incompatible (ej: python-calamine de otra versión)
+    no cuesta un intento fallido en cada lectura; se sigue con el engine
+    por defecto.
+
+    Args:
+        error: Excepción de calamine
+        motivo: Qué se estaba leyendo (para el log)
+    """
+    global _calamine_activo
+    _calamine_activo = False
+    logger.warning(f"⚠️ calamine no pudo leer {motivo}; se desactiva y se usa el engine por defecto: {error}")
+
+
+# Lector de FileProcessor por tipo de archivo cargado: (método, argumentos extra)
+LECTORES_ARCHIVO = {
+    'netsuite_facturas': ('read_netsuite_file', ()),
+    'netsuite_nc': ('read_netsuite_nc_file', ()),
+    'noova_facturas': ('read_noova_file', ('facturas',)),
+    'noova_nc': ('read_noova_file', ('notas_credito',))
+}
+
+# Procesos para la lectura en paralelo (uno por archivo). LECTURA_MAX_WORKERS
+# fija el máximo; sin él se usan los núcleos de la cuota del contenedor (hasta
+# MAX_WORKERS_LECTURA) y, si la memoria está limitada, se lee secuencialmente:
+# cada proceso spawn carga su propio intérprete con pandas y openpyxl
+MAX_WORKERS_LECTURA = 4
+MEMORIA_MINIMA_PARALELO_MB = 2048
+
+
+# Origen de un archivo a leer: ruta, contenido en memoria o archivo abierto
+OrigenArchivo = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+
+class _LectorBuffer(io.RawIOBase):
+    """
+    Archivo de solo lectura sobre un buffer (bytearray/memoryview) sin copiarlo
+
+    io.BytesIO copia bytearray y memoryview al construirse; este lector solo
+    mantiene una vista del buffer original.
+    """
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._buffer = memoryview(buffer).cast('B')
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = len(self._buffer) + offset
+        else:
+            raise ValueError(f"whence inválido: {whence}")
+        if pos < 0:
+            raise ValueError("Posición negativa")
+        self._pos = pos
+        return pos
+
+    def read(self, size: int = -1) -> bytes:
+        fin = len(self._buffer) if size is None or size < 0 else self._pos + size
+        datos = self._buffer[self._pos:fin]
+        self._pos += len(datos)
+        return datos.tobytes()
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def readinto(self, destino) -> int:
+        datos = self._buffer[self._pos:self._pos + len(destino)]
+        n = len(datos)
+        destino[:n] = datos
+        self._pos += n
+        return n
+
+
+def _es_ruta(origen) -> bool:
+    """Indica si el origen es una ruta en disco"""
+    return isinstance(origen, (str, os.PathLike))
+
+
+def _abrir_origen(origen: OrigenArchivo):
+    """
+    Prepara un origen para pandas sin copiar su contenido
+
+    Args:
+        origen: Ruta, bytes, bytearray, memoryview o archivo binario abierto
+
+    Returns:
+        La ruta tal cual o un objeto tipo archivo posicionado al inicio
+    """
+    if _es_ruta(origen):
+        return origen
+    if isinstance(origen, bytes):
+        # BytesIO comparte el buffer de un objeto bytes hasta que se escribe
+        return io.BytesIO(origen)
+    if isinstance(origen, (bytearray, memoryview)):
+        return _LectorBuffer(origen)
+    if hasattr(origen, 'seek'):
+        origen.seek(0)
+    return origen
+
+
+def _leer_contenido(origen: OrigenArchivo):
+    """
+    Obtiene el contenido completo de un origen (sin copiar si ya está en memoria)
+
+    Args:
+        origen: Ruta, bytes, bytearray, memoryview o archivo binario abierto
+
+    Returns:
+        bytes o memoryview con el contenido
+    """
+    if _es_ruta(origen):
+        with open(origen, 'rb') as f:
+            return f.read()
+    if isinstance(origen, (bytes, bytearray, memoryview)):
+        return memoryview(origen).cast('B')
+    if hasattr(origen, 'getbuffer'):
+        return origen.getbuffer()
+    origen.seek(0)
+    return origen.read()
+
+
+def _volcar_a_disco(origen: OrigenArchivo, directorio: str, nombre: str) -> Union[str, os.PathLike]:
+    """
+    Deja un origen en disco para enviarlo a otro proceso por su ruta
+
+    Los contenidos en memoria se escriben desde su buffer: getvalue() o
+    bytes() copiarían el archivo completo en este proceso, y pickle lo
+    copiaría otra vez al enviarlo al pool.
+
+    Args:
+        origen: Ruta, bytes, bytearray, memoryview o archivo binario abierto
+        directorio: Directorio temporal donde escribir
+        nombre: Nombre del archivo dentro del directorio
+
+    Returns:
+        Ruta del archivo (la misma si el origen ya era una ruta)
+    """
+    if _es_ruta(origen):
+        return origen
+    ruta = os.path.join(directorio, nombre)
+    with open(ruta, 'wb') as destino:
+        if isinstance(origen, (bytes, bytearray, memoryview)) or hasattr(origen, 'getbuffer'):
+            destino.write(_leer_contenido(origen))
+        else:
+            origen.seek(0)
+            shutil.copyfileobj(origen, destino)
+    return ruta
+
+
+def _leer_cgroup(*rutas: str) -> Optional[str]:
+    """Contenido del primer archivo de cgroup que exista (None si ninguno)"""
+    for ruta in rutas:
+        try:
+            with open(ruta) as f:
+                return f.read().strip()
+        except OSError:
+            continue
+    return None
+
+
+def _nucleos_disponibles() -> int:
+    """
+    Núcleos que puede usar el proceso: afinidad limitada por la cuota de CPU del cgroup
+
+    sched_getaffinity ve todos los núcleos del host aunque el contenedor
+    tenga una cuota (ej: cpu.max = '50000 100000' es medio núcleo).
+    """
+    nucleos = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+
+    cuota = _leer_cgroup('/sys/fs/cgroup/cpu.max')  # cgroup v2: "<cuota> <periodo>" o "max <periodo>"
+    if cuota is not None:
+        partes = cuota.split()
+        if len(partes) == 2 and partes[0] != 'max':
+            nucleos = min(nucleos, int(partes[0]) // max(1, int(partes[1])))
+    else:  # cgroup v1: cuota -1 = sin límite
+        cuota = _leer_cgroup('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+        periodo = _leer_cgroup('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+        if cuota and periodo and int(cuota) > 0:
+            nucleos = min(nucleos, int(cuota) // max(1, int(periodo)))
+
+    return max(1, nucleos)
+
+
+def _limite_memoria_mb() -> Optional[float]:
+    """Límite de memoria del cgroup en MB (None = sin límite o desconocido)"""
+    limite = _leer_cgroup('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes')
+    if not limite or limite == 'max':
+        return None
+    limite = int(limite)
+    # cgroup v1 sin límite reporta un valor cercano a 2**63
+    return limite / (1024 * 1024) if limite < 2 ** 60 else None
+
+
+def max_workers_lectura() -> int:
+    """
+    Máximo de procesos para leer archivos en paralelo
+
+    LECTURA_MAX_WORKERS (1 = secuencial) tiene prioridad; sin él se lee
+    secuencialmente si el contenedor tiene menos de MEMORIA_MINIMA_PARALELO_MB,
+    y si no, con los núcleos de la cuota de CPU (hasta MAX_WORKERS_LECTURA).
+
+    Returns:
+        Número de procesos (1 = lectura secuencial)
+    """
+    configurado = os.getenv('LECTURA_MAX_WORKERS')
+    if configurado:
+        return max(1, int(configurado))
+
+    limite_mb = _limite_memoria_mb()
+    if limite_mb is not None and limite_mb < MEMORIA_MINIMA_PARALELO_MB:
+        return 1
+    return min(MAX_WORKERS_LECTURA, _nucleos_disponibles())
+
+
+def _describir_origen(origen: OrigenArchivo) -> str:
+    """Texto para logs que identifica el origen de un archivo"""
+    if _es_ruta(origen):
+        return str(origen)
+    nombre = getattr(origen, 'name', None)
+    if isinstance(nombre, str):
+        return nombre
+    if isinstance(origen, (bytes, bytearray, memoryview)):
+        return f"<{memoryview(origen).nbytes} bytes en memoria>"
+    return "<archivo en memoria>"
+
+
+def detect_excel_format(file_path: OrigenArchivo) -> str:
+    """
+    Detecta el formato real de un archivo Excel por sus bytes iniciales
+
+    Args:
+        file_path: Ruta al archivo o contenido en memoria (bytes, memoryview o archivo abierto)
+
+    Returns:
+        'xls' (OLE2), 'xlsx' (ZIP/OOXML) o 'html' (HTML exportado como .xls)
+
+    Raises:
+        ValueError: Si el formato no se reconoce
+    """
+    if _es_ruta(file_path):
+        with open(file_path, 'rb') as f:
+            inicio = f.read(1024)
+    elif isinstance(file_path, (bytes, bytearray, memoryview)):
+        inicio = bytes(memoryview(file_path).cast('B')[:1024])
+    else:
+        posicion = file_path.tell()
+        file_path.seek(0)
+        inicio = file_path.read(1024)
+        file_path.seek(posicion)
+
+    if inicio.startswith(FIRMA_OLE2):
+        return 'xls'
+    if inicio.startswith(FIRMA_ZIP):
+        return 'xlsx'
+
+    texto = inicio.lstrip(b'\xef\xbb\xbf \t\r\n').lower()
+    if texto.startswith(b'<') and (b'<html' in texto or b'<table' in texto or b'<!doctype html' in texto):
+        return 'html'
+
+    raise ValueError(
+        f"Formato de archivo no reconocido (no es .xls, .xlsx ni HTML): {_describir_origen(file_path)}"
+    )
+
+
 class FileProcessor:
     """
     Procesador de archivos Excel para consolidación de facturas
@@ -34,15 +417,24 @@ class FileProcessor:
             classification_rules_path: Ruta al JSON de reglas de clasificación
             product_classification_path: Ruta al JSON de clasificación de productos
         """
+        self.config_paths = (column_mapping_path, classification_rules_path, product_classification_path)
+
         try:
-            with open(column_mapping_path, 'r', encoding='utf-8') as f:
-                self.column_mapping = json.load(f)
+            # Configuración compartida por proceso: solo se relee si el JSON cambió
+            self.config = get_config_snapshot(
+                column_mapping_path,
+                classification_rules_path,
+                product_classification_path
+            )
 
-            with open(classification_rules_path, 'r', encoding='utf-8') as f:
-                self.classification_rules = json.load(f)
+            self.column_mapping = self.config.column_mapping
+            self.classification_rules = self.config.classification_rules
+            self.product_classification = self.config.product_classification
 
-            with open(product_classification_path, 'r', encoding='utf-8') as f:
-                self.product_classification = json.load(f)
+            # Extractor de prefijo/consecutivo y tabla de clasificación precompilados
+            self.prefijos = self.config.prefijos
+            self.patron_factura = self.config.patron_factura
+            self.tabla_clasificacion = self.config.tabla_clasificacion
 
             logger.info("✅ Configuraciones cargadas correctamente")
         except FileNotFoundError as e:
@@ -52,86 +444,59 @@ class FileProcessor:
             logger.error(f"❌ Error al decodificar JSON: {e}")
             raise
 
-    def read_netsuite_file(self, file_path: str) -> pd.DataFrame:
+    def read_netsuite_file(self, file_path: OrigenArchivo) -> pd.DataFrame:
         """
         Lee archivo Netsuite (.xls) y retorna DataFrame normalizado
 
         Args:
-            file_path: Ruta al archivo .xls de Netsuite
+            file_path: Ruta al archivo .xls de Netsuite o su contenido en memoria
 
         Returns:
             DataFrame con columnas: numero_factura, moneda, valor_netsuite
         """
-        try:
-            config = self.column_mapping['netsuite']
-            sheet_name = config['sheet_name']
-            cols = config['columns']
+        return self._read_netsuite(file_path, 'netsuite', 'Netsuite')
 
-            # Intentar leer con openpyxl primero (soporta .xls y .xlsx modernos)
-            # Si falla, intentar con xlrd (archivos .xls antiguos)
-            try:
-                df = pd.read_excel(file_path, sheet_name=sheet_name, engine='openpyxl')
-                logger.info("✅ Archivo leído con openpyxl (formato moderno)")
-            except Exception as e1:
-                try:
-                    df = pd.read_excel(file_path, sheet_name=sheet_name, engine='xlrd')
-                    logger.info("✅ Archivo leído con xlrd (formato antiguo)")
-                except Exception as e2:
-                    raise Exception(f"No se pudo leer el archivo con ningún engine. Openpyxl: {str(e1)}, Xlrd: {str(e2)}")
-
-            # Renombrar columnas según mapeo
-            df_renamed = df.rename(columns={
-                cols['numero_factura']: 'numero_factura',
-                cols['moneda']: 'moneda',
-                cols['valor']: 'valor_netsuite'
-            })
-
-            # Seleccionar solo las columnas necesarias
-            df_result = df_renamed[['numero_factura', 'moneda', 'valor_netsuite']].copy()
-
-            # Limpiar y normalizar numero_factura
-            df_result['numero_factura'] = df_result['numero_factura'].astype(str).str.strip().str.upper()
-
-            # Convertir valor a numérico
-            df_result['valor_netsuite'] = pd.to_numeric(df_result['valor_netsuite'], errors='coerce')
-
-            # Remover filas sin número de factura válido
-            df_result = df_result[df_result['numero_factura'].notna()]
-            df_result = df_result[df_result['numero_factura'] != 'NAN']
+    def read_netsuite_nc_file(self, file_path: OrigenArchivo) -> pd.DataFrame:
+        """
+        Lee archivo Netsuite Notas de Crédito (.xls) y retorna DataFrame normalizado
 
-            logger.info(f"✅ Netsuite: {len(df_result)} registros leídos de {file_path}")
-            return df_result
+        Args:
+            file_path: Ruta al archivo .xls de Netsuite NC o su contenido en memoria
 
-        except Exception as e:
-            logger.error(f"❌ Error al leer archivo Netsuite: {e}")
-            raise
+        Returns:
+            DataFrame con columnas: numero_factura, moneda, valor_netsuite
+        """
+        return self._read_netsuite(file_path, 'netsuite_nc', 'Netsuite NC')
 
-    def read_netsuite_nc_file(self, file_path: str) -> pd.DataFrame:
+    def _read_netsuite(self, file_path: OrigenArchivo, config_key: str, etiqueta: str) -> pd.DataFrame:
         """
-        Lee archivo Netsuite Notas de Crédito (.xls) y retorna DataFrame normalizado
+        Lee un export de Netsuite (facturas o notas de crédito)
+
+        El formato real se detecta por los bytes iniciales del archivo
+        (.xls OLE2, .xlsx ZIP o HTML con extensión .xls) y se lee
+        directamente con el engine correspondiente.
 
         Args:
-            file_path: Ruta al archivo .xls de Netsuite NC
+            file_path: Ruta al archivo de Netsuite, bytes, memoryview o archivo abierto
+            config_key: Llave en column_mapping.json ('netsuite' o 'netsuite_nc')
+            etiqueta: Nombre para los mensajes de log
 
         Returns:
             DataFrame con columnas: numero_factura, moneda, valor_netsuite
         """
         try:
-            config = self.column_mapping['netsuite_nc']
+            config = self.column_mapping[config_key]
             sheet_name = config['sheet_name']
             cols = config['columns']
 
-            # Intentar leer con openpyxl primero (soporta .xls y .xlsx modernos)
-            # Si falla, intentar con xlrd (archivos .xls antiguos)
-            try:
-                df = pd.read_excel(file_path, sheet_name=sheet_name, engine='openpyxl')
-                logger.info("✅ Archivo NC leído con openpyxl (formato moderno)")
-            except Exception as e1:
-                try:
-                    df = pd.read_excel(file_path, sheet_name=sheet_name, engine='xlrd')
-                    logger.info("✅ Archivo NC leído con xlrd (formato antiguo)")
-                except Exception as e2:
-                    raise Exception(f"No se pudo leer el archivo NC con ningún engine. Openpyxl: {str(e1)}, Xlrd: {str(e2)}")
+            formato = detect_excel_format(file_path)
+
+            if formato == 'html':
+                df = self._read_html_table(file_path, cols)
+            else:
+                df = self._read_mapped_excel(
+                    file_path, sheet_name, cols, config.get('dtypes', {}), formato=formato
+                )
 
             # Renombrar columnas según mapeo
             df_renamed = df.rename(columns={
@@ -153,19 +518,63 @@ class FileProcessor:
             df_result = df_result[df_result['numero_factura'].notna()]
             df_result = df_result[df_result['numero_factura'] != 'NAN']
 
-            logger.info(f"✅ Netsuite NC: {len(df_result)} registros leídos de {file_path}")
+            logger.info(f"✅ {etiqueta}: {len(df_result)} registros leídos de {_describir_origen(file_path)} (formato {formato})")
             return df_result
 
         except Exception as e:
-            logger.error(f"❌ Error al leer archivo Netsuite NC: {e}")
+            logger.error(f"❌ Error al leer archivo {etiqueta}: {e}")
             raise
 
-    def read_noova_file(self, file_path: str, file_type: str) -> pd.DataFrame:
+    def _read_html_table(self, file_path: OrigenArchivo, cols: Dict[str, str]) -> pd.DataFrame:
+        """
+        Lee un export HTML con extensión .xls (formato habitual de Netsuite)
+
+        Busca la primera tabla que contenga todas las columnas mapeadas, aunque
+        el encabezado no esté en la primera fila.
+
+        Args:
+            file_path: Ruta al archivo HTML o su contenido en memoria
+            cols: Mapeo {nombre_lógico: nombre_columna}
+
+        Returns:
+            DataFrame con encabezados tomados de la fila detectada
+        """
+        requeridas = set(cols.values())
+
+        contenido = _leer_contenido(file_path)
+
+        # Netsuite no siempre declara charset: UTF-8 y si falla Windows-1252
+        try:
+            html = str(contenido, 'utf-8-sig')
+        except UnicodeDecodeError:
+            html = str(contenido, 'cp1252', errors='replace')
+
+        tablas = pd.read_html(io.StringIO(html), header=None)
+
+        for tabla in tablas:
+            # Encabezado ya reconocido por pandas (<thead>/<th>)
+            if requeridas.issubset(set(tabla.columns.astype(str).str.strip())):
+                tabla.columns = tabla.columns.astype(str).str.strip()
+                return tabla[list(dict.fromkeys(cols.values()))]
+
+            # Buscar la fila de encabezado entre las primeras filas de la tabla
+            for fila in range(min(len(tabla), 20)):
+                encabezado = tabla.iloc[fila].astype(str).str.strip()
+                if requeridas.issubset(set(encabezado)):
+                    df = tabla.iloc[fila + 1:].reset_index(drop=True)
+                    df.columns = encabezado.tolist()
+                    return df[list(dict.fromkeys(cols.values()))]
+
+        raise ValueError(
+            f"No se encontró una tabla con las columnas esperadas: {', '.join(sorted(requeridas))}"
+        )
+
+    def read_noova_file(self, file_path: OrigenArchivo, file_type: str) -> pd.DataFrame:
         """
         Lee archivo Noova (.xlsx) de facturas o notas de crédito
 
         Args:
-            file_path: Ruta al archivo .xlsx de Noova
+            file_path: Ruta al archivo .xlsx de Noova o su contenido en memoria
             file_type: 'facturas' o 'notas_credito'
 
         Returns:
@@ -181,8 +590,8 @@ class FileProcessor:
             sheet_name = config['sheet_name']
             cols = config['columns']
 
-            # Leer archivo
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
+            # Leer solo las columnas mapeadas, con tipos declarados
+            df = self._read_mapped_excel(file_path, sheet_name, cols, config.get('dtypes', {}))
 
             # Renombrar columnas según mapeo
             df_renamed = df.rename(columns={
@@ -217,13 +626,240 @@ class FileProcessor:
             df_result = df_result[df_result['numero_factura'].notna()]
             df_result = df_result[df_result['numero_factura'] != 'NAN']
 
-            logger.info(f"✅ Noova {file_type}: {len(df_result)} registros leídos de {file_path}")
+            logger.info(f"✅ Noova {file_type}: {len(df_result)} registros leídos de {_describir_origen(file_path)}")
             return df_result
 
         except Exception as e:
             logger.error(f"❌ Error al leer archivo Noova ({file_type}): {e}")
             raise
 
+    def _read_mapped_excel(
+        self,
+        file_path: OrigenArchivo,
+        sheet_name: str,
+        cols: Dict[str, str],
+        dtypes: Dict[str, str],
+        formato: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        Lee únicamente las columnas mapeadas de una hoja Excel
+
+        Las columnas no mapeadas nunca se materializan (usecols). Los tipos
+        texto se declaran al leer; los enteros nulables ('Int64') se convierten
+        después de leer para tolerar celdas con texto o decimales.
+
+        Args:
+            file_path: Ruta al archivo Excel, bytes, memoryview o archivo abierto
+            sheet_name: Nombre de la hoja
+            cols: Mapeo {nombre_lógico: nombre_columna_excel}
+            dtypes: Tipos por nombre lógico (ej: {'nit': 'str', 'codigo_producto': 'Int64'})
+            formato: 'xls' o 'xlsx' si ya se detectó (None = detectar)
+
+        Returns:
+            DataFrame con las columnas originales del Excel
+        """
+        if formato is None:
+            formato = detect_excel_format(file_path)
+        if formato not in ENGINES_POR_FORMATO:
+            raise ValueError(f"Formato '{formato}' no soportado para esta hoja: se esperaba .xls o .xlsx")
+
+        dtype_lectura = {}
+        enteros = []
+        for nombre_logico, tipo in dtypes.items():
+            if nombre_logico not in cols:
+                continue
+            if tipo == 'Int64':
+                enteros.append(cols[nombre_logico])
+            else:
+                dtype_lectura[cols[nombre_logico]] = tipo
+
+        opciones = {
+            'sheet_name': sheet_name,
+            'usecols': list(dict.fromkeys(cols.values())),
+            'dtype': dtype_lectura or None
+        }
+
+        df = None
+        if usar_calamine():
+            try:
+                df = pd.read_excel(_abrir_origen(file_path), engine='calamine', **opciones)
+            except Exception as e:
+                desactivar_calamine(e, _describir_origen(file_path))
+        if df is None:
+            df = pd.read_excel(_abrir_origen(file_path), engine=ENGINES_POR_FORMATO[formato], **opciones)
+
+        for columna in enteros:
+            # Misma regla que normalize_product_code: int(float(valor)), inválidos a nulo
+            numeros = pd.to_numeric(df[columna], errors='coerce')
+            numeros = np.trunc(numeros.where(np.isfinite(numeros)))
+            df[columna] = numeros.astype('Int64')
+
+        return df
+
+    def read_files_parallel(
+        self,
+        archivos: Dict[str, Optional[OrigenArchivo]],
+        max_workers: Optional[int] = None,
+        usar_cache: bool = True
+    ) -> Tuple[Dict[str, Optional[pd.DataFrame]], Dict[str, float]]:
+        """
+        Lee en paralelo los archivos cargados (un proceso por archivo)
+
+        openpyxl es Python puro, así que cada archivo se parsea en un proceso
+        separado para usar varios núcleos. Si no se puede crear el pool
+        (ej: sin permisos para lanzar procesos) se lee de forma secuencial;
+        con poca memoria o LECTURA_MAX_WORKERS=1 se lee secuencialmente desde
+        el inicio (ver max_workers_lectura).
+
+        Los archivos ya procesados con la misma configuración se toman de la
+        caché en disco (upload_cache) sin volver a parsear el Excel.
+
+        Args:
+            archivos: {tipo: ruta o contenido} con tipos de LECTORES_ARCHIVO
+                ('netsuite_facturas', 'netsuite_nc', 'noova_facturas', 'noova_nc');
+                valores None se omiten. Los contenidos en memoria se envían a
+                los procesos como archivos temporales.
+            max_workers: Máximo de procesos (None = uno por archivo, hasta max_workers_lectura())
+            usar_cache: Consultar y alimentar la caché de archivos procesados
+
+        Returns:
+            Tupla (dataframes por tipo (None si no se cargó), segundos de lectura por tipo)
+        """
+        dataframes = {tipo: None for tipo in archivos}
+        tiempos = {}
+        pendientes = {tipo: origen for tipo, origen in archivos.items() if origen is not None}
+
+        for tipo in pendientes:
+            if tipo not in LECTORES_ARCHIVO:
+                raise ValueError(f"Tipo de archivo desconocido: {tipo}")
+
+        inicio = time.perf_counter()
+
+        cache = get_upload_cache() if usar_cache else None
+        llaves = {}
+        if cache is not None:
+            for tipo, origen in list(pendientes.items()):
+                inicio_cache = time.perf_counter()
+                llaves[tipo] = cache.make_key(
+                    hash_contenido(_leer_contenido(origen)), self.config.config_hash, tipo
+                )
+                df = cache.get(llaves[tipo])
+                if df is not None:
+                    dataframes[tipo] = df
+                    tiempos[tipo] = time.perf_counter() - inicio_cache
+                    del pendientes[tipo]
+                    logger.info(f"⚡ {tipo}: {len(df)} registros tomados de la caché")
+
+        leidos = list(pendientes)
+        workers = min(len(pendientes), max_workers or max_workers_lectura())
+
+        if workers > 1:
+            for tipo, (df, segundos) in self._leer_en_procesos(pendientes, workers).items():
+                dataframes[tipo], tiempos[tipo] = df, segundos
+                del pendientes[tipo]
+
+        for tipo, origen in pendientes.items():
+            dataframes[tipo], tiempos[tipo] = _leer_archivo(self.config_paths, tipo, origen, self)
+
+        if cache is not None:
+            for tipo in leidos:
+                cache.put(llaves[tipo], dataframes[tipo])
+
+        total = time.perf_counter() - inicio
+        logger.info(
+            f"⏱️ Lectura de {len(tiempos)} archivos: {total:.1f}s "
+            f"(suma individual {sum(tiempos.values()):.1f}s)"
+        )
+        return dataframes, tiempos
+
+    def _leer_en_procesos(
+        self,
+        pendientes: Dict[str, OrigenArchivo],
+        workers: int
+    ) -> Dict[str, Tuple[pd.DataFrame, float]]:
+        """
+        Lee archivos en un pool de procesos spawn (los contenidos viajan por disco)
+
+        Si el pool no se puede iniciar o se cae (ej: un proceso muere por
+        falta de memoria) se devuelven solo los archivos ya leídos, para
+        leer el resto secuencialmente. Los errores al leer un archivo se
+        propagan.
+
+        Args:
+            pendientes: {tipo: origen} a leer
+            workers: Número de procesos
+
+        Returns:
+            {tipo: (DataFrame, segundos de lectura)} de los archivos leídos
+        """
+        leidos = {}
+        with tempfile.TemporaryDirectory(prefix='lectura_') as directorio:
+            try:
+                pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            except (OSError, NotImplementedError) as e:
+                logger.warning(f"⚠️ No se pudo crear el pool de lectura, leyendo secuencialmente: {e}")
+                return leidos
+
+            with pool:
+                try:
+                    futuros = {
+                        pool.submit(
+                            _leer_archivo, self.config_paths, tipo, _volcar_a_disco(origen, directorio, tipo)
+                        ): tipo
+                        for tipo, origen in pendientes.items()
+                    }
+                except (OSError, NotImplementedError, BrokenProcessPool) as e:
+                    pool.shutdown(cancel_futures=True)
+                    logger.warning(f"⚠️ No se pudo iniciar la lectura en paralelo, leyendo secuencialmente: {e}")
+                    return leidos
+
+                try:
+                    for futuro in as_completed(futuros):
+                        leidos[futuros[futuro]] = futuro.result()
+                except BrokenProcessPool as e:
+                    logger.warning(f"⚠️ Se cayó el pool de lectura, leyendo secuencialmente el resto: {e}")
+
+        return leidos
+
+    def extract_prefix_and_consecutive(self, numeros_factura: pd.Series) -> pd.DataFrame:
+        """
+        Extrae prefijo y consecutivo de una columna completa de números de factura
+
+        Equivalente vectorizado de extract_prefix + extract_consecutive.
+
+        Args:
+            numeros_factura: Series con números de factura
+
+        Returns:
+            DataFrame (mismo índice) con columnas 'prefijo' y 'consecutivo'
+        """
+        # Cada factura aparece en varias líneas: resolver una vez por valor único
+        codigos, unicos = pd.factorize(numeros_factura, use_na_sentinel=True)
+
+        prefijos = np.full(len(unicos) + 1, 'DESCONOCIDO', dtype=object)
+        consecutivos = np.full(len(unicos) + 1, np.nan)
+
+        for i, numero in enumerate(unicos):
+            if not isinstance(numero, str):
+                continue
+            match = self.patron_factura.match(numero.strip().upper())
+            if match is None:
+                continue
+            if match.group('prefijo'):
+                prefijos[i] = match.group('prefijo')
+            if match.group('consecutivo'):
+                consecutivos[i] = int(match.group('consecutivo'))
+
+        # El código -1 (valores nulos) apunta a la última posición: DESCONOCIDO / NaN
+        consecutivo = pd.Series(consecutivos[codigos], index=numeros_factura.index)
+        if consecutivo.notna().all():
+            consecutivo = consecutivo.astype('int64')
+
+        return pd.DataFrame({
+            'prefijo': prefijos[codigos],
+            'consecutivo': consecutivo
+        }, index=numeros_factura.index)
+
     def extract_prefix(self, numero_factura: str) -> str:
         """
         Extrae el prefijo de un número de factura
@@ -237,14 +873,10 @@ class FileProcessor:
         if not isinstance(numero_factura, str):
             return 'DESCONOCIDO'
 
-        numero_factura = numero_factura.strip().upper()
+        match = self.patron_factura.match(numero_factura.strip().upper())
 
-        # Orden de prioridad de prefijos (más largo primero)
-        prefijos = ['NCFE', 'ITPA', 'ITGC', 'FE', 'GL']
-
-        for prefijo in prefijos:
-            if numero_factura.startswith(prefijo):
-                return prefijo
+        if match and match.group('prefijo'):
+            return match.group('prefijo')
 
         return 'DESCONOCIDO'
 
@@ -332,6 +964,52 @@ class FileProcessor:
         # Si no se encuentra el código, es no clasificado
         return ('sin_clasificar', 'Sin Clasificar', f'Codigo {codigo_normalizado} no encontrado')
 
+    def classify_products(self, codigos_producto: pd.Series) -> pd.DataFrame:
+        """
+        Clasifica una columna completa de códigos de producto
+
+        Equivalente vectorizado de classify_by_product_code: normaliza cada
+        código distinto una sola vez y resuelve la clasificación con un
+        único cruce contra la tabla de clasificación.
+
+        Args:
+            codigos_producto: Series con códigos de producto
+
+        Returns:
+            DataFrame (mismo índice) con columnas categoria, columna_destino
+            y descripcion_producto
+        """
+        codigos, unicos = pd.factorize(codigos_producto, use_na_sentinel=True)
+        normalizados = pd.Index([self.normalize_product_code(c) for c in unicos], dtype=object)
+
+        clasificacion = self.tabla_clasificacion.reindex(normalizados)
+
+        # Códigos no encontrados en la tabla
+        no_encontrados = clasificacion['categoria'].isna().to_numpy()
+        clasificacion.loc[no_encontrados, 'categoria'] = 'sin_clasificar'
+        clasificacion.loc[no_encontrados, 'columna_destino'] = 'Sin Clasificar'
+        clasificacion.loc[no_encontrados, 'descripcion'] = [
+            f'Codigo {c} no encontrado' if c else 'Sin codigo producto'
+            for c in normalizados[no_encontrados]
+        ]
+
+        # Última posición para códigos nulos (factorize los marca con -1)
+        sin_codigo = {
+            'categoria': 'sin_clasificar',
+            'columna_destino': 'Sin Clasificar',
+            'descripcion': 'Sin codigo producto'
+        }
+
+        def expandir(columna: str) -> np.ndarray:
+            valores = np.append(clasificacion[columna].to_numpy(dtype=object), sin_codigo[columna])
+            return valores[codigos]
+
+        return pd.DataFrame({
+            'categoria': expandir('categoria'),
+            'columna_destino': expandir('columna_destino'),
+            'descripcion_producto': expandir('descripcion')
+        }, index=codigos_producto.index)
+
     def classify_concept(self, concepto: str) -> Tuple[str, str]:
         """
         Clasifica un concepto según las reglas de clasificación
@@ -463,14 +1141,15 @@ class FileProcessor:
             logger.info(f"🔗 JOIN completado: {len(df_consolidated)} registros")
 
             # Extraer prefijo y consecutivo
-            df_consolidated['prefijo'] = df_consolidated['numero_factura'].apply(self.extract_prefix)
-            df_consolidated['consecutivo'] = df_consolidated['numero_factura'].apply(self.extract_consecutive)
+            partes_factura = self.extract_prefix_and_consecutive(df_consolidated['numero_factura'])
+            df_consolidated['prefijo'] = partes_factura['prefijo']
+            df_consolidated['consecutivo'] = partes_factura['consecutivo']
 
             # Clasificar por código de producto (nuevo método)
-            clasificacion = df_consolidated['codigo_producto'].apply(self.classify_by_product_code)
-            df_consolidated['categoria'] = clasificacion.apply(lambda x: x[0])
-            df_consolidated['columna_destino'] = clasificacion.apply(lambda x: x[1])
-            df_consolidated['descripcion_producto'] = clasificacion.apply(lambda x: x[2])
+            clasificacion = self.classify_products(df_consolidated['codigo_producto'])
+            df_consolidated['categoria'] = clasificacion['categoria']
+            df_consolidated['columna_destino'] = clasificacion['columna_destino']
+            df_consolidated['descripcion_producto'] = clasificacion['descripcion_producto']
 
             # Determinar tipo de factura y hoja destino según prefijo
             tipo_factura_map = self.classification_rules.get('tipo_factura_por_prefijo', {})
@@ -522,11 +1201,9 @@ class FileProcessor:
 
                 df_hoja = df_consolidated[df_consolidated['hoja_destino'] == hoja].copy()
 
-                # Preparar según tipo de hoja
-                if hoja == 'Relacion facturas Costos Fijos':
-                    df_preparado = self._prepare_costos_fijos(df_hoja)
-                elif hoja == 'Relación facturas mandato':
-                    df_preparado = self._prepare_interes(df_hoja)
+                # Preparar según la especificación de la hoja
+                if hoja in ESPECIFICACION_HOJAS:
+                    df_preparado = self._prepare_hoja(df_hoja, ESPECIFICACION_HOJAS[hoja])
                 else:
                     # Hoja genérica
                     df_preparado = df_hoja
@@ -540,6 +1217,123 @@ class FileProcessor:
             logger.error(f"❌ Error al preparar hojas: {e}")
             raise
 
+    def _prepare_hoja(self, df: pd.DataFrame, spec: Dict) -> pd.DataFrame:
+        """
+        Prepara una hoja del archivo maestro a partir de su especificación
+
+        Todas las columnas se calculan con operaciones sobre columnas completas,
+        sin recorrer filas.
+
+        Args:
+            df: DataFrame consolidado filtrado a la hoja
+            spec: Especificación de la hoja (ver ESPECIFICACION_HOJAS)
+
+        Returns:
+            DataFrame con las columnas de salida en el orden de la especificación
+        """
+        ruteo = spec.get('ruteo_categorias')
+        if ruteo is None:
+            ruteo = self.product_classification.get('mapeo_categoria_columna', {})
+
+        # Distribuir valores según categoría
+        valores = self._distribuir_valores_por_categoria(df, ruteo)
+
+        calculadas = {columna: valores[columna] for columna in valores.columns}
+        for columna, valor in spec.get('columnas_fijas', {}).items():
+            calculadas[columna] = pd.Series(valor, index=df.index, dtype=float)
+
+        # Valor Neto Facturado = suma de columnas de valor + columnas fijas
+        valor_neto = valores.sum(axis=1)
+        for columna in spec.get('columnas_fijas', {}):
+            valor_neto = valor_neto + calculadas[columna]
+        calculadas['Valor Neto Facturado'] = valor_neto
+
+        calculadas['Otros Concepto'] = self._concepto_otros(df)
+        calculadas['Revision'] = pd.Series('', index=df.index, dtype=object)  # Campo vacío para revisión manual
+        calculadas['Fac de la nota Credito'] = pd.Series(
+            np.where(df['fuente_noova'] == 'notas_credito', 'Nota Credito', ''),
+            index=df.index,
+            dtype=object
+        )
+        if 'fecha_facturacion' in df.columns:
+            calculadas['Mes facturacion'] = self._format_mes_facturacion_series(df['fecha_facturacion'])
+
+        # Construir columnas de salida en el orden declarado
+        columnas_salida = {}
+        for nombre_salida, origen in spec['columnas']:
+            columnas_salida[nombre_salida] = calculadas[origen] if origen in calculadas else df[origen]
+
+        df_result = pd.DataFrame(columnas_salida, index=df.index)
+
+        # Categorías nuevas del mapeo: agregar su columna en la posición indicada
+        columnas_nuevas = [c for c in valores.columns if c not in df_result.columns]
+        if columnas_nuevas:
+            referencia = spec.get('columnas_nuevas_antes_de')
+            if referencia in df_result.columns:
+                posicion = df_result.columns.get_loc(referencia)
+            else:
+                posicion = len(df_result.columns)
+            for columna in columnas_nuevas:
+                df_result.insert(posicion, columna, valores[columna])
+                posicion += 1
+
+        return df_result
+
+    def _distribuir_valores_por_categoria(self, df: pd.DataFrame, mapeo_columnas: Dict[str, str]) -> pd.DataFrame:
+        """
+        Distribuye valor_netsuite en columnas según la categoría de cada fila
+
+        Cada fila aporta su valor únicamente a la columna de su categoría;
+        las demás columnas quedan en 0.0. Filas sin valor o con categoría
+        fuera del mapeo quedan en 0.0 en todas las columnas.
+
+        Args:
+            df: DataFrame con columnas 'categoria' y 'valor_netsuite'
+            mapeo_columnas: Diccionario {categoria: columna_destino}
+
+        Returns:
+            DataFrame (mismo índice que df) con una columna float por columna destino
+        """
+        columnas = list(dict.fromkeys(mapeo_columnas.values()))
+        posicion_columna = {columna: i for i, columna in enumerate(columnas)}
+
+        if 'valor_netsuite' in df.columns:
+            valores = pd.to_numeric(df['valor_netsuite'], errors='coerce').to_numpy(dtype=float)
+        else:
+            valores = np.zeros(len(df))
+
+        # Índice de columna destino por fila (-1 si la categoría no está mapeada)
+        categorias = list(mapeo_columnas.keys())
+        codigos = pd.Categorical(df['categoria'], categories=categorias).codes
+        destino_por_categoria = np.array(
+            [posicion_columna[mapeo_columnas[c]] for c in categorias] + [-1], dtype=np.intp
+        )
+        destino = destino_por_categoria[codigos]
+
+        filas = np.flatnonzero((destino >= 0) & ~np.isnan(valores))
+        matriz = np.zeros((len(df), len(columnas)))
+        matriz[filas, destino[filas]] = valores[filas]
+
+        return pd.DataFrame(matriz, index=df.index, columns=columnas)
+
+    def _concepto_otros(self, df: pd.DataFrame) -> pd.Series:
+        """
+        Obtiene la descripción del producto para filas de categoría 'otros' con valor
+
+        Args:
+            df: DataFrame con columnas 'categoria', 'valor_netsuite' y 'descripcion_producto'
+
+        Returns:
+            Series con la descripción o '' para el resto de filas
+        """
+        con_valor = df['valor_netsuite'].notna() if 'valor_netsuite' in df.columns else True
+        es_otros = (df['categoria'] == 'otros') & con_valor
+        if 'descripcion_producto' in df.columns:
+            descripcion = df['descripcion_producto']
+        else:
+            descripcion = pd.Series('', index=df.index)
+        return descripcion.where(es_otros, '')
+
     def _prepare_costos_fijos(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Prepara datos para hoja 'Relacion facturas Costos Fijos'
@@ -550,70 +1344,7 @@ class FileProcessor:
         Fecha Facturacion, # Factura, Validacion Consecutivo, Revision,
         Moneda, Estado, Envio, Fac de la nota Crédito
         """
-        # Inicializar columnas de valores
-        df['Valor Costos Fijos'] = 0.0
-        df['Seguro + Iva'] = 0.0
-        df['Int. Corriente Facturado FK'] = 0.0
-        df['Int. Mora Facturado FK'] = 0.0
-        df['Otros Valor'] = 0.0
-        df['Otros Concepto'] = ''
-
-        # Distribuir valores según categoría
-        for idx, row in df.iterrows():
-            categoria = row['categoria']
-            valor = row.get('valor_netsuite', 0)
-
-            if pd.notna(valor):
-                if categoria == 'costos_fijos':
-                    df.at[idx, 'Valor Costos Fijos'] = valor
-                elif categoria == 'seguro_iva':
-                    df.at[idx, 'Seguro + Iva'] = valor
-                elif categoria == 'intereses_corriente':
-                    df.at[idx, 'Int. Corriente Facturado FK'] = valor
-                elif categoria == 'intereses_mora':
-                    df.at[idx, 'Int. Mora Facturado FK'] = valor
-                elif categoria == 'otros':
-                    df.at[idx, 'Otros Valor'] = valor
-                    df.at[idx, 'Otros Concepto'] = row.get('descripcion_producto', '')
-
-        # Calcular Valor Neto Facturado (suma de B+C+D+E+F+Otros)
-        # Asumiendo que Retención en la Fuente es 0 por ahora
-        df['(-) Retencio n en la Fuente'] = 0.0
-
-        df['Valor Neto Facturado'] = (
-            df['Valor Costos Fijos'] +
-            df['Seguro + Iva'] +
-            df['Int. Corriente Facturado FK'] +
-            df['Int. Mora Facturado FK'] +
-            df['Otros Valor'] +
-            df['(-) Retencio n en la Fuente']
-        )
-
-        # Preparar columnas finales (SIN TILDES para estandarización)
-        df_result = pd.DataFrame({
-            'Codigo del desembolso': df['codigo_operacion'],
-            'Valor Costos Fijos': df['Valor Costos Fijos'],
-            'Seguro + Iva': df['Seguro + Iva'],
-            'Int. Corriente Facturado FK': df['Int. Corriente Facturado FK'],
-            'Int. Mora Facturado FK': df['Int. Mora Facturado FK'],
-            '(-) Retencion en la Fuente': df['(-) Retencio n en la Fuente'],
-            'Valor Neto Facturado': df['Valor Neto Facturado'],
-            'Fecha Facturacion': df['fecha_facturacion'],
-            '# Factura': df['numero_factura'],
-            'Validacion Consecutivo': df['consecutivo'],
-            'Revision': '',  # Campo vacío para revisión manual
-            'Moneda': df['moneda'],
-            'Codigo Tercero': df['nit_cliente'],
-            'Otros Concepto': df['Otros Concepto'],
-            'Otros Valor': df['Otros Valor'],
-            'Estado': df['estado'],
-            'Envio': df['envio'],
-            'Fac de la nota Credito': df['fuente_noova'].apply(
-                lambda x: 'Nota Credito' if x == 'notas_credito' else ''
-            )
-        })
-
-        return df_result
+        return self._prepare_hoja(df, ESPECIFICACION_HOJAS['Relacion facturas Costos Fijos'])
 
     def _prepare_interes(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -624,59 +1355,7 @@ class FileProcessor:
         # Factura, Validacion Consecutivo, Revision, Estado, Envio, Moneda,
         Fac de la nota Crédito
         """
-        # Inicializar columnas de valores
-        df['Interés Corriente Facturado'] = 0.0
-        df['Interés Mora Facturado Mandato'] = 0.0
-        df['Otros Valor'] = 0.0
-        df['Otros Concepto'] = ''
-
-        # Distribuir valores según categoría
-        for idx, row in df.iterrows():
-            categoria = row['categoria']
-            valor = row.get('valor_netsuite', 0)
-
-            if pd.notna(valor):
-                if categoria == 'intereses_corriente':
-                    df.at[idx, 'Interés Corriente Facturado'] = valor
-                elif categoria == 'intereses_mora':
-                    df.at[idx, 'Interés Mora Facturado Mandato'] = valor
-                elif categoria == 'otros':
-                    df.at[idx, 'Otros Valor'] = valor
-                    df.at[idx, 'Otros Concepto'] = row.get('descripcion_producto', '')
-
-        # Calcular Valor Neto Facturado
-        df['Valor Neto Facturado'] = (
-            df['Interés Corriente Facturado'] +
-            df['Interés Mora Facturado Mandato'] +
-            df['Otros Valor']
-        )
-
-        # Calcular Mes facturación (formato: 'ago-25')
-        df['Mes facturación'] = df['fecha_facturacion'].apply(self._format_mes_facturacion)
-
-        # Preparar columnas finales (SIN TILDES para estandarización)
-        df_result = pd.DataFrame({
-            'Codigo del desembolso': df['codigo_operacion'],
-            'Mes facturacion': df['Mes facturación'],
-            'Interes Corriente Facturado': df['Interés Corriente Facturado'],
-            'Interes Mora Facturado Mandato': df['Interés Mora Facturado Mandato'],
-            'Valor Neto Facturado': df['Valor Neto Facturado'],
-            'Fecha Factura': df['fecha_facturacion'],
-            '# Factura': df['numero_factura'],
-            'Validacion Consecutivo': df['consecutivo'],
-            'Revision': '',  # Campo vacío para revisión manual
-            'Estado': df['estado'],
-            'Envio': df['envio'],
-            'Moneda': df['moneda'],
-            'Codigo Tercero': df['nit_cliente'],
-            'Otros Concepto': df['Otros Concepto'],
-            'Otros Valor': df['Otros Valor'],
-            'Fac de la nota Credito': df['fuente_noova'].apply(
-                lambda x: 'Nota Credito' if x == 'notas_credito' else ''
-            )
-        })
-
-        return df_result
+        return self._prepare_hoja(df, ESPECIFICACION_HOJAS['Relación facturas mandato'])
 
     def _format_mes_facturacion(self, fecha) -> str:
         """
@@ -695,14 +1374,7 @@ class FileProcessor:
             if isinstance(fecha, str):
                 fecha = pd.to_datetime(fecha)
 
-            # Mapeo de meses en español
-            meses = {
-                1: 'ene', 2: 'feb', 3: 'mar', 4: 'abr',
-                5: 'may', 6: 'jun', 7: 'jul', 8: 'ago',
-                9: 'sep', 10: 'oct', 11: 'nov', 12: 'dic'
-            }
-
-            mes = meses.get(fecha.month, '')
+            mes = MESES_ES[fecha.month - 1]
             año = str(fecha.year)[-2:]  # Últimos 2 dígitos del año
 
             return f"{mes}-{año}"
@@ -710,6 +1382,56 @@ class FileProcessor:
         except Exception:
             return ''
 
+    def _format_mes_facturacion_series(self, fechas: pd.Series) -> pd.Series:
+        """
+        Versión vectorizada de _format_mes_facturacion para una columna completa
+
+        Args:
+            fechas: Series de fechas (datetime, texto o mixta)
+
+        Returns:
+            Series de strings en formato 'mes-año' ('' si la fecha no es válida)
+        """
+        fechas = self._parse_fechas(fechas)
+        resultado = pd.Series('', index=fechas.index, dtype=object)
+
+        validas = fechas.notna().to_numpy()
+        if validas.any():
+            fechas_validas = fechas[validas]
+            meses = np.asarray(MESES_ES, dtype=object)[fechas_validas.dt.month.to_numpy() - 1]
+            años = fechas_validas.dt.year.astype(str).str[-2:].to_numpy(dtype=object)
+            resultado[validas] = meses + '-' + años
+
+        return resultado
+
+    def _parse_fechas(self, fechas: pd.Series) -> pd.Series:
+        """
+        Convierte una columna de fechas a datetime64 sin recorrer filas
+
+        Toda la columna se convierte con un solo pd.to_datetime (los textos
+        repetidos se parsean una vez gracias a su caché). Si la columna no es
+        solo fechas o solo textos (pd.api.types.infer_dtype), los valores que
+        no son fecha ni texto quedan como NaT: pd.to_datetime tomaría números
+        y booleanos como nanosegundos desde 1970.
+
+        Args:
+            fechas: Series de fechas
+
+        Returns:
+            Series datetime64 con el mismo índice
+        """
+        if pd.api.types.is_datetime64_any_dtype(fechas):
+            return fechas
+
+        convertidas = pd.to_datetime(fechas, errors='coerce', format='mixed')
+        if pd.api.types.infer_dtype(fechas, skipna=True) in ('datetime', 'datetime64', 'date', 'string', 'empty'):
+            return convertidas
+
+        # Columna mezclada: se revisa cada tipo distinto una vez, no cada fila
+        tipos = fechas.map(type)
+        validos = {t: issubclass(t, (str, datetime, date)) for t in tipos.unique()}
+        return convertidas.where(tipos.map(validos).astype(bool))
+
     def get_statistics(self, df_consolidated: pd.DataFrame) -> Dict:
         """
         Calcula estadísticas del DataFrame consolidado
@@ -744,6 +1466,33 @@ class FileProcessor:
             raise
 
 
+def _leer_archivo(
+    config_paths: Tuple[str, str, str],
+    tipo: str,
+    origen: OrigenArchivo,
+    processor: Optional[FileProcessor] = None
+) -> Tuple[pd.DataFrame, float]:
+    """
+    Lee un archivo cargado según su tipo (ejecutable en un proceso del pool)
+
+    Args:
+        config_paths: Rutas de configuración para crear el FileProcessor
+        tipo: Tipo de archivo (llave de LECTORES_ARCHIVO)
+        origen: Archivo a leer
+        processor: Procesador existente (None = crear uno con config_paths)
+
+    Returns:
+        Tupla (DataFrame normalizado, segundos de lectura)
+    """
+    inicio = time.perf_counter()
+    if processor is None:
+        processor = FileProcessor(*config_paths)
+
+    metodo, argumentos = LECTORES_ARCHIVO[tipo]
+    df = getattr(processor, metodo)(origen, *argumentos)
+    return df, time.perf_counter() - inicio
+
+
 def process_files(
     netsuite_path: str,
     facturas_path: str,
@@ -0,0 +1,485 @@
+"""
+Índice invertido del archivo Master
+Se construye una sola vez por versión del Master (al guardarla en la caché)
+y permite filtrar por NIT, por código de desembolso y por rango de fechas
+sin recorrer todas las filas: cada valor apunta a las posiciones de las
+filas que lo contienen. También guarda las opciones de los filtros
+(facetas): NITs ordenados y los códigos de cada NIT
+"""
+
+import warnings
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Cualquier aparición de "CO:nit:" dentro del código (mismo criterio que el filtro original)
+PATRON_NIT_EN_CODIGO = r'(?i)CO:([^:]+):'
+
+
+def normalizar_nit(valor) -> Optional[str]:
+    """
+    Convierte un NIT a texto limpio, manejando floats y strings
+
+    Args:
+        valor: NIT tal como viene en el Master
+
+    Returns:
+        NIT como texto o None si está vacío
+    """
+    if pd.isna(valor):
+        return None
+    try:
+        # Si es float, convertir a int primero para quitar decimales
+        if isinstance(valor, float):
+            valor = int(valor)
+        return str(valor).strip()
+    except (TypeError, ValueError, OverflowError):
+        return str(valor).strip() if str(valor).strip() else None
+
+
+class IndiceInvertido:
+    """
+    Mapa valor → posiciones de fila, guardado en arreglos compactos
+
+    Las posiciones de cada valor quedan contiguas en un solo arreglo
+    (ordenadas por fila) y los valores se buscan con un pd.Index.
+    """
+
+    def __init__(self, valores: Iterable, filas: Optional[np.ndarray] = None):
+        """
+        Construye el índice
+
+        Args:
+            valores: Valor de cada fila (None/NaN no se indexan)
+            filas: Fila de cada valor, si no es uno por fila (pares valor, fila)
+        """
+        codigos, unicos = pd.factorize(pd.Series(valores, dtype=object), sort=False)
+        filas = np.arange(len(codigos)) if filas is None else np.asarray(filas)
+
+        validos = codigos >= 0
+        codigos, filas = codigos[validos], filas[validos]
+        orden = np.lexsort((filas, codigos))
+        codigos, filas = codigos[orden], filas[orden]
+
+        # Un valor repetido en la misma fila cuenta una sola vez
+        distintos = np.ones(len(filas), dtype=bool)
+        distintos[1:] = (codigos[1:] != codigos[:-1]) | (filas[1:] != filas[:-1])
+        codigos, filas = codigos[distintos], filas[distintos]
+
+        self.valores = pd.Index(unicos, dtype=object)
+        self.posiciones = filas.astype(np.int32)
+        conteos = np.bincount(codigos, minlength=len(unicos))
+        self.inicios = np.concatenate(([0], np.cumsum(conteos))).astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.valores)
+
+    def contar(self, valores: Iterable) -> int:
+        """
+        Cantidad de filas con cualquiera de los valores (cota superior si se repiten)
+
+        Args:
+            valores: Valores buscados
+
+        Returns:
+            Número de filas
+        """
+        encontrados = self.valores.get_indexer(pd.Index(list(valores), dtype=object))
+        encontrados = encontrados[encontrados >= 0]
+        return int((self.inicios[encontrados + 1] - self.inicios[encontrados]).sum())
+
+    def filas(self, valores: Iterable) -> np.ndarray:
+        """
+        Posiciones (ordenadas, sin repetir) de las filas con cualquiera de los valores
+
+        Args:
+            valores: Valores buscados
+
+        Returns:
+            Arreglo de posiciones
+        """
+        encontrados = self.valores.get_indexer(pd.Index(list(valores), dtype=object))
+        partes = [
+            self.posiciones[self.inicios[i]:self.inicios[i + 1]]
+            for i in encontrados if i >= 0
+        ]
+        if not partes:
+            return np.empty(0, dtype=np.int32)
+        if len(partes) == 1:
+            return partes[0]
+        return np.unique(np.concatenate(partes))
+
+
+class IndiceFechas:
+    """
+    Fechas de todas las columnas 'fecha' en un solo arreglo ordenado
+
+    Cada fecha (int64 en nanosegundos) va acompañada de su fila; una
+    búsqueda binaria da las filas con cualquier fecha dentro de un rango.
+    Los límites (mínimo, máximo) del consolidado y de cada hoja se calculan
+    al construir el índice. También se guarda cada columna por fila
+    (por_columna, NaT como el mínimo int64) para revisar pocas filas.
+    """
+
+    def __init__(self, df: pd.DataFrame, columnas_fecha: List[str], rangos: Mapping[str, Tuple[int, int]]):
+        """
+        Construye el índice
+
+        Args:
+            df: Consolidado del Master
+            columnas_fecha: Columnas de fecha
+            rangos: {nombre_hoja: (fila_inicio, fila_fin)} dentro del consolidado
+        """
+        valores, filas = [], []
+        self.por_columna: Dict[str, np.ndarray] = {}
+        for columna in columnas_fecha:
+            serie = df[columna]
+            if not pd.api.types.is_datetime64_any_dtype(serie):
+                # Columna con texto (ej: 'pendiente'): solo el índice la convierte, los datos no cambian
+                with warnings.catch_warnings():
+                    # Fechas en texto con formatos mezclados: se parsean una a una
+                    warnings.simplefilter('ignore', UserWarning)
+                    serie = pd.to_datetime(serie, errors='coerce')
+            if getattr(serie.dt, 'tz', None) is not None:
+                serie = serie.dt.tz_localize(None)
+            fechas = serie.to_numpy(dtype='datetime64[ns]')
+            self.por_columna[columna] = fechas.view(np.int64)
+            validas = ~np.isnat(fechas)
+            valores.append(fechas[validas].view(np.int64))
+            filas.append(np.flatnonzero(validas))
+
+        valores = np.concatenate(valores) if valores else np.empty(0, dtype=np.int64)
+        filas = np.concatenate(filas) if filas else np.empty(0, dtype=np.int64)
+        orden = np.argsort(valores, kind='stable')
+
+        self.columnas = tuple(columnas_fecha)
+        self.total_filas = len(df)
+        self.valores = valores[orden]
+        self.filas = filas[orden].astype(np.int32)
+
+        self._limites: Dict[Optional[str], Optional[Tuple[pd.Timestamp, pd.Timestamp]]] = {
+            None: self._limites_de(np.ones(len(self.filas), dtype=bool))
+        }
+        for nombre_hoja, (inicio, fin) in rangos.items():
+            self._limites[nombre_hoja] = self._limites_de((self.filas >= inicio) & (self.filas < fin))
+
+    def _limites_de(self, seleccion: np.ndarray) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """Primera y última fecha (el arreglo está ordenado) de las posiciones seleccionadas"""
+        posiciones = np.flatnonzero(seleccion)
+        if len(posiciones) == 0:
+            return None
+        return pd.Timestamp(self.valores[posiciones[0]]), pd.Timestamp(self.valores[posiciones[-1]])
+
+    def limites(self, nombre_hoja: Optional[str] = None) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """
+        Fecha mínima y máxima entre todas las columnas de fecha
+
+        Args:
+            nombre_hoja: Hoja (None para el consolidado)
+
+        Returns:
+            Tupla (mínima, máxima) o None si no hay fechas
+        """
+        return self._limites.get(nombre_hoja)
+
+    def contar_en_rango(self, desde: pd.Timestamp, hasta: pd.Timestamp) -> int:
+        """
+        Cantidad de fechas (no de filas) dentro de [desde, hasta]: cota superior de filas
+
+        Args:
+            desde: Inicio del rango
+            hasta: Fin del rango
+
+        Returns:
+            Número de fechas
+        """
+        inicio = np.searchsorted(self.valores, pd.Timestamp(desde).value, side='left')
+        fin = np.searchsorted(self.valores, pd.Timestamp(hasta).value, side='right')
+        return int(fin - inicio)
+
+    def filtrar_en_rango(self, filas: np.ndarray, desde: pd.Timestamp, hasta: pd.Timestamp) -> np.ndarray:
+        """
+        De las filas indicadas, las que tienen alguna fecha dentro de [desde, hasta]
+
+        Args:
+            filas: Posiciones candidatas (ordenadas)
+            desde: Inicio del rango
+            hasta: Fin del rango
+
+        Returns:
+            Posiciones que cumplen
+        """
+        desde, hasta = pd.Timestamp(desde).value, pd.Timestamp(hasta).value
+        cumple = np.zeros(len(filas), dtype=bool)
+        for fechas in self.por_columna.values():
+            valores = fechas[filas]
+            cumple |= (valores >= desde) & (valores <= hasta)
+        return filas[cumple]
+
+    def filas_en_rango(self, desde: pd.Timestamp, hasta: pd.Timestamp) -> np.ndarray:
+        """
+        Filas con alguna fecha dentro de [desde, hasta] (ambos incluidos)
+
+        Args:
+            desde: Inicio del rango
+            hasta: Fin del rango
+
+        Returns:
+            Posiciones ordenadas en el consolidado
+        """
+        inicio = np.searchsorted(self.valores, pd.Timestamp(desde).value, side='left')
+        fin = np.searchsorted(self.valores, pd.Timestamp(hasta).value, side='right')
+        # Marcar en vez de ordenar: una fila con varias fechas en el rango cuenta una vez
+        marcadas = np.zeros(self.total_filas, dtype=bool)
+        marcadas[self.filas[inicio:fin]] = True
+        return np.flatnonzero(marcadas).astype(np.int32)
+
+
+class FacetasMaster:
+    """
+    Opciones de los filtros de NIT y código de una hoja (o del consolidado)
+
+    NITs y códigos distintos quedan ordenados una sola vez; los códigos de
+    cada NIT se guardan como posiciones dentro de `codigos`, contiguas por
+    NIT (mismo esquema que IndiceInvertido).
+    """
+
+    def __init__(self, nit: pd.Categorical, codigo: np.ndarray):
+        """
+        Calcula las facetas
+
+        Args:
+            nit: NIT normalizado de cada fila
+            codigo: Código unificado de cada fila (None si no tiene)
+        """
+        # NITs presentes (sin vacíos), ordenados
+        codigos_nit = np.asarray(nit.codes)
+        presentes = np.unique(codigos_nit[codigos_nit >= 0])
+        categorias = np.asarray(nit.categories, dtype=object)[presentes]
+        validos = np.array([bool(n) for n in categorias], dtype=bool)
+        orden = np.argsort(categorias[validos], kind='stable')
+        self.nits = tuple(categorias[validos][orden].tolist())
+
+        # Posición de cada categoría de NIT en self.nits (-1 si no aplica; la última
+        # casilla recibe el código -1 de las filas sin NIT)
+        posicion_nit = np.full(len(nit.categories) + 1, -1, dtype=np.int64)
+        posicion_nit[presentes[validos][orden]] = np.arange(len(self.nits))
+        fila_nit = posicion_nit[codigos_nit]
+
+        # Códigos distintos (sin vacíos), ordenados
+        fila_codigo, valores_codigo = pd.factorize(pd.Series(codigo, dtype=object), sort=True)
+        valores_codigo = np.asarray(valores_codigo, dtype=object)
+        validos = np.array([bool(c) for c in valores_codigo], dtype=bool)
+        self._codigos = valores_codigo[validos]
+        self.codigos = tuple(self._codigos.tolist())
+        posicion_codigo = np.full(len(valores_codigo) + 1, -1, dtype=np.int64)
+        posicion_codigo[np.flatnonzero(validos)] = np.arange(len(self.codigos))
+        fila_codigo = posicion_codigo[fila_codigo]
+
+        # Adyacencia NIT → códigos: pares (nit, código) distintos, ordenados por NIT y código
+        ambos = (fila_nit >= 0) & (fila_codigo >= 0)
+        total_codigos = max(len(self.codigos), 1)
+        pares = np.unique(fila_nit[ambos] * total_codigos + fila_codigo[ambos])
+        self._codigos_por_nit = (pares % total_codigos).astype(np.int32)
+        self._inicios = np.searchsorted(pares // total_codigos, np.arange(len(self.nits) + 1))
+        self._posicion = {nit: i for i, nit in enumerate(self.nits)}
+
+    def codigos_de(self, nits: Iterable[str]) -> List[str]:
+        """
+        Códigos (ordenados, sin repetir) de las filas con alguno de los NITs
+
+        Args:
+            nits: NITs normalizados
+
+        Returns:
+            Lista de códigos
+        """
+        posiciones = [self._posicion[nit] for nit in nits if nit in self._posicion]
+        if len(posiciones) == 0:
+            return []
+        if len(posiciones) == 1:
+            inicio, fin = self._inicios[posiciones[0]], self._inicios[posiciones[0] + 1]
+            return self._codigos[self._codigos_por_nit[inicio:fin]].tolist()
+        seleccion = np.concatenate([
+            self._codigos_por_nit[self._inicios[p]:self._inicios[p + 1]] for p in posiciones
+        ])
+        return self._codigos[np.unique(seleccion)].tolist()
+
+
+@dataclass(frozen=True)
+class MasterIndex:
+    """
+    Índice de NIT, código de desembolso y fechas del consolidado del Master
+
+    Las posiciones son filas del consolidado (que coinciden con las
+    etiquetas de fila de las hojas, que son rangos del consolidado).
+    """
+    nit: pd.Categorical
+    codigo: np.ndarray
+    por_nit: IndiceInvertido
+    por_nit_en_codigo: IndiceInvertido
+    por_codigo: IndiceInvertido
+    fechas: IndiceFechas
+    facetas: Mapping[Optional[str], FacetasMaster]
+
+    def facetas_de(self, nombre_hoja: Optional[str] = None) -> FacetasMaster:
+        """Facetas de una hoja (o del consolidado si la hoja no existe)"""
+        return self.facetas.get(nombre_hoja, self.facetas[None])
+
+    def filas_por_nit(self, nits: Iterable[str]) -> np.ndarray:
+        """
+        Filas cuyo NIT es alguno de los indicados o cuyo código contiene "CO:nit:"
+
+        Args:
+            nits: NITs normalizados
+
+        Returns:
+            Posiciones ordenadas en el consolidado
+        """
+        nits = list(nits)
+        return np.union1d(
+            self.por_nit.filas(nits),
+            self.por_nit_en_codigo.filas(nit.lower() for nit in nits)
+        ).astype(np.int32)
+
+    def filas_por_codigo(self, codigos: Iterable[str]) -> np.ndarray:
+        """
+        Filas con alguno de los códigos de desembolso indicados
+
+        Args:
+            codigos: Códigos unificados
+
+        Returns:
+            Posiciones ordenadas en el consolidado
+        """
+        return self.por_codigo.filas(codigos)
+
+
+def unificar_codigos(df: pd.DataFrame, columnas_codigo: List[str]) -> np.ndarray:
+    """
+    Une las columnas de código de desembolso en una sola (primer valor no vacío)
+
+    Args:
+        df: Consolidado del Master
+        columnas_codigo: Columnas de código, en orden de prioridad
+
+    Returns:
+        Arreglo object con el código de cada fila (None si no tiene)
+    """
+    if not columnas_codigo:
+        return np.full(len(df), None, dtype=object)
+
+    unificado = df[columnas_codigo[0]]
+    for columna in columnas_codigo[1:]:
+        unificado = unificado.astype(object).fillna(df[columna].astype(object))
+
+    texto = unificado.astype(str).str.strip()
+    return texto.where(unificado.notna() & (texto != 'nan'), None).to_numpy(dtype=object)
+
+
+def nit_por_fila(
+    df: pd.DataFrame,
+    columna_nit: Optional[str],
+    rangos: Mapping[str, Tuple[int, int]] = None,
+    nit_por_hoja: Mapping[str, Optional[str]] = None
+) -> pd.Series:
+    """
+    NIT (sin normalizar) de cada fila, leído de la columna de NIT de su hoja
+
+    Las hojas pueden nombrar distinto la columna de NIT; cada rango del
+    consolidado toma la suya, como hacía el filtro original por hoja.
+
+    Args:
+        df: Consolidado del Master
+        columna_nit: Columna de NIT del consolidado (se usa sin nit_por_hoja)
+        rangos: {nombre_hoja: (fila_inicio, fila_fin)} dentro del consolidado
+        nit_por_hoja: {nombre_hoja: columna de NIT de la hoja (None si no tiene)}
+
+    Returns:
+        Serie object con el NIT de cada fila (None si no tiene)
+    """
+    if not rangos or nit_por_hoja is None:
+        if columna_nit:
+            return df[columna_nit].astype(object)
+        return pd.Series(None, index=df.index, dtype=object)
+
+    valores = np.full(len(df), None, dtype=object)
+    for nombre_hoja, (inicio, fin) in rangos.items():
+        columna = nit_por_hoja.get(nombre_hoja)
+        if columna:
+            valores[inicio:fin] = df[columna].iloc[inicio:fin].to_numpy(dtype=object)
+    return pd.Series(valores, index=df.index)
+
+
+def build_master_index(
+    df: pd.DataFrame,
+    columna_nit: Optional[str],
+    columnas_codigo: List[str],
+    columnas_fecha: List[str] = (),
+    rangos: Mapping[str, Tuple[int, int]] = None,
+    nit_por_hoja: Mapping[str, Optional[str]] = None
+) -> MasterIndex:
+    """
+    Construye el índice de NIT, código de desembolso y fechas
+
+    Args:
+        df: Consolidado del Master
+        columna_nit: Columna de NIT del consolidado (None si no hay)
+        columnas_codigo: Columnas de código de desembolso
+        columnas_fecha: Columnas de fecha
+        rangos: {nombre_hoja: (fila_inicio, fila_fin)} dentro del consolidado
+        nit_por_hoja: {nombre_hoja: columna de NIT de la hoja}; si se indica,
+            cada hoja se indexa con su propia columna en vez de columna_nit
+
+    Returns:
+        MasterIndex
+    """
+    # NIT normalizado: normalizar_nit se aplica una vez por valor distinto, no por fila
+    valores = nit_por_fila(df, columna_nit, rangos, nit_por_hoja)
+    if valores.notna().any():
+        codigos_nit, valores_nit = pd.factorize(valores, sort=False)
+        normalizados = pd.Index([normalizar_nit(v) for v in valores_nit], dtype=object)
+        categorias = pd.Index(normalizados.dropna().unique(), dtype=object)
+        nit = pd.Categorical.from_codes(
+            np.where(codigos_nit >= 0, categorias.get_indexer(normalizados)[codigos_nit], -1),
+            categories=categorias
+        )
+    else:
+        nit = pd.Categorical([None] * len(df), categories=pd.Index([], dtype=object))
+
+    codigo = unificar_codigos(df, columnas_codigo)
+    serie_codigo = pd.Series(codigo, dtype=object)
+
+    # "CO:nit:" puede aparecer en códigos que no siguen el patrón completo
+    apariciones = serie_codigo.str.extractall(PATRON_NIT_EN_CODIGO)[0].str.lower()
+    por_nit_en_codigo = IndiceInvertido(
+        apariciones.to_numpy(dtype=object),
+        apariciones.index.get_level_values(0).to_numpy()
+    )
+
+    indice = MasterIndex(
+        nit=nit,
+        codigo=codigo,
+        por_nit=IndiceInvertido(np.asarray(nit, dtype=object)),
+        por_nit_en_codigo=por_nit_en_codigo,
+        por_codigo=IndiceInvertido(codigo),
+        fechas=IndiceFechas(df, list(columnas_fecha), rangos or {}),
+        facetas=MappingProxyType({
+            None: FacetasMaster(nit, codigo),
+            **{
+                nombre: FacetasMaster(nit[inicio:fin], codigo[inicio:fin])
+                for nombre, (inicio, fin) in (rangos or {}).items()
+            }
+        })
+    )
+    logger.info(
+        f"🗂️ Índice del Master: {len(indice.por_nit):,} NITs, {len(indice.por_codigo):,} códigos"
+    )
+    return indice
+
@@ -0,0 +1,316 @@
+"""
+Motor de consultas del archivo Master
+Recibe los filtros del reporte como una especificación (FiltroMaster),
+los evalúa sobre el índice del Master empezando por el más selectivo y
+arma solo el DataFrame final del reporte. Los resultados se guardan por
+especificación: cambiar un filtro no recalcula los demás
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, List, Mapping, Optional, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+from modules.master_index import MasterIndex
+from modules.master_schema import PlanReporte, resolver_esquema
+from modules.master_store import MasterVersion
+
+logger = logging.getLogger(__name__)
+
+# Resultados guardados (posiciones de filas, no DataFrames)
+MAX_CONSULTAS_CACHEADAS = 32
+MAX_PREDICADOS_CACHEADOS = 64
+
+
+@dataclass(frozen=True)
+class FiltroMaster:
+    """
+    Especificación de un reporte del Master
+
+    hoja=None consulta el consolidado. Los filtros vacíos no se aplican;
+    las fechas se comparan con ambos extremos incluidos.
+    """
+    hoja: Optional[str] = None
+    nits: Tuple[str, ...] = ()
+    codigos: Tuple[str, ...] = ()
+    fecha_desde: Optional[pd.Timestamp] = None
+    fecha_hasta: Optional[pd.Timestamp] = None
+
+
+@dataclass(frozen=True)
+class PasoFiltro:
+    """Registros que quedan después de aplicar un filtro (en el orden del plan)"""
+    nombre: str
+    registros: int
+    por_hoja: Mapping[str, int] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class ResultadoConsulta:
+    """
+    Resultado de una consulta: posiciones de las filas en el consolidado
+
+    El DataFrame del reporte se arma con MasterQueryEngine.reporte.
+    """
+    filtro: FiltroMaster
+    posiciones: np.ndarray
+    registros_inicial: int
+    por_hoja_inicial: Mapping[str, int]
+    pasos: Tuple[PasoFiltro, ...]
+    plan: Tuple[str, ...]
+
+
+# ==================== PREDICADOS ====================
+
+@dataclass(frozen=True)
+class _PredicadoNit:
+    """NIT en la columna NIT o "CO:nit:" dentro del código de desembolso"""
+    nits: Tuple[str, ...]
+    nombre: str = 'NIT'
+
+    def estimar(self, indice: MasterIndex) -> int:
+        return indice.por_nit.contar(self.nits) + indice.por_nit_en_codigo.contar(n.lower() for n in self.nits)
+
+    def filas(self, indice: MasterIndex) -> np.ndarray:
+        return indice.filas_por_nit(self.nits)
+
+    def filtrar(self, indice: MasterIndex, candidatas: np.ndarray, filas: Optional[np.ndarray]) -> np.ndarray:
+        return np.intersect1d(candidatas, self.filas(indice) if filas is None else filas, assume_unique=True)
+
+
+@dataclass(frozen=True)
+class _PredicadoCodigo:
+    """Código de desembolso unificado"""
+    codigos: Tuple[str, ...]
+    nombre: str = 'Código'
+
+    def estimar(self, indice: MasterIndex) -> int:
+        return indice.por_codigo.contar(self.codigos)
+
+    def filas(self, indice: MasterIndex) -> np.ndarray:
+        return indice.filas_por_codigo(self.codigos)
+
+    def filtrar(self, indice: MasterIndex, candidatas: np.ndarray, filas: Optional[np.ndarray]) -> np.ndarray:
+        return np.intersect1d(candidatas, self.filas(indice) if filas is None else filas, assume_unique=True)
+
+
+@dataclass(frozen=True)
+class _PredicadoFecha:
+    """Alguna columna de fecha dentro de [desde, hasta]"""
+    desde: pd.Timestamp
+    hasta: pd.Timestamp
+    nombre: str = 'Fecha'
+
+    def estimar(self, indice: MasterIndex) -> int:
+        return indice.fechas.contar_en_rango(self.desde, self.hasta)
+
+    def filas(self, indice: MasterIndex) -> np.ndarray:
+        return indice.fechas.filas_en_rango(self.desde, self.hasta)
+
+    def filtrar(self, indice: MasterIndex, candidatas: np.ndarray, filas: Optional[np.ndarray]) -> np.ndarray:
+        if filas is not None:
+            return np.intersect1d(candidatas, filas, assume_unique=True)
+        # Pocas candidatas: revisar sus fechas directamente, sin materializar el rango
+        return indice.fechas.filtrar_en_rango(candidatas, self.desde, self.hasta)
+
+
+def _predicados(filtro: FiltroMaster) -> List:
+    """Predicados de un filtro (los filtros vacíos no generan predicado)"""
+    predicados = []
+    if filtro.nits:
+        predicados.append(_PredicadoNit(tuple(filtro.nits)))
+    if filtro.codigos:
+        predicados.append(_PredicadoCodigo(tuple(filtro.codigos)))
+    if filtro.fecha_desde is not None and filtro.fecha_hasta is not None:
+        predicados.append(_PredicadoFecha(pd.Timestamp(filtro.fecha_desde), pd.Timestamp(filtro.fecha_hasta)))
+    return predicados
+
+
+def _conteo_por_hoja(posiciones: np.ndarray, rangos: Mapping[str, Tuple[int, int]]) -> Dict[str, int]:
+    """Cuenta posiciones (ordenadas) por hoja, solo las hojas con filas"""
+    conteos = {}
+    for nombre_hoja, (inicio, fin) in rangos.items():
+        desde, hasta = np.searchsorted(posiciones, [inicio, fin])
+        if hasta > desde:
+            conteos[nombre_hoja] = int(hasta - desde)
+    return conteos
+
+
+class _LRU:
+    """Diccionario LRU con lock (valores inmutables)"""
+
+    def __init__(self, maximo: int):
+        self.maximo = maximo
+        self._lock = threading.Lock()
+        self._datos: 'OrderedDict[Hashable, object]' = OrderedDict()
+
+    def get(self, llave: Hashable):
+        with self._lock:
+            valor = self._datos.get(llave)
+            if valor is not None:
+                self._datos.move_to_end(llave)
+            return valor
+
+    def put(self, llave: Hashable, valor):
+        with self._lock:
+            self._datos[llave] = valor
+            self._datos.move_to_end(llave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+
+class MasterQueryEngine:
+    """
+    Evalúa FiltroMaster sobre el índice de una versión del Master
+
+    Plan: se estima cuántas filas deja cada filtro (con los conteos del
+    índice, sin recorrer filas), se materializa el más selectivo y los
+    demás solo se evalúan sobre las filas que van quedando.
+    """
+
+    def __init__(self, max_consultas: int = MAX_CONSULTAS_CACHEADAS, max_predicados: int = MAX_PREDICADOS_CACHEADOS):
+        self._consultas = _LRU(max_consultas)
+        self._predicados = _LRU(max_predicados)
+
+    def ejecutar(self, version: MasterVersion, filtro: FiltroMaster) -> ResultadoConsulta:
+        """
+        Ejecuta una consulta (o la toma de la caché)
+
+        Args:
+            version: Versión del Master
+            filtro: Especificación de la consulta
+
+        Returns:
+            ResultadoConsulta
+        """
+        llave = (version.clave, filtro)
+        resultado = self._consultas.get(llave)
+        if resultado is None:
+            resultado = self._evaluar(version, filtro)
+            self._consultas.put(llave, resultado)
+        return resultado
+
+    def _evaluar(self, version: MasterVersion, filtro: FiltroMaster) -> ResultadoConsulta:
+        indice = version.indice
+        inicio, fin = version.rangos[filtro.hoja] if filtro.hoja else (0, len(version.consolidado))
+        rangos = {filtro.hoja: (inicio, fin)} if filtro.hoja else version.rangos
+
+        predicados = _predicados(filtro)
+        plan = sorted(predicados, key=lambda p: p.estimar(indice))
+
+        # El primer predicado se materializa (y se recorta a la hoja); los demás filtran sus candidatas
+        candidatas = None
+        pasos = []
+        for predicado in plan:
+            if candidatas is None:
+                filas = self._filas(version, predicado)
+                desde, hasta = np.searchsorted(filas, [inicio, fin])
+                candidatas = filas[desde:hasta]
+            elif len(candidatas):
+                candidatas = predicado.filtrar(indice, candidatas, self._predicados.get((version.clave, predicado)))
+            pasos.append(PasoFiltro(predicado.nombre, len(candidatas), _conteo_por_hoja(candidatas, rangos)))
+
+        posiciones = candidatas if candidatas is not None else np.arange(inicio, fin, dtype=np.int32)
+
+        return ResultadoConsulta(
+            filtro=filtro,
+            posiciones=posiciones,
+            registros_inicial=fin - inicio,
+            por_hoja_inicial={nombre: f - i for nombre, (i, f) in rangos.items() if f > i},
+            pasos=tuple(pasos),
+            plan=tuple(p.nombre for p in plan)
+        )
+
+    def _filas(self, version: MasterVersion, predicado) -> np.ndarray:
+        """Filas (en todo el consolidado) que cumplen un predicado, con caché"""
+        llave = (version.clave, predicado)
+        filas = self._predicados.get(llave)
+        if filas is None:
+            filas = predicado.filas(version.indice)
+            self._predicados.put(llave, filas)
+        return filas
+
+    def reporte(self, version: MasterVersion, resultado: ResultadoConsulta) -> pd.DataFrame:
+        """
+        Arma el DataFrame final del reporte: filas del resultado, columnas de la hoja, limpio
+
+        Args:
+            version: Versión del Master
+            resultado: Resultado de ejecutar
+
+        Returns:
+            DataFrame del reporte (propio, se puede modificar)
+        """
+        plan = version.esquema(resultado.filtro.hoja).reporte
+
+        # Una sola copia: solo las filas del resultado y las columnas que usa el reporte
+        consolidado = version.consolidado
+        df = consolidado.iloc[resultado.posiciones, consolidado.columns.get_indexer(plan.columnas)]
+        return aplicar_plan_reporte(df, plan)
+
+    def clear(self):
+        """Descarta los resultados guardados"""
+        self._consultas.clear()
+        self._predicados.clear()
+
+
+def aplicar_plan_reporte(df: pd.DataFrame, plan: PlanReporte) -> pd.DataFrame:
+    """
+    Limpia las columnas de un reporte con un plan ya resuelto
+
+    Args:
+        df: DataFrame propio con exactamente las columnas plan.columnas
+        plan: PlanReporte del esquema de la hoja
+
+    Returns:
+        DataFrame limpio (el mismo objeto, modificado)
+    """
+    # Completar vacíos con las otras variantes (código de desembolso, fechas).
+    # df es propio: se reemplaza la columna por posición, sin aviso de copia
+    for destino, origen in plan.combinar:
+        df.isetitem(df.columns.get_loc(destino), df[destino].fillna(df[origen]))
+    if plan.descartar:
+        df = df.drop(columns=list(plan.descartar))
+    df.columns = list(plan.nombres)
+    return df
+
+
+def limpiar_columnas_reporte(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Limpia, consolida y reorganiza columnas del reporte
+
+    Args:
+        df: DataFrame con las filas del reporte
+
+    Returns:
+        DataFrame limpio (nuevo)
+    """
+    plan = resolver_esquema(df.columns).reporte
+    return aplicar_plan_reporte(df[list(plan.columnas)], plan)
+
+
+# Instancia única por proceso (compartida entre sesiones de Streamlit)
+_engine: Optional[MasterQueryEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_master_query_engine() -> MasterQueryEngine:
+    """
+    Obtiene el motor de consultas del Master del proceso
+
+    Returns:
+        MasterQueryEngine compartido
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = MasterQueryEngine()
+        return _engine
@@ -0,0 +1,192 @@
+"""
+Esquema de columnas del archivo Master
+Reconoce una sola vez por versión del Master qué columna cumple cada rol
+(NIT, código de desembolso, fechas) y cómo se limpian las columnas del
+reporte, a partir de los nombres normalizados con unicodedata
+"""
+
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterable, Mapping, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+COLUMNA_TIPO_FACTURA = 'Tipo Factura'
+COLUMNA_CODIGO = 'Codigo del desembolso'
+COLUMNA_FECHA = 'Fecha Factura'
+
+# Columnas que no van en el reporte (nombres normalizados)
+COLUMNAS_ELIMINAR = (
+    'validacion consecutivo', 'revision', 'estado', 'envio',
+    'fac de la nota credito', 'fecha nota credito', '# nota credito'
+)
+
+# Fechas que se consolidan en "Fecha Factura", en orden de prioridad (nombres normalizados)
+FECHAS_REPORTE = ('fecha factura', 'fecha facturacion', 'fecha de desembolso')
+
+# Columnas que van primero en el reporte
+COLUMNAS_PRIORITARIAS = (
+    COLUMNA_TIPO_FACTURA,
+    COLUMNA_CODIGO,
+    'NIT',
+    'Cliente',
+    COLUMNA_FECHA,
+    '# Factura',
+    'Numero de factura',
+    'Moneda'
+)
+
+
+def normalizar_nombre_columna(columna) -> str:
+    """
+    Normaliza un nombre de columna para reconocer su rol (sin tildes, minúsculas)
+
+    Args:
+        columna: Nombre de la columna
+
+    Returns:
+        Nombre normalizado (ej: 'Código del desembolso' → 'codigo del desembolso')
+    """
+    texto = unicodedata.normalize('NFKD', str(columna))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower().strip()
+
+
+def clave_columna(columna) -> str:
+    """Nombre normalizado para agrupar variantes de una columna (tildes, mayúsculas, espacios)"""
+    return ' '.join(normalizar_nombre_columna(columna).split())
+
+
+def es_columna_nit(clave: str) -> bool:
+    """Columna de NIT: el nombre contiene 'nit'"""
+    return 'nit' in clave
+
+
+def es_columna_codigo(clave: str) -> bool:
+    """Columna de código de desembolso: 'codigo' + 'desembolso', o solo 'codigo'"""
+    return ('codigo' in clave and 'desembolso' in clave) or clave == 'codigo'
+
+
+def es_columna_fecha(clave: str) -> bool:
+    """Columna de fecha: el nombre contiene 'fecha'"""
+    return 'fecha' in clave
+
+
+@dataclass(frozen=True)
+class PlanReporte:
+    """
+    Limpieza de las columnas del reporte, resuelta a partir de los nombres
+
+    Se toman `columnas` (nombres originales, en orden), se completan los
+    vacíos de cada destino con su origen (`combinar`), se descartan los
+    orígenes y las columnas que quedan se llaman `nombres`.
+    """
+    columnas: Tuple[str, ...]
+    combinar: Tuple[Tuple[str, str], ...]
+    descartar: Tuple[str, ...]
+    nombres: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class EsquemaMaster:
+    """Roles de las columnas de una hoja (o del consolidado) del Master"""
+    columnas: Tuple[str, ...]
+    nit: Optional[str]
+    codigos: Tuple[str, ...]
+    fechas: Tuple[str, ...]
+    reporte: PlanReporte
+
+
+def _plan_reporte(columnas: Sequence[str], claves: Mapping[str, str]) -> PlanReporte:
+    """Resuelve la limpieza del reporte (ver PlanReporte)"""
+    eliminar = set(COLUMNAS_ELIMINAR)
+    finales = [
+        c for c in columnas
+        if 'Unnamed' not in str(c) and claves[c] not in eliminar and 'mes facturacion' not in claves[c]
+    ]
+
+    combinar, renombrar = [], {}
+
+    def consolidar(variantes, nombre):
+        # La primera variante recibe los valores de las demás y toma el nombre común
+        if not variantes:
+            return
+        destino = variantes[0]
+        combinar.extend((destino, origen) for origen in variantes[1:])
+        renombrar[destino] = nombre
+
+    # Código de desembolso: todas las variantes del nombre (la canónica primero)
+    codigos = [c for c in finales if claves[c] == clave_columna(COLUMNA_CODIGO)]
+    codigos.sort(key=lambda c: c != COLUMNA_CODIGO)
+    consolidar(codigos, COLUMNA_CODIGO)
+
+    # Fechas: en orden de prioridad, consolidadas en "Fecha Factura"
+    consolidar([c for clave in FECHAS_REPORTE for c in finales if claves[c] == clave], COLUMNA_FECHA)
+
+    # Moneda: solo la primera (las demás son duplicados del Excel, ej: 'Moneda.1')
+    monedas = [c for c in finales if claves[c] == 'moneda' or (str(c).endswith('.1') and 'moneda' in claves[c])]
+    descartar = [origen for _, origen in combinar]
+    finales = [c for c in finales if c not in descartar and c not in monedas[1:]]
+
+    nombres = [renombrar.get(c, c) for c in finales]
+    prioritarias = [c for c in COLUMNAS_PRIORITARIAS if c in nombres]
+    orden = prioritarias + [c for c in nombres if c not in prioritarias]
+    originales = dict(zip(nombres, finales))
+
+    return PlanReporte(
+        columnas=tuple(originales[c] for c in orden) + tuple(descartar),
+        combinar=tuple(combinar),
+        descartar=tuple(descartar),
+        nombres=tuple(orden)
+    )
+
+
+def resolver_esquema(columnas: Iterable) -> EsquemaMaster:
+    """
+    Reconoce los roles de un conjunto de columnas
+
+    Args:
+        columnas: Nombres de columna, en orden
+
+    Returns:
+        EsquemaMaster
+    """
+    columnas = tuple(columnas)
+    claves = {c: clave_columna(c) for c in columnas}
+    return EsquemaMaster(
+        columnas=columnas,
+        nit=next((c for c in columnas if es_columna_nit(claves[c])), None),
+        codigos=tuple(c for c in columnas if es_columna_codigo(claves[c])),
+        fechas=tuple(c for c in columnas if es_columna_fecha(claves[c])),
+        reporte=_plan_reporte(columnas, claves)
+    )
+
+
+def resolver_esquemas(
+    columnas_consolidado: Iterable,
+    columnas_por_hoja: Mapping[str, Sequence[str]]
+) -> Dict[Optional[str], EsquemaMaster]:
+    """
+    Resuelve el esquema del consolidado (llave None) y de cada hoja
+
+    Las columnas de cada hoja se toman en el orden del consolidado.
+
+    Args:
+        columnas_consolidado: Columnas del consolidado
+        columnas_por_hoja: {nombre_hoja: columnas originales de la hoja}
+
+    Returns:
+        {None | nombre_hoja: EsquemaMaster}
+    """
+    columnas_consolidado = tuple(columnas_consolidado)
+    esquemas = {None: resolver_esquema(columnas_consolidado)}
+    for nombre_hoja, columnas in columnas_por_hoja.items():
+        propias = set(columnas)
+        esquemas[nombre_hoja] = resolver_esquema(c for c in columnas_consolidado if c in propias)
+
+    esquema = esquemas[None]
+    logger.info(
+        f"🧭 Esquema del Master: NIT={esquema.nit}, {len(esquema.codigos)} columnas de código, "
+        f"{len(esquema.fechas)} de fecha"
+    )
+    return esquemas
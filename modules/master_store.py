@@ -0,0 +1,861 @@
+"""
+Almacén del archivo Master compartido por proceso
+Mantiene las hojas del Master ya parseadas en memoria, indexadas por
+id de archivo + modifiedTime de Drive, para que todas las sesiones de
+Streamlit reutilicen la misma copia mientras el archivo no cambie.
+Las sesiones guardan solo un MasterHandle: la versión se conserva mientras
+alguna sesión la referencie, aunque ya exista una más reciente
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import weakref
+from collections import deque
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from modules.file_processor import desactivar_calamine, usar_calamine
+from modules.master_index import MasterIndex, build_master_index
+from modules.master_schema import (
+    COLUMNA_TIPO_FACTURA, EsquemaMaster, clave_columna, es_columna_fecha, resolver_esquemas
+)
+
+logger = logging.getLogger(__name__)
+
+# Carpeta local de la copia columnar (Parquet) del Master
+DIRECTORIO_SIDECAR_POR_DEFECTO = os.path.join(tempfile.gettempdir(), 'facturacion_master_sidecar')
+
+# Columnas de texto con (valores distintos / filas) hasta este límite se guardan como category
+MAX_PROPORCION_CATEGORIA = 0.5
+
+# Formato de la copia Parquet: las copias de otro formato se ignoran (se vuelve a leer el .xlsx)
+FORMATO_SIDECAR = 2
+
+# Columnas con tipos mezclados en la copia Parquet: una etiqueta por celda
+# (qué tipo tenía) y el valor en la columna física de ese tipo
+CELDA_VACIA, CELDA_TEXTO, CELDA_ENTERO, CELDA_DECIMAL, CELDA_BOOLEANO = 0, 1, 2, 3, 4
+CELDA_FECHA_HORA, CELDA_TIMESTAMP, CELDA_FECHA, CELDA_HORA, CELDA_DURACION, CELDA_NAT = 5, 6, 7, 8, 9, 10
+
+@dataclass(frozen=True)
+class MasterVersion:
+    """
+    Hojas del Master correspondientes a una versión del archivo en Drive
+
+    Las hojas se guardan una sola vez, en el consolidado (todas las filas,
+    columnas con nombres unificados y 'Tipo Factura'); cada hoja de 'hojas'
+    es un rango de filas del consolidado, sin copiar datos, y 'columnas'
+    indica cuáles columnas tenía originalmente. 'esquemas' tiene los roles
+    de las columnas (NIT, código, fechas, limpieza del reporte) del
+    consolidado (llave None) y de cada hoja.
+
+    Los DataFrames son compartidos entre sesiones y sus datos son de solo
+    lectura: para agregar columnas usar .copy(deep=False), para modificar
+    valores .copy().
+    """
+    file_id: str
+    modified_time: str
+    formato: str
+    consolidado: pd.DataFrame
+    hojas: Mapping[str, pd.DataFrame]
+    rangos: Mapping[str, Tuple[int, int]]
+    columnas: Mapping[str, Tuple[str, ...]]
+    indice: MasterIndex
+    esquemas: Mapping[Optional[str], EsquemaMaster]
+    cargado: datetime
+    memoria: Mapping[str, int]
+
+    @property
+    def clave(self) -> Tuple[str, str, str]:
+        return (self.file_id, self.modified_time, self.formato)
+
+    def esquema(self, nombre_hoja: Optional[str] = None) -> EsquemaMaster:
+        """Esquema de una hoja (o del consolidado si la hoja no existe)"""
+        return self.esquemas.get(nombre_hoja, self.esquemas[None])
+
+
+@dataclass(frozen=True, eq=False)
+class MasterHandle:
+    """
+    Referencia de una sesión a una versión del Master
+
+    Es lo único que la sesión guarda en st.session_state. Al liberarla
+    (release) o al descartarse la sesión, la versión deja de retenerse.
+    """
+    file_id: str
+    modified_time: str
+    formato: str
+
+    @property
+    def clave(self) -> Tuple[str, str, str]:
+        return (self.file_id, self.modified_time, self.formato)
+
+
+class MasterCache:
+    """
+    Caché de proceso del archivo Master con referencias por sesión
+
+    Guarda la versión más reciente de cada archivo: una versión con otro
+    modifiedTime (o leída con otra configuración) reemplaza a la anterior.
+    Las versiones reemplazadas se retienen solo mientras haya handles vivos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versiones: Dict[str, MasterVersion] = {}
+        self._retenidas: Dict[Tuple[str, str, str], MasterVersion] = {}
+        self._referencias: Dict[Tuple[str, str, str], int] = {}
+        self._liberadores: 'weakref.WeakKeyDictionary[MasterHandle, weakref.finalize]' = weakref.WeakKeyDictionary()
+        # Referencias soltadas por el recolector: se procesan con el lock tomado
+        self._soltadas: deque = deque()
+
+    def get(self, file_id: str, modified_time: str, formato: str = '') -> Optional[MasterVersion]:
+        """
+        Obtiene las hojas cacheadas si corresponden a la versión indicada
+
+        Args:
+            file_id: Id del archivo Master en Drive
+            modified_time: modifiedTime actual del archivo en Drive
+            formato: Identificador de la configuración de lectura (ej: config_hash)
+
+        Returns:
+            MasterVersion o None si no hay datos de esa versión
+        """
+        with self._lock:
+            self._procesar_soltadas()
+            version = self._versiones.get(file_id)
+            if (version and modified_time and version.modified_time == modified_time
+                    and version.formato == formato):
+                return version
+            return None
+
+    def put(
+        self,
+        file_id: str,
+        modified_time: str,
+        hojas: Dict[str, pd.DataFrame],
+        formato: str = '',
+        memoria: Optional[Mapping[str, int]] = None,
+        columnas_canonicas: Sequence[str] = ()
+    ) -> MasterVersion:
+        """
+        Guarda las hojas de una versión del Master (reemplaza la anterior)
+
+        Args:
+            file_id: Id del archivo Master en Drive
+            modified_time: modifiedTime del archivo descargado
+            hojas: Diccionario {nombre_hoja: DataFrame}
+            formato: Identificador de la configuración de lectura (ej: config_hash)
+            memoria: Bytes antes/después de compactar ({'original', 'compacta'})
+            columnas_canonicas: Nombres a usar para las variantes de una columna
+
+        Returns:
+            MasterVersion guardada
+        """
+        consolidado, rangos, columnas = build_master_consolidado(hojas, columnas_canonicas)
+        consolidado = _solo_lectura(consolidado)
+        esquemas = resolver_esquemas(consolidado.columns, columnas)
+        esquema = esquemas[None]
+        indice = build_master_index(
+            consolidado, esquema.nit, list(esquema.codigos), list(esquema.fechas), rangos,
+            nit_por_hoja={nombre: esquemas[nombre].nit for nombre in rangos}
+        )
+
+        memoria = dict(memoria or {})
+        if memoria:
+            memoria['compacta'] = memoria_hojas({'consolidado': consolidado})
+
+        version = MasterVersion(
+            file_id=file_id,
+            modified_time=modified_time,
+            formato=formato,
+            consolidado=consolidado,
+            hojas=MappingProxyType({
+                nombre: consolidado.iloc[inicio:fin] for nombre, (inicio, fin) in rangos.items()
+            }),
+            rangos=MappingProxyType(rangos),
+            columnas=MappingProxyType(columnas),
+            indice=indice,
+            esquemas=MappingProxyType(esquemas),
+            cargado=datetime.now(),
+            memoria=memoria
+        )
+        with self._lock:
+            self._procesar_soltadas()
+            anterior = self._versiones.get(file_id)
+            self._versiones[file_id] = version
+            self._retener(anterior)
+
+        if anterior and anterior.modified_time != modified_time:
+            logger.info(f"🔄 Master actualizado en Drive ({anterior.modified_time} → {modified_time})")
+        return version
+
+    def get_latest(self, file_id: str) -> Optional[MasterVersion]:
+        """
+        Obtiene la última versión cargada de un archivo, sin verificar si sigue vigente
+
+        Args:
+            file_id: Id del archivo Master en Drive
+
+        Returns:
+            MasterVersion o None
+        """
+        with self._lock:
+            return self._versiones.get(file_id)
+
+    def acquire(self, file_id: str) -> Optional[MasterHandle]:
+        """
+        Toma una referencia a la última versión cargada de un archivo
+
+        Args:
+            file_id: Id del archivo Master en Drive
+
+        Returns:
+            MasterHandle (liberar con release) o None si no hay versión cargada
+        """
+        with self._lock:
+            self._procesar_soltadas()
+            version = self._versiones.get(file_id)
+            if version is None:
+                return None
+            handle = MasterHandle(version.file_id, version.modified_time, version.formato)
+            self._referencias[version.clave] = self._referencias.get(version.clave, 0) + 1
+            # Si la sesión se descarta sin liberar, la referencia se suelta al recolectar el handle
+            self._liberadores[handle] = weakref.finalize(handle, self._soltadas.append, version.clave)
+            return handle
+
+    def resolve(self, handle: MasterHandle) -> Optional[MasterVersion]:
+        """
+        Obtiene la versión referenciada por un handle
+
+        Args:
+            handle: Referencia obtenida con acquire
+
+        Returns:
+            MasterVersion o None si el handle ya fue liberado
+        """
+        with self._lock:
+            self._procesar_soltadas()
+            if self._referencias.get(handle.clave, 0) <= 0:
+                return None
+            version = self._versiones.get(handle.file_id)
+            if version is not None and version.clave == handle.clave:
+                return version
+            return self._retenidas.get(handle.clave)
+
+    def release(self, handle: MasterHandle):
+        """
+        Libera la referencia de un handle (llamarlo más de una vez no tiene efecto)
+
+        Args:
+            handle: Referencia obtenida con acquire
+        """
+        liberador = self._liberadores.get(handle)
+        if liberador is not None:
+            liberador()
+        with self._lock:
+            self._procesar_soltadas()
+
+    def referencias(self, file_id: str) -> int:
+        """
+        Cuenta los handles vivos de un archivo (todas sus versiones)
+
+        Args:
+            file_id: Id del archivo Master en Drive
+
+        Returns:
+            Número de referencias
+        """
+        with self._lock:
+            self._procesar_soltadas()
+            return sum(n for clave, n in self._referencias.items() if clave[0] == file_id)
+
+    def _procesar_soltadas(self):
+        """Resta las referencias soltadas y descarta las versiones retenidas sin uso (llamar con el lock tomado)"""
+        while self._soltadas:
+            clave = self._soltadas.popleft()
+            restantes = self._referencias.get(clave, 0) - 1
+            if restantes > 0:
+                self._referencias[clave] = restantes
+                continue
+            self._referencias.pop(clave, None)
+            if self._retenidas.pop(clave, None) is not None:
+                logger.info(f"🧹 Versión anterior del Master liberada ({clave[1]})")
+
+    def _retener(self, version: Optional[MasterVersion]):
+        """Conserva una versión reemplazada si hay sesiones que la usan (llamar con el lock tomado)"""
+        if version is not None and self._referencias.get(version.clave, 0) > 0:
+            self._retenidas[version.clave] = version
+
+    def clear(self):
+        """Descarta todas las versiones cacheadas (las referenciadas se retienen)"""
+        with self._lock:
+            self._procesar_soltadas()
+            for version in self._versiones.values():
+                self._retener(version)
+            self._versiones.clear()
+
+
+class MasterSidecar:
+    """
+    Copia columnar (Parquet) de las hojas del Master en disco local
+
+    Cada archivo Master tiene un manifiesto JSON con el modifiedTime de la
+    versión convertida; si coincide con el de Drive, las hojas se leen del
+    Parquet en lugar de descargar y parsear el .xlsx.
+    """
+
+    def __init__(self, directorio: str):
+        """
+        Args:
+            directorio: Carpeta donde se guardan los Parquet y manifiestos
+        """
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+
+    def _base(self, file_id: str) -> str:
+        # El id de Drive es seguro como nombre, pero se hashea por si acaso
+        return os.path.join(self.directorio, hashlib.sha256(file_id.encode('utf-8')).hexdigest()[:32])
+
+    def load(
+        self,
+        file_id: str,
+        modified_time: str,
+        formato: str = ''
+    ) -> Optional[Tuple[Dict[str, pd.DataFrame], Dict[str, int]]]:
+        """
+        Lee las hojas de la copia columnar si corresponde a la versión indicada
+
+        Args:
+            file_id: Id del archivo Master en Drive
+            modified_time: modifiedTime actual del archivo en Drive
+            formato: Identificador de la configuración de lectura (ej: config_hash)
+
+        Returns:
+            Tupla ({nombre_hoja: DataFrame}, memoria guardada al convertir)
+            o None si no hay copia vigente
+        """
+        base = self._base(file_id)
+        try:
+            with open(f"{base}.json", 'r', encoding='utf-8') as f:
+                manifiesto = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if (not modified_time or manifiesto.get('modified_time') != modified_time
+                or manifiesto.get('formato', '') != formato
+                or manifiesto.get('formato_sidecar') != FORMATO_SIDECAR):
+            return None
+
+        try:
+            hojas = {}
+            for i, hoja in enumerate(manifiesto['hojas']):
+                hojas[hoja['nombre']] = _desde_parquet(
+                    pd.read_parquet(f"{base}_{i}.parquet"), hoja['columnas'], hoja.get('mixtas', {})
+                )
+            return hojas, manifiesto.get('memoria', {})
+        except Exception as e:
+            logger.warning(f"⚠️ Copia Parquet del Master ilegible, se usará el .xlsx: {e}")
+            return None
+
+    def save(
+        self,
+        file_id: str,
+        modified_time: str,
+        hojas: Dict[str, pd.DataFrame],
+        formato: str = '',
+        memoria: Optional[Mapping[str, int]] = None
+    ) -> bool:
+        """
+        Guarda la copia columnar de las hojas de una versión del Master
+
+        Args:
+            file_id: Id del archivo Master en Drive
+            modified_time: modifiedTime del archivo convertido
+            hojas: Diccionario {nombre_hoja: DataFrame}
+            formato: Identificador de la configuración de lectura (ej: config_hash)
+            memoria: Bytes antes/después de compactar ({'original', 'compacta'})
+
+        Returns:
+            True si se guardó
+        """
+        base = self._base(file_id)
+        try:
+            # Todas las hojas se convierten antes de escribir: si alguna no se
+            # puede guardar sin pérdida, no se toca la copia anterior
+            convertidas = [(nombre_hoja, df, *_para_parquet(df)) for nombre_hoja, df in hojas.items()]
+        except ValueError as e:
+            logger.warning(f"⚠️ El Master no se puede copiar a Parquet sin perder datos, se usará el .xlsx: {e}")
+            return False
+
+        try:
+            manifiesto_hojas = []
+            for i, (nombre_hoja, df, tabla, mixtas) in enumerate(convertidas):
+                temporal = f"{base}_{i}.parquet.tmp"
+                tabla.to_parquet(temporal, index=False)
+                os.replace(temporal, f"{base}_{i}.parquet")
+                manifiesto_hojas.append({
+                    'nombre': nombre_hoja,
+                    'columnas': [str(c) for c in df.columns],
+                    'mixtas': mixtas
+                })
+
+            # El manifiesto se escribe al final: solo queda vigente si todo se guardó
+            temporal = f"{base}.json.tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'file_id': file_id,
+                    'modified_time': modified_time,
+                    'formato': formato,
+                    'formato_sidecar': FORMATO_SIDECAR,
+                    'memoria': dict(memoria or {}),
+                    'convertido': datetime.now().isoformat(),
+                    'hojas': manifiesto_hojas
+                }, f, ensure_ascii=False, default=str)
+            os.replace(temporal, f"{base}.json")
+            return True
+
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo guardar la copia Parquet del Master: {e}")
+            return False
+
+
+def _combinar(serie: pd.Series, otra: pd.Series) -> pd.Series:
+    """Completa los vacíos de una columna con otra variante de la misma columna"""
+    try:
+        return serie.fillna(otra)
+    except (TypeError, ValueError):
+        # Ej: category sin las categorías de la otra columna
+        return serie.astype(object).fillna(otra.astype(object))
+
+
+def build_master_consolidado(
+    hojas: Mapping[str, pd.DataFrame],
+    columnas_canonicas: Sequence[str] = ()
+) -> Tuple[pd.DataFrame, Dict[str, Tuple[int, int]], Dict[str, Tuple[str, ...]]]:
+    """
+    Une todas las hojas del Master en un solo DataFrame
+
+    Las variantes de nombre de una columna ('Código del desembolso' y
+    'Codigo del desembolso', 'Fecha Facturación' y 'Fecha Facturacion')
+    quedan en una sola columna: se usa el nombre de columnas_canonicas o,
+    si no está, el primero encontrado. Las filas quedan en el orden de las
+    hojas y 'Tipo Factura' es category con el nombre de la hoja.
+
+    Args:
+        hojas: Diccionario {nombre_hoja: DataFrame}
+        columnas_canonicas: Nombres a usar para las variantes de una columna
+
+    Returns:
+        Tupla (consolidado, {nombre_hoja: (fila_inicio, fila_fin)},
+        {nombre_hoja: columnas de la hoja con nombres unificados})
+    """
+    canonicas = {clave_columna(c): c for c in columnas_canonicas}
+    partes = []
+    rangos: Dict[str, Tuple[int, int]] = {}
+    columnas: Dict[str, Tuple[str, ...]] = {}
+    categoricas = set()
+    inicio = 0
+
+    for nombre_hoja, df in hojas.items():
+        datos: Dict[str, pd.Series] = {}
+        for columna in df.columns:
+            nombre = canonicas.setdefault(clave_columna(columna), str(columna))
+            serie = df[columna]
+            datos[nombre] = _combinar(datos[nombre], serie) if nombre in datos else serie
+        for nombre, serie in datos.items():
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                categoricas.add(nombre)
+
+        partes.append(pd.DataFrame(datos).reset_index(drop=True))
+        rangos[nombre_hoja] = (inicio, inicio + len(df))
+        columnas[nombre_hoja] = tuple(datos)
+        inicio += len(df)
+
+    if not partes:
+        return pd.DataFrame(columns=[COLUMNA_TIPO_FACTURA]), rangos, columnas
+
+    consolidado = pd.concat(partes, axis=0, ignore_index=True, sort=False)
+
+    # concat deja como object las category con categorías distintas entre hojas
+    for nombre in categoricas:
+        if not isinstance(consolidado[nombre].dtype, pd.CategoricalDtype):
+            consolidado[nombre] = consolidado[nombre].astype('category')
+
+    consolidado[COLUMNA_TIPO_FACTURA] = pd.Categorical.from_codes(
+        np.repeat(np.arange(len(rangos)), [fin - ini for ini, fin in rangos.values()]),
+        categories=list(rangos)
+    )
+    return consolidado, rangos, columnas
+
+
+def _solo_lectura(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reconstruye un DataFrame compartido sobre arreglos numpy no modificables
+
+    Una escritura en sitio (df.loc[...] = ...) sobre la copia compartida
+    falla en vez de alterar los datos de las demás sesiones. Cada columna
+    numérica o de fecha se toma con to_numpy(copy=False) (sin copiar), se
+    marca con flags.writeable = False y el DataFrame se arma sin consolidar
+    (copy=False), así que cada columna queda sobre su propio arreglo. Las
+    columnas de texto (object) y categóricas se pasan tal cual: varias
+    funciones de pandas en Cython (ej: memory_usage(deep=True)) no aceptan
+    arreglos object de solo lectura.
+
+    Es una protección de mejor esfuerzo: si pandas consolida o copia las
+    columnas más adelante, el resultado vuelve a ser modificable (pero es
+    una copia, no los datos compartidos).
+
+    Args:
+        df: Consolidado del Master
+
+    Returns:
+        DataFrame con los mismos datos, columnas e índice
+    """
+    columnas = {}
+    for posicion in range(df.shape[1]):
+        serie = df.iloc[:, posicion]
+        if isinstance(serie.dtype, np.dtype) and serie.dtype != object:
+            valores = serie.to_numpy(copy=False)
+            valores.flags.writeable = False
+            columnas[posicion] = valores
+        else:
+            columnas[posicion] = serie
+    resultado = pd.DataFrame(columnas, index=df.index, copy=False)
+    resultado.columns = df.columns
+    return resultado
+
+
+def _para_parquet(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, bool]]:
+    """
+    Adapta un DataFrame del Master para guardarlo en Parquet sin perder datos
+
+    Cada columna se guarda con el nombre de su posición. Las columnas object
+    (o category) que no son solo texto, como un valor numérico con un 'N/A'
+    o fechas con 'pendiente', no tienen un tipo Parquet: se guardan como una
+    etiqueta por celda más una columna por tipo (ver _codificar_mixta), y
+    _desde_parquet devuelve exactamente los mismos valores.
+
+    Args:
+        df: Hoja del Master
+
+    Returns:
+        Tupla (DataFrame para Parquet, {posición: era category} de las columnas mixtas)
+
+    Raises:
+        ValueError: Si alguna celda no se puede representar sin pérdida
+    """
+    datos: Dict[str, Any] = {}
+    mixtas: Dict[str, bool] = {}
+
+    for posicion in range(df.shape[1]):
+        columna = df.iloc[:, posicion]
+        categorica = isinstance(columna.dtype, pd.CategoricalDtype)
+        valores = columna.cat.categories if categorica else columna
+        if (columna.dtype != object and not categorica) or \
+                pd.api.types.infer_dtype(valores, skipna=True) in ('string', 'empty'):
+            datos[str(posicion)] = columna.reset_index(drop=True)
+            continue
+
+        for parte, arreglo in _codificar_mixta(columna, df.columns[posicion]).items():
+            datos[f"{posicion}.{parte}"] = arreglo
+        mixtas[str(posicion)] = categorica
+
+    return pd.DataFrame(datos, index=pd.RangeIndex(len(df))), mixtas
+
+
+def _codificar_mixta(columna: pd.Series, nombre) -> Dict[str, np.ndarray]:
+    """
+    Separa una columna de tipos mezclados en una etiqueta por celda y columnas tipadas
+
+    Args:
+        columna: Columna object o category
+        nombre: Nombre de la columna (para el mensaje de error)
+
+    Returns:
+        {'tipo', 'texto', 'entero', 'decimal', 'fecha'}: arreglos del largo de la columna
+
+    Raises:
+        ValueError: Si una celda no tiene representación exacta (ej: fecha con zona horaria)
+    """
+    n = len(columna)
+    tipo = np.full(n, CELDA_VACIA, dtype=np.int8)
+    texto = np.full(n, None, dtype=object)
+    entero = np.zeros(n, dtype=np.int64)
+    decimal = np.full(n, np.nan)
+    fecha = np.full(n, np.datetime64('NaT', 'ns'))
+
+    for i, valor in enumerate(columna.to_numpy(dtype=object)):
+        try:
+            if valor is None:
+                continue
+            if valor is pd.NaT:
+                tipo[i] = CELDA_NAT
+            elif isinstance(valor, str):
+                tipo[i], texto[i] = CELDA_TEXTO, valor
+            elif isinstance(valor, (bool, np.bool_)):
+                tipo[i], entero[i] = CELDA_BOOLEANO, int(valor)
+            elif isinstance(valor, (int, np.integer)):
+                tipo[i], entero[i] = CELDA_ENTERO, valor
+            elif isinstance(valor, (float, np.floating)):
+                tipo[i], decimal[i] = CELDA_DECIMAL, valor
+            elif isinstance(valor, datetime) and valor.tzinfo is None:
+                tipo[i] = CELDA_TIMESTAMP if isinstance(valor, pd.Timestamp) else CELDA_FECHA_HORA
+                fecha[i] = pd.Timestamp(valor).to_datetime64()
+            elif isinstance(valor, date) and not isinstance(valor, datetime):
+                tipo[i], fecha[i] = CELDA_FECHA, pd.Timestamp(valor).to_datetime64()
+            elif isinstance(valor, time):
+                tipo[i], texto[i] = CELDA_HORA, valor.isoformat()
+            elif isinstance(valor, timedelta):
+                tipo[i], entero[i] = CELDA_DURACION, pd.Timedelta(valor).value
+            else:
+                raise ValueError(f"tipo {type(valor).__name__}")
+        except (OverflowError, ValueError) as e:
+            raise ValueError(f"columna '{nombre}', valor {valor!r}: {e}") from e
+
+    return {'tipo': tipo, 'texto': texto, 'entero': entero, 'decimal': decimal, 'fecha': fecha}
+
+
+def _decodificar_mixta(partes: Mapping[str, np.ndarray]) -> np.ndarray:
+    """
+    Reconstruye una columna mezclada guardada con _codificar_mixta
+
+    Args:
+        partes: Arreglos {'tipo', 'texto', 'entero', 'decimal', 'fecha'}
+
+    Returns:
+        Arreglo object con los valores originales (mismos tipos de Python)
+    """
+    tipo = np.asarray(partes['tipo'])
+    valores = np.full(len(tipo), None, dtype=object)
+    fechas = pd.DatetimeIndex(partes['fecha'])
+    convertir = {
+        CELDA_TEXTO: lambda m: np.asarray(partes['texto'], dtype=object)[m],
+        CELDA_ENTERO: lambda m: np.asarray(partes['entero'])[m].tolist(),
+        CELDA_DECIMAL: lambda m: np.asarray(partes['decimal'])[m].tolist(),
+        CELDA_BOOLEANO: lambda m: np.asarray(partes['entero'])[m].astype(bool).tolist(),
+        CELDA_FECHA_HORA: lambda m: fechas[m].to_pydatetime().tolist(),
+        CELDA_TIMESTAMP: lambda m: list(fechas[m]),
+        CELDA_FECHA: lambda m: [f.date() for f in fechas[m]],
+        CELDA_HORA: lambda m: [time.fromisoformat(t) for t in np.asarray(partes['texto'], dtype=object)[m]],
+        CELDA_DURACION: lambda m: pd.to_timedelta(np.asarray(partes['entero'])[m]).to_pytimedelta().tolist(),
+        CELDA_NAT: lambda m: [pd.NaT] * int(m.sum()),
+    }
+    for etiqueta, desde_partes in convertir.items():
+        seleccion = tipo == etiqueta
+        if seleccion.any():
+            lista = np.empty(int(seleccion.sum()), dtype=object)
+            lista[:] = desde_partes(seleccion)
+            valores[seleccion] = lista
+    return valores
+
+
+def _desde_parquet(tabla: pd.DataFrame, columnas: Sequence[str], mixtas: Mapping[str, bool]) -> pd.DataFrame:
+    """
+    Reconstruye una hoja guardada con _para_parquet
+
+    Args:
+        tabla: DataFrame leído del Parquet
+        columnas: Nombres originales de las columnas, en orden
+        mixtas: {posición: era category} de las columnas guardadas con etiqueta
+
+    Returns:
+        Hoja con los mismos valores y tipos que se guardaron
+    """
+    datos = {}
+    for posicion, nombre in enumerate(columnas):
+        llave = str(posicion)
+        if llave not in mixtas:
+            datos[posicion] = tabla[llave]
+            continue
+        valores = _decodificar_mixta({
+            parte: tabla[f"{llave}.{parte}"].to_numpy()
+            for parte in ('tipo', 'texto', 'entero', 'decimal', 'fecha')
+        })
+        datos[posicion] = pd.Series(valores, dtype='category' if mixtas[llave] else object)
+
+    df = pd.DataFrame(datos, index=tabla.index)
+    df.columns = list(columnas)
+    return df
+
+
+def read_master_sheets(origen, master_config: Mapping[str, Any]) -> Tuple[Dict[str, pd.DataFrame], List[str]]:
+    """
+    Lee las hojas de facturas del Master abriendo el libro una sola vez
+
+    El libro se abre en modo solo lectura (openpyxl read_only, o calamine si
+    está instalado) y solo se parsean las hojas configuradas; las columnas
+    que ni los filtros ni el reporte usan no se materializan y las columnas
+    de texto (NIT, códigos, factura) se declaran como str al leer.
+
+    Args:
+        origen: Ruta o archivo binario abierto con el .xlsx del Master
+        master_config: Sección 'master' de column_mapping.json
+
+    Returns:
+        Tupla ({nombre_hoja: DataFrame} de las hojas encontradas,
+        nombres de todas las hojas del libro)
+    """
+    excluidas = set(master_config.get('columnas_excluidas', ()))
+    excluidas_contienen = tuple(master_config.get('columnas_excluidas_contienen', ()))
+
+    def usar_columna(columna) -> bool:
+        nombre = str(columna)
+        return nombre not in excluidas and not any(parte in nombre for parte in excluidas_contienen)
+
+    opciones = {
+        'header': master_config.get('header_row', 2),
+        'usecols': usar_columna,
+        'dtype': dict(master_config.get('dtypes', {})) or None
+    }
+
+    def leer(engine: Optional[str]) -> Tuple[Dict[str, pd.DataFrame], List[str]]:
+        if hasattr(origen, 'seek'):
+            origen.seek(0)
+        with pd.ExcelFile(origen, engine=engine) as libro:
+            hojas = {
+                nombre: libro.parse(nombre, **opciones)
+                for nombre in master_config['sheets']
+                if nombre in libro.sheet_names
+            }
+            return hojas, list(libro.sheet_names)
+
+    if usar_calamine():
+        try:
+            return leer('calamine')
+        except Exception as e:
+            desactivar_calamine(e, 'el Master')
+    return leer('openpyxl')
+
+
+def memoria_hojas(hojas: Dict[str, pd.DataFrame]) -> int:
+    """
+    Calcula los bytes que ocupan las hojas en memoria (incluye el texto)
+
+    Args:
+        hojas: Diccionario {nombre_hoja: DataFrame}
+
+    Returns:
+        Total de bytes
+    """
+    return int(sum(df.memory_usage(deep=True).sum() for df in hojas.values()))
+
+
+def compact_master_sheet(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduce la memoria de una hoja del Master sin cambiar sus valores
+
+    - elimina las columnas 'Unnamed: N'
+    - convierte a datetime las columnas de fecha (nombre con 'fecha') cuyas
+      celdas son todas fechas; si alguna tiene texto (ej: 'pendiente') la
+      columna se deja como está: el índice de fechas (IndiceFechas) hace la
+      conversión con errors='coerce' solo para filtrar
+    - columnas de texto con pocos valores distintos (NIT, Moneda, Cliente...)
+      pasan a category; los códigos de desembolso y las fechas con texto se
+      mantienen como texto
+    - enteros y decimales se reducen al tipo más pequeño sin pérdida
+      (los decimales solo si float32 los representa exactamente)
+
+    Args:
+        df: Hoja del Master tal como se leyó
+
+    Returns:
+        Nueva hoja compactada
+    """
+    df = df.loc[:, [not str(c).startswith('Unnamed') for c in df.columns]]
+    resultado = {}
+
+    for columna in df.columns:
+        serie = df[columna]
+
+        if (es_columna_fecha(clave_columna(columna)) and serie.dtype == object
+                and pd.api.types.infer_dtype(serie, skipna=True) in ('datetime', 'datetime64', 'date')):
+            try:
+                serie = pd.to_datetime(serie)
+            except (TypeError, ValueError):
+                # Ej: zonas horarias mezcladas o fechas fuera del rango de datetime64
+                pass
+
+        elif serie.dtype == object:
+            # Los códigos de desembolso y las fechas con texto se combinan con fillna entre
+            # columnas (categorías distintas no se pueden combinar): quedan como texto
+            clave = clave_columna(columna)
+            se_combina = 'codigo' in clave or es_columna_fecha(clave)
+            if not se_combina and serie.count() and serie.nunique() <= MAX_PROPORCION_CATEGORIA * len(serie):
+                serie = serie.astype('category')
+
+        elif pd.api.types.is_integer_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+            serie = pd.to_numeric(serie, downcast='integer')
+
+        elif pd.api.types.is_float_dtype(serie) and serie.dtype != np.float32:
+            reducida = serie.astype(np.float32)
+            if np.array_equal(reducida.to_numpy(dtype=np.float64), serie.to_numpy(), equal_nan=True):
+                serie = reducida
+
+        resultado[columna] = serie
+
+    return pd.DataFrame(resultado, index=df.index)
+
+
+def compact_master_sheets(hojas: Dict[str, pd.DataFrame]) -> Tuple[Dict[str, pd.DataFrame], Dict[str, int]]:
+    """
+    Compacta todas las hojas del Master y mide la memoria antes y después
+
+    Args:
+        hojas: Diccionario {nombre_hoja: DataFrame}
+
+    Returns:
+        Tupla (hojas compactadas, {'original': bytes, 'compacta': bytes})
+    """
+    original = memoria_hojas(hojas)
+    compactas = {nombre: compact_master_sheet(df) for nombre, df in hojas.items()}
+    compacta = memoria_hojas(compactas)
+
+    logger.info(f"🗜️ Master compactado: {original / 1024 / 1024:.1f} MB → {compacta / 1024 / 1024:.1f} MB")
+    return compactas, {'original': original, 'compacta': compacta}
+
+
+# Instancias únicas por proceso (compartidas entre sesiones de Streamlit)
+_master_cache = MasterCache()
+_master_sidecar: Optional[MasterSidecar] = None
+
+
+def get_master_cache() -> MasterCache:
+    """
+    Obtiene la caché del Master del proceso
+
+    Returns:
+        MasterCache compartida
+    """
+    return _master_cache
+
+
+def get_master_sidecar() -> Optional[MasterSidecar]:
+    """
+    Obtiene la copia columnar del Master del proceso
+
+    Usa MASTER_SIDECAR_DIR como carpeta (vacío desactiva la copia).
+
+    Returns:
+        MasterSidecar o None si está desactivada o no se pudo crear
+    """
+    global _master_sidecar
+    if _master_sidecar is None:
+        directorio = os.getenv('MASTER_SIDECAR_DIR', DIRECTORIO_SIDECAR_POR_DEFECTO)
+        if not directorio:
+            return None
+        try:
+            _master_sidecar = MasterSidecar(directorio)
+        except OSError as e:
+            logger.warning(f"⚠️ Copia Parquet del Master desactivada: {e}")
+            return None
+    return _master_sidecar
@@ -6,10 +6,50 @@ Funciones principales:
 - Creación de visualizaciones
 """
 
+import gzip
+import hashlib
+import importlib.util
+import io
+import tempfile
+from io import BytesIO
+
 import pandas as pd
 import plotly.graph_objects as go
-from typing import Dict, List, Optional
-from datetime import datetime
+from typing import BinaryIO, Dict, Hashable, List, Optional, Tuple, Union
+from datetime import date, datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Escritor en streaming (memoria constante) para reportes grandes
+XLSXWRITER_DISPONIBLE = importlib.util.find_spec('xlsxwriter') is not None
+
+# A partir de este total de filas se usa el escritor en streaming: openpyxl
+# mantiene todas las celdas en memoria antes de guardar
+UMBRAL_FILAS_STREAMING = 20_000
+
+# Formatos de columna del Excel
+FORMATO_MONEDA = '#,##0.00'
+FORMATO_ENTERO = '0'
+FORMATO_FECHA = 'dd/mm/yyyy'
+FORMATOS_COLUMNA = {'moneda': FORMATO_MONEDA, 'entero': FORMATO_ENTERO, 'fecha': FORMATO_FECHA}
+
+# Filas por bloque al escribir Excel en streaming (acota los valores Python en memoria)
+FILAS_POR_BLOQUE_EXCEL = 5_000
+
+# El archivo generado se mantiene en memoria hasta este tamaño; luego pasa a disco
+MAX_BYTES_BUFFER_EXCEL = 32 * 1024 * 1024
+
+# Filas por bloque al escribir CSV (acota la memoria del texto intermedio)
+FILAS_POR_BLOQUE_CSV = 10_000
+
+# Formatos de exportación: {formato: (extensión, tipo MIME)}
+FORMATOS_EXPORTACION = {
+    'xlsx': ('.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('.csv', 'text/csv'),
+    'csv.gz': ('.csv.gz', 'application/gzip'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet')
+}
 
 
 def consolidate_data(df_nuva1: pd.DataFrame, df_nuva2: pd.DataFrame, df_netsuite: pd.DataFrame) -> pd.DataFrame:
@@ -27,6 +67,236 @@ def consolidate_data(df_nuva1: pd.DataFrame, df_nuva2: pd.DataFrame, df_netsuite
     pass
 
 
+def fingerprint_hojas(datos_por_hoja: Dict[str, pd.DataFrame]) -> str:
+    """
+    Calcula una huella del contenido de las hojas del reporte
+
+    Cambia si cambia cualquier nombre de hoja, columna, tipo o valor, así que
+    sirve como llave para reutilizar el archivo generado.
+
+    Args:
+        datos_por_hoja: Diccionario {nombre_hoja: DataFrame}
+
+    Returns:
+        Hash SHA-256 hexadecimal
+    """
+    huella = hashlib.sha256()
+    for nombre_hoja, df in datos_por_hoja.items():
+        huella.update(nombre_hoja.encode('utf-8'))
+        huella.update(repr(list(df.columns)).encode('utf-8'))
+        huella.update(repr(df.dtypes.astype(str).tolist()).encode('utf-8'))
+        huella.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return huella.hexdigest()
+
+
+def build_excel_report(datos_por_hoja: Dict[str, pd.DataFrame], streaming: Optional[bool] = None) -> bytes:
+    """
+    Genera el archivo Excel del reporte con una hoja por DataFrame
+
+    Args:
+        datos_por_hoja: Diccionario {nombre_hoja: DataFrame}
+        streaming: Usar el escritor en memoria constante (None = automático
+            si el total de filas supera UMBRAL_FILAS_STREAMING)
+
+    Returns:
+        Contenido del archivo .xlsx
+    """
+    if streaming is None:
+        total_filas = sum(len(df) for df in datos_por_hoja.values())
+        streaming = XLSXWRITER_DISPONIBLE and total_filas >= UMBRAL_FILAS_STREAMING
+
+    if streaming:
+        return _build_excel_streaming(datos_por_hoja)
+
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl', date_format=FORMATO_FECHA, datetime_format=FORMATO_FECHA) as writer:
+        for nombre_hoja, df in datos_por_hoja.items():
+            # Excel tiene límite de 31 caracteres para nombres de hoja
+            df.to_excel(writer, sheet_name=nombre_hoja[:31], index=False)
+
+            # Mismos formatos de columna que el escritor en streaming (las fechas ya
+            # llevan FORMATO_FECHA por datetime_format)
+            worksheet = writer.sheets[nombre_hoja[:31]]
+            for col, (tipo, formato) in enumerate(_tipos_columnas(df)):
+                if tipo != 'numero' or len(df) == 0:
+                    continue
+                for (celda,) in worksheet.iter_rows(min_row=2, max_row=len(df) + 1, min_col=col + 1, max_col=col + 1):
+                    celda.number_format = FORMATOS_COLUMNA[formato]
+    return buffer.getvalue()
+
+
+def _build_excel_streaming(datos_por_hoja: Dict[str, pd.DataFrame]) -> bytes:
+    """
+    Genera el Excel por bloques de filas con xlsxwriter en modo constant_memory
+
+    Cada fila se escribe a un archivo temporal apenas se completa y los
+    valores se convierten a Python de a FILAS_POR_BLOQUE_EXCEL filas, así que
+    la memoria no crece con el número de filas. Las columnas decimales llevan
+    formato de moneda, las enteras formato entero y las fechas dd/mm/yyyy.
+
+    Args:
+        datos_por_hoja: Diccionario {nombre_hoja: DataFrame}
+
+    Returns:
+        Contenido del archivo .xlsx
+    """
+    import xlsxwriter
+
+    with tempfile.SpooledTemporaryFile(max_size=MAX_BYTES_BUFFER_EXCEL) as destino:
+        workbook = xlsxwriter.Workbook(destino, {
+            'constant_memory': True,
+            'tmpdir': tempfile.gettempdir(),
+            'strings_to_urls': False,
+            'nan_inf_to_errors': True
+        })
+        formatos = {clave: workbook.add_format({'num_format': formato}) for clave, formato in FORMATOS_COLUMNA.items()}
+        encabezado = workbook.add_format({'bold': True})
+
+        for nombre_hoja, df in datos_por_hoja.items():
+            # Excel tiene límite de 31 caracteres para nombres de hoja
+            worksheet = workbook.add_worksheet(nombre_hoja[:31])
+            worksheet.write_row(0, 0, [str(c) for c in df.columns], encabezado)
+
+            tipos = _tipos_columnas(df)
+            escritores = [(_ESCRITORES[tipo], formatos.get(formato)) for tipo, formato in tipos]
+
+            for inicio in range(0, len(df), FILAS_POR_BLOQUE_EXCEL):
+                bloque = df.iloc[inicio:inicio + FILAS_POR_BLOQUE_EXCEL]
+                columnas = [_valores_columna(bloque.iloc[:, col], tipo) for col, (tipo, _) in enumerate(tipos)]
+                for fila in range(len(bloque)):
+                    for col, (escribir, formato) in enumerate(escritores):
+                        valor = columnas[col][fila]
+                        if valor is not None:
+                            escribir(worksheet, inicio + fila + 1, col, valor, formato)
+
+        workbook.close()
+        destino.seek(0)
+        contenido = destino.read()
+
+    logger.info(f"📄 Excel generado en streaming: {len(contenido):,} bytes")
+    return contenido
+
+
+def _tipo_columna(serie: pd.Series) -> Tuple[str, Optional[str]]:
+    """
+    Tipo de escritura y formato de una columna del Excel (igual en ambos escritores)
+
+    Args:
+        serie: Columna del DataFrame
+
+    Returns:
+        Tupla (tipo: 'fecha' | 'numero' | 'celda', llave de FORMATOS_COLUMNA o None).
+        En columnas de texto/mixtas el formato solo aplica a las fechas sueltas.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return 'fecha', 'fecha'
+    if pd.api.types.is_bool_dtype(serie):
+        return 'celda', None
+    if pd.api.types.is_integer_dtype(serie):
+        return 'numero', 'entero'
+    if pd.api.types.is_float_dtype(serie):
+        return 'numero', 'moneda'
+    return 'celda', 'fecha'
+
+
+def _tipos_columnas(df: pd.DataFrame) -> List[Tuple[str, Optional[str]]]:
+    """_tipo_columna de cada columna, en orden"""
+    return [_tipo_columna(df.iloc[:, col]) for col in range(df.shape[1])]
+
+
+def _valores_columna(serie: pd.Series, tipo: str) -> List:
+    """
+    Convierte (un bloque de) una columna a valores Python listos para xlsxwriter
+
+    Args:
+        serie: Columna (o bloque de filas de la columna)
+        tipo: Tipo de _tipo_columna
+
+    Returns:
+        Lista de valores con None para vacíos
+    """
+    nulos = serie.isna().to_numpy()
+
+    if tipo == 'fecha':
+        valores = serie.dt.tz_localize(None) if serie.dt.tz is not None else serie
+        valores = valores.astype(object).tolist()
+    elif tipo == 'numero':
+        valores = serie.astype('float64').tolist()
+    elif pd.api.types.is_bool_dtype(serie):
+        valores = serie.astype(object).tolist()
+    else:
+        valores = serie.tolist()
+
+    if nulos.any():
+        valores = [None if nulo else valor for valor, nulo in zip(valores, nulos)]
+    return valores
+
+
+def _escribir_numero(worksheet, fila, col, valor, formato):
+    worksheet.write_number(fila, col, valor, formato)
+
+
+def _escribir_fecha(worksheet, fila, col, valor, formato):
+    worksheet.write_datetime(fila, col, valor, formato)
+
+
+def _escribir_celda(worksheet, fila, col, valor, formato_fecha):
+    """Escribe un valor de una columna de tipo mixto (texto se escribe siempre como texto)"""
+    if isinstance(valor, str):
+        worksheet.write_string(fila, col, valor)
+    elif isinstance(valor, (datetime, date)):
+        worksheet.write_datetime(fila, col, valor, formato_fecha)
+    else:
+        try:
+            worksheet.write(fila, col, valor)
+        except TypeError:
+            worksheet.write_string(fila, col, str(valor))
+
+
+_ESCRITORES = {'fecha': _escribir_fecha, 'numero': _escribir_numero, 'celda': _escribir_celda}
+
+
+def get_cached_excel_report(huella: str, cache: Dict) -> Optional[Dict]:
+    """
+    Obtiene el reporte ya generado para estos datos, si existe
+
+    Args:
+        huella: fingerprint_hojas() de los datos, calculada al procesarlos
+        cache: Diccionario donde se guarda el reporte (ej: st.session_state)
+
+    Returns:
+        {'fingerprint', 'bytes', 'generado'} o None si no se ha generado
+        para el contenido actual
+    """
+    reporte = cache.get('reporte_excel')
+    if reporte and reporte['fingerprint'] == huella:
+        return reporte
+    return None
+
+
+def build_cached_excel_report(datos_por_hoja: Dict[str, pd.DataFrame], huella: str, cache: Dict) -> Dict:
+    """
+    Genera el reporte una sola vez por contenido y lo guarda en la caché
+
+    Args:
+        datos_por_hoja: Diccionario {nombre_hoja: DataFrame}
+        huella: fingerprint_hojas() de los datos, calculada al procesarlos
+        cache: Diccionario donde se guarda el reporte (ej: st.session_state)
+
+    Returns:
+        {'fingerprint', 'bytes', 'generado'}
+    """
+    reporte = get_cached_excel_report(huella, cache)
+    if reporte is None:
+        reporte = {
+            'fingerprint': huella,
+            'bytes': build_excel_report(datos_por_hoja),
+            'generado': datetime.now()
+        }
+        cache['reporte_excel'] = reporte
+    return reporte
+
+
 def generate_excel_report(df: pd.DataFrame, output_path: str, include_charts: bool = True) -> bool:
     """
     Genera un reporte en formato Excel
@@ -42,18 +312,178 @@ def generate_excel_report(df: pd.DataFrame, output_path: str, include_charts: bo
     pass
 
 
-def generate_csv_report(df: pd.DataFrame, output_path: str) -> bool:
+def generate_csv_report(
+    df: pd.DataFrame,
+    output_path: Union[str, BinaryIO],
+    compresion: Optional[str] = None,
+    filas_por_bloque: int = FILAS_POR_BLOQUE_CSV
+) -> bool:
     """
     Genera un reporte en formato CSV
 
+    Escribe por bloques de filas para no construir el texto completo en
+    memoria. Usa UTF-8 con BOM para que Excel muestre bien las tildes.
+
     Args:
         df: DataFrame con los datos del reporte
-        output_path: Ruta donde guardar el archivo
+        output_path: Ruta donde guardar el archivo o archivo binario abierto
+        compresion: 'gzip' o None (None = gzip si la ruta termina en .gz)
+        filas_por_bloque: Filas escritas por bloque
 
     Returns:
         True si fue exitoso
     """
-    pass
+    if compresion is None and isinstance(output_path, str) and output_path.endswith('.gz'):
+        compresion = 'gzip'
+
+    try:
+        destino = open(output_path, 'wb') if isinstance(output_path, str) else output_path
+        try:
+            binario = gzip.GzipFile(fileobj=destino, mode='wb', compresslevel=6) if compresion == 'gzip' else destino
+            texto = io.TextIOWrapper(binario, encoding='utf-8-sig', newline='')
+            try:
+                for inicio in range(0, max(len(df), 1), filas_por_bloque):
+                    df.iloc[inicio:inicio + filas_por_bloque].to_csv(texto, header=(inicio == 0), index=False)
+            finally:
+                texto.flush()
+                texto.detach()
+                if binario is not destino:
+                    binario.close()
+        finally:
+            if destino is not output_path:
+                destino.close()
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Error al generar CSV: {e}")
+        return False
+
+
+def generate_parquet_report(df: pd.DataFrame, output_path: Union[str, BinaryIO]) -> bool:
+    """
+    Genera un reporte en formato Parquet
+
+    Las columnas de texto con valores de tipos mezclados (ej: números y
+    texto en la misma columna del Master) se guardan como texto.
+
+    Args:
+        df: DataFrame con los datos del reporte
+        output_path: Ruta donde guardar el archivo o archivo binario abierto
+
+    Returns:
+        True si fue exitoso
+    """
+    try:
+        try:
+            df.to_parquet(output_path, index=False)
+        except (TypeError, ValueError):
+            # pyarrow no admite columnas object con tipos mezclados
+            if not isinstance(output_path, str):
+                output_path.seek(0)
+                output_path.truncate()
+            df.astype({
+                col: 'string' for col in df.columns if df[col].dtype == object
+            }).to_parquet(output_path, index=False)
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Error al generar Parquet: {e}")
+        return False
+
+
+def build_export(df: pd.DataFrame, formato: str, nombre_hoja: str = 'Reporte') -> Tuple[bytes, str, str]:
+    """
+    Genera el archivo de exportación de un DataFrame en el formato pedido
+
+    Args:
+        df: DataFrame a exportar
+        formato: Llave de FORMATOS_EXPORTACION ('xlsx', 'csv', 'csv.gz', 'parquet')
+        nombre_hoja: Nombre de la hoja (solo .xlsx)
+
+    Returns:
+        Tupla (contenido, extensión, tipo MIME)
+
+    Raises:
+        ValueError: Si el formato no existe o no se pudo generar
+    """
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValueError(f"Formato de exportación desconocido: {formato}")
+    extension, mime = FORMATOS_EXPORTACION[formato]
+
+    if formato == 'xlsx':
+        return build_excel_report({nombre_hoja: df}), extension, mime
+
+    with tempfile.SpooledTemporaryFile(max_size=MAX_BYTES_BUFFER_EXCEL) as destino:
+        if formato == 'parquet':
+            exitoso = generate_parquet_report(df, destino)
+        else:
+            exitoso = generate_csv_report(df, destino, compresion='gzip' if formato == 'csv.gz' else None)
+
+        if not exitoso:
+            raise ValueError(f"No se pudo generar el archivo {extension}")
+
+        destino.seek(0)
+        return destino.read(), extension, mime
+
+
+def get_cached_export(huella: Hashable, formato: str, cache: Dict) -> Optional[Dict]:
+    """
+    Obtiene la exportación ya generada para estos datos y formato, si existe
+
+    Args:
+        huella: Identifica el contenido exportado (ej: versión del Master + filtro)
+        formato: Llave de FORMATOS_EXPORTACION
+        cache: Diccionario donde se guarda la exportación (ej: st.session_state)
+
+    Returns:
+        {'llave', 'bytes', 'extension', 'mime', 'generado'} o None si no se ha
+        generado para esta huella y formato
+    """
+    exportado = cache.get('reporte_exportado')
+    if exportado and exportado['llave'] == (huella, formato):
+        return exportado
+    return None
+
+
+def build_cached_export(
+    df: pd.DataFrame,
+    formato: str,
+    huella: Hashable,
+    cache: Dict,
+    nombre_hoja: str = 'Reporte'
+) -> Dict:
+    """
+    Genera la exportación una sola vez por huella y formato y la guarda en la caché
+
+    Solo se guarda la última exportación (reemplaza a la anterior).
+
+    Args:
+        df: DataFrame a exportar
+        formato: Llave de FORMATOS_EXPORTACION
+        huella: Identifica el contenido exportado (ej: versión del Master + filtro)
+        cache: Diccionario donde se guarda la exportación (ej: st.session_state)
+        nombre_hoja: Nombre de la hoja (solo .xlsx)
+
+    Returns:
+        {'llave', 'bytes', 'extension', 'mime', 'generado'}
+
+    Raises:
+        ValueError: Si el formato no existe o no se pudo generar
+    """
+    exportado = get_cached_export(huella, formato, cache)
+    if exportado is None:
+        # Liberar la exportación anterior antes de generar la nueva
+        cache.pop('reporte_exportado', None)
+        contenido, extension, mime = build_export(df, formato, nombre_hoja=nombre_hoja)
+        exportado = {
+            'llave': (huella, formato),
+            'bytes': contenido,
+            'extension': extension,
+            'mime': mime,
+            'generado': datetime.now()
+        }
+        cache['reporte_exportado'] = exportado
+    return exportado
 
 
 def create_visualizations(df: pd.DataFrame) -> Dict[str, go.Figure]:
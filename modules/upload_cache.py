@@ -0,0 +1,224 @@
+"""
+Caché en disco de archivos cargados ya procesados
+Guarda el DataFrame normalizado de cada archivo (Netsuite / Noova) indexado por
+el hash SHA-256 de su contenido + el hash de la configuración + la versión del
+formato (CACHE_VERSION), para que volver a cargar el mismo archivo no requiera
+parsear el Excel otra vez
+"""
+
+import hashlib
+import importlib.util
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Parquet requiere pyarrow (o fastparquet); sin él se usa pickle
+PARQUET_DISPONIBLE = (
+    importlib.util.find_spec('pyarrow') is not None
+    or importlib.util.find_spec('fastparquet') is not None
+)
+EXTENSION = '.parquet' if PARQUET_DISPONIBLE else '.pkl'
+
+# Versión del formato de las entradas: subirla cuando cambie cómo se leen o
+# normalizan los archivos (FileProcessor), para no servir DataFrames de la
+# versión anterior del código con la misma configuración
+CACHE_VERSION = 1
+
+# Límites por defecto (configurables por variables de entorno)
+DIRECTORIO_POR_DEFECTO = os.path.join(tempfile.gettempdir(), 'facturacion_upload_cache')
+MAX_MB_POR_DEFECTO = 256
+
+
+def hash_contenido(contenido) -> str:
+    """
+    Calcula el SHA-256 de un contenido en memoria sin copiarlo
+
+    Args:
+        contenido: bytes, bytearray o memoryview
+
+    Returns:
+        Hash hexadecimal
+    """
+    return hashlib.sha256(contenido).hexdigest()
+
+
+class UploadCache:
+    """
+    Caché LRU en disco de DataFrames normalizados
+
+    Cada entrada es un archivo Parquet (pickle si no hay pyarrow) cuyo nombre
+    es la llave. El orden LRU se guarda en el mtime de los archivos, así que
+    sobrevive a reinicios; al superar max_bytes se eliminan los menos usados.
+    """
+
+    def __init__(self, directorio: str, max_bytes: int):
+        """
+        Inicializa la caché y carga el índice de entradas existentes
+
+        Args:
+            directorio: Carpeta donde se guardan las entradas
+            max_bytes: Tamaño total máximo en disco
+        """
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entradas: 'OrderedDict[str, int]' = OrderedDict()
+        self._total = 0
+
+        os.makedirs(directorio, exist_ok=True)
+
+        existentes = []
+        for nombre in os.listdir(directorio):
+            if not nombre.endswith(EXTENSION):
+                continue
+            stat = os.stat(os.path.join(directorio, nombre))
+            existentes.append((stat.st_mtime_ns, nombre[:-len(EXTENSION)], stat.st_size))
+
+        for _, llave, tamano in sorted(existentes):
+            self._entradas[llave] = tamano
+            self._total += tamano
+
+    @staticmethod
+    def make_key(contenido_sha256: str, config_hash: str, tipo: str) -> str:
+        """
+        Construye la llave de una entrada (incluye CACHE_VERSION)
+
+        Args:
+            contenido_sha256: Hash del contenido del archivo cargado
+            config_hash: Hash de la configuración vigente (ConfigSnapshot.config_hash)
+            tipo: Tipo de archivo ('netsuite_facturas', 'noova_facturas', ...)
+
+        Returns:
+            Llave hexadecimal
+        """
+        return hashlib.sha256(f"v{CACHE_VERSION}:{contenido_sha256}:{config_hash}:{tipo}".encode('ascii')).hexdigest()
+
+    def _ruta(self, llave: str) -> str:
+        return os.path.join(self.directorio, llave + EXTENSION)
+
+    def get(self, llave: str) -> Optional[pd.DataFrame]:
+        """
+        Obtiene un DataFrame de la caché
+
+        Args:
+            llave: Llave de make_key
+
+        Returns:
+            DataFrame guardado o None si no existe (o no se pudo leer)
+        """
+        with self._lock:
+            if llave not in self._entradas:
+                return None
+            ruta = self._ruta(llave)
+            try:
+                df = pd.read_parquet(ruta) if PARQUET_DISPONIBLE else pd.read_pickle(ruta)
+                os.utime(ruta)
+            except Exception as e:
+                logger.warning(f"⚠️ Entrada de caché ilegible, se descarta: {e}")
+                self._eliminar(llave)
+                return None
+
+            self._entradas.move_to_end(llave)
+            return df
+
+    def put(self, llave: str, df: pd.DataFrame) -> bool:
+        """
+        Guarda un DataFrame en la caché y aplica la expulsión LRU
+
+        Args:
+            llave: Llave de make_key
+            df: DataFrame a guardar
+
+        Returns:
+            True si se guardó
+        """
+        with self._lock:
+            ruta = self._ruta(llave)
+            temporal = f"{ruta}.{os.getpid()}.tmp"
+            try:
+                if PARQUET_DISPONIBLE:
+                    df.to_parquet(temporal, compression='zstd' if _zstd_disponible() else 'snappy')
+                else:
+                    df.to_pickle(temporal)
+                os.replace(temporal, ruta)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo guardar en la caché de archivos: {e}")
+                if os.path.exists(temporal):
+                    os.remove(temporal)
+                return False
+
+            if llave in self._entradas:
+                self._total -= self._entradas.pop(llave)
+            tamano = os.path.getsize(ruta)
+            self._entradas[llave] = tamano
+            self._total += tamano
+
+            while self._total > self.max_bytes and len(self._entradas) > 1:
+                self._eliminar(next(iter(self._entradas)))
+            return True
+
+    def _eliminar(self, llave: str):
+        """Elimina una entrada (llamar con el lock tomado)"""
+        self._total -= self._entradas.pop(llave, 0)
+        try:
+            os.remove(self._ruta(llave))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        """Elimina todas las entradas"""
+        with self._lock:
+            for llave in list(self._entradas):
+                self._eliminar(llave)
+
+    @property
+    def total_bytes(self) -> int:
+        """Tamaño total en disco de las entradas"""
+        return self._total
+
+
+def _zstd_disponible() -> bool:
+    """Indica si pyarrow puede comprimir con zstd"""
+    try:
+        import pyarrow as pa
+        return pa.Codec.is_available('zstd')
+    except Exception:
+        return False
+
+
+# Instancia única por proceso (compartida entre sesiones de Streamlit)
+_cache: Optional[UploadCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_upload_cache() -> Optional[UploadCache]:
+    """
+    Obtiene la caché de archivos cargados del proceso
+
+    Usa UPLOAD_CACHE_DIR y UPLOAD_CACHE_MAX_MB (0 desactiva la caché).
+
+    Returns:
+        UploadCache o None si está desactivada o no se pudo crear
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            max_mb = float(os.getenv('UPLOAD_CACHE_MAX_MB', MAX_MB_POR_DEFECTO))
+            if max_mb <= 0:
+                return None
+            try:
+                _cache = UploadCache(
+                    os.getenv('UPLOAD_CACHE_DIR', DIRECTORIO_POR_DEFECTO),
+                    int(max_mb * 1024 * 1024)
+                )
+            except OSError as e:
+                logger.warning(f"⚠️ Caché de archivos desactivada: {e}")
+                return None
+        return _cache
@@ -0,0 +1,334 @@
+"""
+Filtro original del Master (app.py antes del índice y el motor de consultas)
+
+Copia del código que corría en cada rerun de Streamlit, sin los widgets,
+para usarlo como referencia en las pruebas: selección de la hoja (o el
+consolidado), opciones de NIT y código, rango de fechas, filtros y
+limpieza de columnas del reporte.
+"""
+
+import pandas as pd
+
+CONSOLIDADO = "📊 Consolidado (Todas)"
+
+
+def normalizar_texto(texto):
+    """Normaliza texto eliminando tildes y convirtiendo a minúsculas"""
+    if texto is None:
+        return ""
+    texto = str(texto)
+    # Reemplazar tildes
+    reemplazos = {
+        'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
+        'Á': 'a', 'É': 'e', 'Í': 'i', 'Ó': 'o', 'Ú': 'u',
+        'ñ': 'n', 'Ñ': 'n'
+    }
+    for acento, sin_acento in reemplazos.items():
+        texto = texto.replace(acento, sin_acento)
+    return texto.lower().strip()
+
+
+def normalizar_nit(valor):
+    """Convierte NIT a string limpio, manejando floats y strings"""
+    if pd.isna(valor):
+        return None
+    try:
+        # Si es float, convertir a int primero para quitar decimales
+        if isinstance(valor, float):
+            valor = int(valor)
+        # Convertir a string y limpiar
+        return str(valor).strip()
+    except:  # noqa: E722
+        return str(valor).strip() if str(valor).strip() else None
+
+
+def seleccion_original(dataframes_master, tipo_seleccionado=CONSOLIDADO):
+    """
+    DataFrame seleccionado con sus columnas temporales y las columnas detectadas
+
+    Returns:
+        {'df', 'columna_nit', 'columnas_codigo', 'columnas_fecha', 'columnas_fecha_normalizadas'}
+    """
+    # Determinar DataFrame según selección
+    if tipo_seleccionado == CONSOLIDADO:
+        # Consolidar todas las hojas
+        dfs_a_consolidar = []
+        for nombre_hoja, df_hoja in dataframes_master.items():
+            if df_hoja is not None and not df_hoja.empty:
+                df_temp = df_hoja.copy()
+                df_temp['Tipo Factura'] = nombre_hoja  # Agregar columna de tipo
+                dfs_a_consolidar.append(df_temp)
+        df_seleccionado = pd.concat(dfs_a_consolidar, axis=0, ignore_index=True, sort=False)
+    else:
+        df_seleccionado = dataframes_master[tipo_seleccionado].copy()
+
+    # Detectar columna NIT de forma flexible
+    columna_nit = None
+    for col in df_seleccionado.columns:
+        col_normalizado = normalizar_texto(col)
+        # Buscar variaciones de "nit"
+        if 'nit' in col_normalizado:
+            columna_nit = col
+            break
+
+    # Detectar columna de Código de desembolso de forma flexible
+    columnas_codigo_encontradas = []
+    for col in df_seleccionado.columns:
+        col_normalizado = normalizar_texto(col)
+        # Buscar si contiene "codigo" y "desembolso"
+        if 'codigo' in col_normalizado and 'desembolso' in col_normalizado:
+            columnas_codigo_encontradas.append(col)
+        # O solo "codigo" si no hay otra opción
+        elif col_normalizado == 'codigo':
+            columnas_codigo_encontradas.append(col)
+
+    # Detectar TODAS las columnas de fecha disponibles
+    columnas_fecha_disponibles = []
+    for col in df_seleccionado.columns:
+        col_normalizado = normalizar_texto(col)
+        # Buscar cualquier columna que tenga "fecha"
+        if 'fecha' in col_normalizado:
+            columnas_fecha_disponibles.append(col)
+
+    # Normalizar columna NIT para filtrado consistente
+    if columna_nit:
+        df_seleccionado['_NIT_normalizado'] = df_seleccionado[columna_nit].apply(normalizar_nit)
+
+    # IMPORTANTE: Unificar TODAS las columnas de código en una sola columna temporal
+    # Esto resuelve el problema cuando diferentes hojas tienen nombres ligeramente diferentes
+    if columnas_codigo_encontradas:
+        # Crear columna unificada combinando todos los valores de código
+        df_seleccionado['_Codigo_unificado'] = None
+        for col_codigo in columnas_codigo_encontradas:
+            df_seleccionado['_Codigo_unificado'] = df_seleccionado['_Codigo_unificado'].fillna(df_seleccionado[col_codigo])
+
+        # Convertir a string y limpiar
+        df_seleccionado['_Codigo_unificado'] = df_seleccionado['_Codigo_unificado'].astype(str).str.strip()
+        df_seleccionado.loc[df_seleccionado['_Codigo_unificado'] == 'nan', '_Codigo_unificado'] = None
+
+    # Normalizar TODAS las columnas de fecha encontradas
+    fechas_normalizadas_dict = {}
+    for col_fecha in columnas_fecha_disponibles:
+        try:
+            df_seleccionado[f'_Fecha_{col_fecha}'] = pd.to_datetime(
+                df_seleccionado[col_fecha],
+                errors='coerce'
+            )
+            fechas_normalizadas_dict[col_fecha] = f'_Fecha_{col_fecha}'
+        except:  # noqa: E722
+            pass
+
+    return {
+        'df': df_seleccionado,
+        'columna_nit': columna_nit,
+        'columnas_codigo': columnas_codigo_encontradas,
+        'columnas_fecha': columnas_fecha_disponibles,
+        'columnas_fecha_normalizadas': list(fechas_normalizadas_dict.values()),
+    }
+
+
+def opciones_original(seleccion, filtro_nit=()):
+    """
+    Opciones de los filtros de NIT y código (códigos de los NITs seleccionados)
+
+    Returns:
+        (nits_disponibles, codigos_disponibles)
+    """
+    df_seleccionado = seleccion['df']
+    columna_nit = seleccion['columna_nit']
+
+    nits_disponibles = []
+    if columna_nit:
+        nits_disponibles = [nit for nit in df_seleccionado['_NIT_normalizado'].dropna().unique() if nit]
+        nits_disponibles = sorted(nits_disponibles)
+
+    codigos_disponibles = []
+    if seleccion['columnas_codigo']:
+        # Si hay NITs seleccionados, filtrar los códigos por esos NITs
+        if filtro_nit and columna_nit:
+            df_para_codigos = df_seleccionado[
+                df_seleccionado['_NIT_normalizado'].isin(filtro_nit)
+            ]
+        else:
+            df_para_codigos = df_seleccionado
+
+        # Usar columna unificada que combina todas las variaciones de código
+        codigos_disponibles = [c for c in df_para_codigos['_Codigo_unificado'].dropna().unique() if c and str(c).strip() and str(c) != 'nan']
+        codigos_disponibles = sorted(codigos_disponibles)
+
+    return nits_disponibles, codigos_disponibles
+
+
+def limites_fechas_original(seleccion):
+    """Fecha mínima y máxima de TODAS las columnas de fecha (None si no hay)"""
+    df_seleccionado = seleccion['df']
+
+    # Obtener rango de fechas de TODAS las columnas
+    todas_fechas = []
+    for col_normalizada in seleccion['columnas_fecha_normalizadas']:
+        fechas_col = df_seleccionado[col_normalizada].dropna()
+        if len(fechas_col) > 0:
+            todas_fechas.extend(fechas_col.tolist())
+
+    if not todas_fechas:
+        return None
+    todas_fechas_series = pd.Series(todas_fechas)
+    return todas_fechas_series.min().date(), todas_fechas_series.max().date()
+
+
+def filtrar_original(seleccion, filtro_nit=(), filtro_codigo=(), fecha_desde=None, fecha_hasta=None):
+    """
+    Filas que cumplen los filtros, con las columnas temporales todavía presentes
+
+    Args:
+        fecha_desde, fecha_hasta: Fechas del date_input (el filtro de fecha se
+            activa si se dan ambas)
+    """
+    df_seleccionado = seleccion['df']
+    columna_nit = seleccion['columna_nit']
+    columnas_codigo_encontradas = seleccion['columnas_codigo']
+    columnas_fecha_normalizadas = seleccion['columnas_fecha_normalizadas']
+    usar_filtro_fecha = fecha_desde is not None and fecha_hasta is not None
+
+    # Aplicar filtros
+    df_filtrado = df_seleccionado.copy()
+
+    # Aplicar filtro de NIT (usando columna normalizada Y buscando en código de desembolso)
+    if filtro_nit and columna_nit:
+        # Filtro 1: Coincidencia directa en columna NIT
+        filtro_por_columna_nit = df_filtrado['_NIT_normalizado'].isin(filtro_nit)
+
+        # Filtro 2: Buscar NIT en código de desembolso (formato CO:nit:NUM:NUM:LETRAS)
+        if columnas_codigo_encontradas and '_Codigo_unificado' in df_filtrado.columns:
+            filtro_por_codigo = pd.Series([False] * len(df_filtrado), index=df_filtrado.index)
+
+            for nit in filtro_nit:
+                # Buscar el patrón "CO:nit:" en el código de desembolso
+                filtro_por_codigo = filtro_por_codigo | df_filtrado['_Codigo_unificado'].str.contains(
+                    f'CO:{nit}:',
+                    na=False,
+                    case=False,
+                    regex=False
+                )
+
+            # Combinar ambos filtros con OR (incluir si cumple cualquiera de los dos)
+            df_filtrado = df_filtrado[filtro_por_columna_nit | filtro_por_codigo]
+        else:
+            # Si no hay columna de código, solo usar filtro de NIT directo
+            df_filtrado = df_filtrado[filtro_por_columna_nit]
+
+    # Aplicar filtro de Código (usando columna unificada)
+    if filtro_codigo and columnas_codigo_encontradas:
+        df_filtrado = df_filtrado[df_filtrado['_Codigo_unificado'].isin(filtro_codigo)]
+
+    # Aplicar filtro de Fecha (si está activado) - Busca en TODAS las columnas de fecha
+    if usar_filtro_fecha and columnas_fecha_normalizadas and fecha_desde and fecha_hasta:
+        # Convertir fechas a datetime para comparación
+        fecha_desde_dt = pd.to_datetime(fecha_desde)
+        fecha_hasta_dt = pd.to_datetime(fecha_hasta) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)  # Incluir todo el día
+
+        # Crear filtro combinado: incluir si CUALQUIER columna de fecha está en el rango
+        filtro_fecha_combinado = pd.Series([False] * len(df_filtrado), index=df_filtrado.index)
+
+        for col_fecha_norm in columnas_fecha_normalizadas:
+            if col_fecha_norm in df_filtrado.columns:
+                # Agregar registros donde esta columna de fecha esté en el rango
+                filtro_fecha_combinado = filtro_fecha_combinado | (
+                    (df_filtrado[col_fecha_norm] >= fecha_desde_dt) &
+                    (df_filtrado[col_fecha_norm] <= fecha_hasta_dt)
+                )
+
+        df_filtrado = df_filtrado[filtro_fecha_combinado]
+
+    return df_filtrado
+
+
+def reporte_original(seleccion, filtro_nit=(), filtro_codigo=(), fecha_desde=None, fecha_hasta=None):
+    """Reporte filtrado y limpio, como se mostraba y descargaba"""
+    df_filtrado = filtrar_original(seleccion, filtro_nit, filtro_codigo, fecha_desde, fecha_hasta)
+    usar_filtro_fecha = fecha_desde is not None and fecha_hasta is not None
+    columnas_fecha_normalizadas = seleccion['columnas_fecha_normalizadas']
+
+    # Limpiar columnas temporales del resultado final
+    columnas_temporales = ['_NIT_normalizado', '_Codigo_unificado', '_Fecha_normalizada']
+    # Agregar todas las columnas de fecha normalizadas
+    if usar_filtro_fecha and columnas_fecha_normalizadas:
+        columnas_temporales.extend(columnas_fecha_normalizadas)
+
+    for col_temp in columnas_temporales:
+        if col_temp in df_filtrado.columns:
+            df_filtrado = df_filtrado.drop(columns=[col_temp])
+
+    # Aplicar limpieza de columnas
+    return limpiar_columnas_reporte(df_filtrado)
+
+
+def limpiar_columnas_reporte(df):
+    """Limpia, consolida y reorganiza columnas del reporte"""
+    df_clean = df.copy()
+
+    # 1. Eliminar columnas Unnamed
+    unnamed_cols = [col for col in df_clean.columns if 'Unnamed' in str(col) or col.startswith('Unnamed')]
+    df_clean = df_clean.drop(columns=unnamed_cols, errors='ignore')
+
+    # 2. Eliminar columnas innecesarias
+    columnas_eliminar = [
+        'Validacion Consecutivo', 'Revision', 'Estado', 'Envio',
+        'Fac de la nota Crédito', 'Fecha Nota Credito', '# Nota Credito'
+    ]
+    df_clean = df_clean.drop(columns=columnas_eliminar, errors='ignore')
+
+    # 3. Unificar columnas de Código de desembolso
+    if 'Código del desembolso' in df_clean.columns and 'Codigo del desembolso' in df_clean.columns:
+        # Combinar ambas columnas
+        df_clean['Codigo del desembolso'] = df_clean['Codigo del desembolso'].fillna(df_clean['Código del desembolso'])
+        df_clean = df_clean.drop(columns=['Código del desembolso'], errors='ignore')
+    elif 'Código del desembolso' in df_clean.columns:
+        df_clean = df_clean.rename(columns={'Código del desembolso': 'Codigo del desembolso'})
+
+    # 4. Unificar columnas de Fecha (consolidar en "Fecha Factura")
+    columnas_fecha = ['Fecha Factura', 'Fecha Facturacion', 'Fecha de desembolso']
+    fecha_principal = None
+    for col_fecha in columnas_fecha:
+        if col_fecha in df_clean.columns:
+            if fecha_principal is None:
+                fecha_principal = col_fecha
+                df_clean = df_clean.rename(columns={col_fecha: 'Fecha Factura'})
+            else:
+                # Rellenar valores faltantes con otras columnas de fecha
+                df_clean['Fecha Factura'] = df_clean['Fecha Factura'].fillna(df_clean[col_fecha])
+                df_clean = df_clean.drop(columns=[col_fecha], errors='ignore')
+
+    # 5. Eliminar todas las columnas de "Mes Facturacion" (preferimos usar "Fecha Factura")
+    mes_facturacion_cols = [col for col in df_clean.columns if 'Mes facturacion' in col or 'Mes Facturacion' in col or 'Mes facturación' in col]
+    df_clean = df_clean.drop(columns=mes_facturacion_cols, errors='ignore')
+
+    # 6. Unificar columnas de Moneda (eliminar duplicados)
+    moneda_cols = [col for col in df_clean.columns if col == 'Moneda' or col.endswith('.1') and 'Moneda' in col]
+    if len(moneda_cols) > 1:
+        # Mantener solo la primera columna de Moneda
+        for col in moneda_cols[1:]:
+            df_clean = df_clean.drop(columns=[col], errors='ignore')
+
+    # 7. Reorganizar columnas (las más importantes al principio)
+    columnas_prioritarias = [
+        'Tipo Factura',
+        'Codigo del desembolso',
+        'NIT',
+        'Cliente',
+        'Fecha Factura',
+        '# Factura',
+        'Numero de factura',
+        'Moneda'
+    ]
+
+    # Columnas que existen y están en la lista prioritaria
+    cols_ordenadas = [col for col in columnas_prioritarias if col in df_clean.columns]
+
+    # Resto de columnas (que no están en prioritarias)
+    cols_restantes = [col for col in df_clean.columns if col not in cols_ordenadas]
+
+    # Reordenar
+    df_clean = df_clean[cols_ordenadas + cols_restantes]
+
+    return df_clean
@@ -0,0 +1,73 @@
+"""Pruebas del registro de configuración compartido por proceso"""
+
+import json
+import os
+import shutil
+from types import MappingProxyType
+
+import pytest
+
+from modules.config_registry import ConfigRegistry
+from modules.file_processor import FileProcessor
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ARCHIVOS = ('column_mapping.json', 'classification_rules.json', 'product_classification.json')
+
+
+def _descongelar(valor):
+    """Convierte MappingProxyType/tuplas de vuelta a dicts/listas, como los deja json.load"""
+    if isinstance(valor, MappingProxyType):
+        return {k: _descongelar(v) for k, v in valor.items()}
+    if isinstance(valor, tuple):
+        return [_descongelar(v) for v in valor]
+    return valor
+
+
+def _json_original(ruta):
+    """Lectura original de FileProcessor.__init__ (json.load en cada instancia)"""
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def rutas(tmp_path):
+    for nombre in ARCHIVOS:
+        shutil.copy(os.path.join(RAIZ, 'config', nombre), tmp_path / nombre)
+    return [str(tmp_path / nombre) for nombre in ARCHIVOS]
+
+
+def test_configuracion_igual_a_la_lectura_original(rutas):
+    snapshot = ConfigRegistry().get_snapshot(*rutas)
+    processor = FileProcessor(*rutas)
+
+    for atributo, ruta in zip(('column_mapping', 'classification_rules', 'product_classification'), rutas):
+        original = _json_original(ruta)
+        assert _descongelar(getattr(snapshot, atributo)) == original
+        assert _descongelar(getattr(processor, atributo)) == original
+
+    with pytest.raises(TypeError):
+        snapshot.column_mapping['master'] = {}
+
+
+def test_recarga_solo_cuando_cambia_el_contenido(rutas):
+    registro = ConfigRegistry()
+    primero = registro.get_snapshot(*rutas)
+    assert registro.get_snapshot(*rutas) is primero
+
+    # Solo cambia el mtime: se reutiliza la configuración
+    stat = os.stat(rutas[2])
+    os.utime(rutas[2], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert registro.get_snapshot(*rutas) is primero
+
+    # Cambia el contenido: se vuelve a leer y cambia el hash
+    clasificacion = _json_original(rutas[2])
+    clasificacion['clasificacion_productos']['424242'] = {'categoria': 'otros', 'descripcion': 'Producto nuevo'}
+    with open(rutas[2], 'w', encoding='utf-8') as f:
+        json.dump(clasificacion, f, ensure_ascii=False)
+    os.utime(rutas[2], ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+
+    segundo = registro.get_snapshot(*rutas)
+    assert segundo is not primero
+    assert segundo.config_hash != primero.config_hash
+    assert _descongelar(segundo.product_classification) == clasificacion
+    assert segundo.tabla_clasificacion.loc['424242', 'descripcion'] == 'Producto nuevo'
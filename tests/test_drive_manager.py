@@ -0,0 +1,94 @@
+"""Pruebas de la descarga por partes de DriveManager"""
+
+import os
+
+import pytest
+
+from modules import drive_manager
+from modules.drive_manager import DriveManager
+
+
+class _Respuesta(dict):
+    """Respuesta HTTP mínima (httplib2) con su código de estado"""
+
+    def __init__(self, status, **cabeceras):
+        super().__init__(**cabeceras)
+        self.status = status
+
+
+class _HttpRangos:
+    """Responde peticiones con cabecera Range sobre un contenido fijo y las registra"""
+
+    def __init__(self, contenido: bytes):
+        self.contenido = contenido
+        self.rangos = []
+
+    def request(self, uri, method='GET', headers=None, **kwargs):
+        inicio, fin = (int(p) for p in headers['range'][len('bytes='):].split('-'))
+        self.rangos.append((inicio, fin))
+        parte = self.contenido[inicio:fin + 1]
+        rango = f'bytes {inicio}-{inicio + len(parte) - 1}/{len(self.contenido)}'
+        return _Respuesta(206, **{'content-range': rango}), parte
+
+
+class _PeticionMedia:
+    def __init__(self, http):
+        self.http = http
+        self.uri = 'https://www.googleapis.com/drive/v3/files/archivo?alt=media'
+        self.headers = {}
+
+
+class _ServicioDrive:
+    """files().get_media() de la API de Drive sobre un _HttpRangos"""
+
+    def __init__(self, http):
+        self.http = http
+        self.peticiones = []
+
+    def files(self):
+        return self
+
+    def get_media(self, **kwargs):
+        self.peticiones.append(kwargs)
+        return _PeticionMedia(self.http)
+
+
+def _drive(contenido: bytes) -> DriveManager:
+    drive = DriveManager.__new__(DriveManager)
+    drive.service = _ServicioDrive(_HttpRangos(contenido))
+    drive.folder_id = 'carpeta'
+    drive.creds = None
+    drive.ultima_descarga = None
+    return drive
+
+
+def test_descarga_por_partes_igual_al_contenido():
+    contenido = os.urandom(2500)
+    drive = _drive(contenido)
+
+    with drive.download_file_to_spool('archivo', 'Archivo control', chunk_size=1024) as archivo:
+        assert archivo.tell() == 0
+        assert archivo.read() == contenido
+
+    assert drive.service.http.rangos == [(0, 1023), (1024, 2047), (2048, 3071)]
+    assert drive.service.peticiones == [{'fileId': 'archivo', 'supportsAllDrives': True}]
+    assert drive.ultima_descarga['bytes'] == 2500
+    assert [parte['bytes'] for parte in drive.ultima_descarga['partes']] == [1024, 1024, 452]
+
+
+@pytest.mark.parametrize('variable, esperado', [
+    (None, drive_manager.CHUNK_DESCARGA_POR_DEFECTO),
+    ('0.5', 512 * 1024),
+])
+def test_tamano_de_parte_desde_variable_de_entorno(monkeypatch, variable, esperado):
+    if variable is None:
+        monkeypatch.delenv('DRIVE_CHUNK_MB', raising=False)
+    else:
+        monkeypatch.setenv('DRIVE_CHUNK_MB', variable)
+    drive = _drive(b'x' * 10)
+
+    with drive.download_file_to_spool('archivo', 'Archivo control') as archivo:
+        assert archivo.read() == b'x' * 10
+
+    assert drive.ultima_descarga['chunk_size'] == esperado
+    assert drive.service.http.rangos == [(0, esperado - 1)]
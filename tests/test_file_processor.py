@@ -0,0 +1,522 @@
+"""Pruebas de FileProcessor"""
+
+import io
+import os
+import re
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import file_processor
+from modules.file_processor import FileProcessor
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(scope='module')
+def processor():
+    return FileProcessor(
+        os.path.join(RAIZ, 'config', 'column_mapping.json'),
+        os.path.join(RAIZ, 'config', 'classification_rules.json'),
+        os.path.join(RAIZ, 'config', 'product_classification.json')
+    )
+
+
+def _costos_fijos_fila_por_fila(df: pd.DataFrame) -> pd.DataFrame:
+    """Implementación anterior de _prepare_costos_fijos (iterrows + df.at), como referencia"""
+    df['Valor Costos Fijos'] = 0.0
+    df['Seguro + Iva'] = 0.0
+    df['Int. Corriente Facturado FK'] = 0.0
+    df['Int. Mora Facturado FK'] = 0.0
+    df['Otros Valor'] = 0.0
+    df['Otros Concepto'] = ''
+
+    for idx, row in df.iterrows():
+        categoria = row['categoria']
+        valor = row.get('valor_netsuite', 0)
+
+        if pd.notna(valor):
+            if categoria == 'costos_fijos':
+                df.at[idx, 'Valor Costos Fijos'] = valor
+            elif categoria == 'seguro_iva':
+                df.at[idx, 'Seguro + Iva'] = valor
+            elif categoria == 'intereses_corriente':
+                df.at[idx, 'Int. Corriente Facturado FK'] = valor
+            elif categoria == 'intereses_mora':
+                df.at[idx, 'Int. Mora Facturado FK'] = valor
+            elif categoria == 'otros':
+                df.at[idx, 'Otros Valor'] = valor
+                df.at[idx, 'Otros Concepto'] = row.get('descripcion_producto', '')
+
+    df['(-) Retencio n en la Fuente'] = 0.0
+    df['Valor Neto Facturado'] = (
+        df['Valor Costos Fijos'] +
+        df['Seguro + Iva'] +
+        df['Int. Corriente Facturado FK'] +
+        df['Int. Mora Facturado FK'] +
+        df['Otros Valor'] +
+        df['(-) Retencio n en la Fuente']
+    )
+
+    return pd.DataFrame({
+        'Codigo del desembolso': df['codigo_operacion'],
+        'Valor Costos Fijos': df['Valor Costos Fijos'],
+        'Seguro + Iva': df['Seguro + Iva'],
+        'Int. Corriente Facturado FK': df['Int. Corriente Facturado FK'],
+        'Int. Mora Facturado FK': df['Int. Mora Facturado FK'],
+        '(-) Retencion en la Fuente': df['(-) Retencio n en la Fuente'],
+        'Valor Neto Facturado': df['Valor Neto Facturado'],
+        'Fecha Facturacion': df['fecha_facturacion'],
+        '# Factura': df['numero_factura'],
+        'Validacion Consecutivo': df['consecutivo'],
+        'Revision': '',
+        'Moneda': df['moneda'],
+        'Codigo Tercero': df['nit_cliente'],
+        'Otros Concepto': df['Otros Concepto'],
+        'Otros Valor': df['Otros Valor'],
+        'Estado': df['estado'],
+        'Envio': df['envio'],
+        'Fac de la nota Credito': df['fuente_noova'].apply(
+            lambda x: 'Nota Credito' if x == 'notas_credito' else ''
+        )
+    })
+
+
+def _facturas_costos_fijos(processor: FileProcessor, filas: int = 400) -> pd.DataFrame:
+    """Facturas con categorías mezcladas, códigos sin clasificar, valores vacíos y facturas repetidas"""
+    rng = np.random.default_rng(7)
+    # 103: costos fijos, 309: seguro + iva, 101/102: intereses, 307/312: otros, 999 y None: sin clasificar
+    codigos = np.array(['103', '309', '101', '102', '307', '312', '999', None], dtype=object)
+    producto = pd.Series(codigos[rng.integers(0, len(codigos), filas)])
+
+    clasificacion = pd.DataFrame(
+        [processor.classify_by_product_code(codigo) for codigo in producto],
+        columns=['categoria', 'columna_destino', 'descripcion_producto']
+    )
+    valores = rng.normal(100000, 25000, filas).round(2)
+    valores[rng.random(filas) < 0.15] = np.nan
+
+    return pd.DataFrame({
+        'codigo_operacion': [f'CO:900{i % 7}:1:{i % 3}:AA' for i in range(filas)],
+        'numero_factura': [f'FK-{i // 3}' for i in range(filas)],  # cada factura tiene varias líneas
+        'consecutivo': np.arange(filas),
+        'fecha_facturacion': pd.Timestamp('2024-08-01') + pd.to_timedelta(rng.integers(0, 60, filas), unit='D'),
+        'moneda': np.where(rng.random(filas) < 0.8, 'COP', 'USD'),
+        'nit_cliente': [f'900{i % 7}' for i in range(filas)],
+        'estado': 'Emitida',
+        'envio': 'Enviada',
+        'fuente_noova': np.where(rng.random(filas) < 0.1, 'notas_credito', 'facturas'),
+        'valor_netsuite': valores,
+        'categoria': clasificacion['categoria'],
+        'descripcion_producto': clasificacion['descripcion_producto'],
+    }, index=pd.RangeIndex(10, 10 + filas))
+
+
+def test_costos_fijos_vectorizado_igual_a_fila_por_fila(processor):
+    df = _facturas_costos_fijos(processor)
+    assert {'costos_fijos', 'seguro_iva', 'intereses_corriente', 'intereses_mora',
+            'otros', 'sin_clasificar'} <= set(df['categoria'])
+
+    esperado = _costos_fijos_fila_por_fila(df.copy())
+    resultado = processor._prepare_costos_fijos(df.copy())
+
+    pd.testing.assert_frame_equal(resultado, esperado)
+
+
+def test_max_workers_lectura_variable_de_entorno(monkeypatch):
+    monkeypatch.setattr(file_processor, '_limite_memoria_mb', lambda: None)
+    monkeypatch.setattr(file_processor, '_nucleos_disponibles', lambda: 8)
+    monkeypatch.setenv('LECTURA_MAX_WORKERS', '2')
+    assert file_processor.max_workers_lectura() == 2
+    monkeypatch.setenv('LECTURA_MAX_WORKERS', '0')
+    assert file_processor.max_workers_lectura() == 1
+
+
+def test_max_workers_lectura_secuencial_con_poca_memoria(monkeypatch):
+    monkeypatch.delenv('LECTURA_MAX_WORKERS', raising=False)
+    monkeypatch.setattr(file_processor, '_nucleos_disponibles', lambda: 8)
+    monkeypatch.setattr(file_processor, '_limite_memoria_mb', lambda: 512)
+    assert file_processor.max_workers_lectura() == 1
+    monkeypatch.setattr(file_processor, '_limite_memoria_mb', lambda: None)
+    assert file_processor.max_workers_lectura() == file_processor.MAX_WORKERS_LECTURA
+
+
+def _format_mes_facturacion_original(fecha) -> str:
+    """_format_mes_facturacion original (se aplicaba fila por fila con .apply), como referencia"""
+    if pd.isna(fecha):
+        return ''
+
+    try:
+        if isinstance(fecha, str):
+            fecha = pd.to_datetime(fecha)
+
+        # Mapeo de meses en español
+        meses = {
+            1: 'ene', 2: 'feb', 3: 'mar', 4: 'abr',
+            5: 'may', 6: 'jun', 7: 'jul', 8: 'ago',
+            9: 'sep', 10: 'oct', 11: 'nov', 12: 'dic'
+        }
+
+        mes = meses.get(fecha.month, '')
+        año = str(fecha.year)[-2:]  # Últimos 2 dígitos del año
+
+        return f"{mes}-{año}"
+
+    except Exception:
+        return ''
+
+
+@pytest.mark.parametrize('valores', [
+    [datetime(2024, 1, 2, 5), date(2023, 3, 4), '2024-05-06', '15/02/2024', 'xx',
+     45000, 3.5, True, None, np.nan, pd.Timestamp('2022-07-08'), pd.NaT],
+    [datetime(2024, 1, 2), None, datetime(2024, 3, 1)],
+    [date(2024, 1, 2), date(2024, 2, 3)],
+    ['2024-01-02', None, '03/04/2024', 'no es fecha'],
+    [datetime(2024, 1, 2), '03/04/2024'],
+    [1, 2, None],
+    [None, None],
+])
+@pytest.mark.filterwarnings('ignore:Parsing dates:UserWarning')  # lo emite la referencia original
+def test_mes_facturacion_igual_al_original(processor, valores):
+    rng = np.random.default_rng(0)
+    fechas = pd.Series(rng.choice(np.array(valores, dtype=object), 500), index=pd.RangeIndex(7, 507))
+
+    esperado = fechas.apply(_format_mes_facturacion_original).astype(object)
+    pd.testing.assert_series_equal(processor._format_mes_facturacion_series(fechas.copy()), esperado)
+
+
+def test_mes_facturacion_de_texto_vacio_queda_vacio(processor):
+    # Cambio de comportamiento intencional: el original daba '-an' para '' (NaT.month
+    # no está en el mapeo y str(NaT.year) es 'nan'); ahora queda vacío como las demás
+    # fechas no válidas
+    fechas = pd.Series(['', '2024-08-01', None], dtype=object)
+
+    assert fechas.apply(_format_mes_facturacion_original).tolist() == ['-an', 'ago-24', '']
+    assert processor._format_mes_facturacion_series(fechas).tolist() == ['', 'ago-24', '']
+
+
+def test_calamine_se_desactiva_despues_de_fallar(processor, monkeypatch):
+    buffer = io.BytesIO()
+    pd.DataFrame({'A': ['x', 'y'], 'B': [1, 2]}).to_excel(buffer, sheet_name='Hoja', index=False)
+    contenido = buffer.getvalue()
+
+    leer_excel = pd.read_excel
+    engines = []
+
+    def read_excel(origen, engine=None, **opciones):
+        engines.append(engine)
+        if engine == 'calamine':
+            raise ImportError('python-calamine incompatible')
+        return leer_excel(origen, engine=engine, **opciones)
+
+    monkeypatch.setattr(file_processor, '_calamine_activo', True)
+    monkeypatch.setattr(pd, 'read_excel', read_excel)
+
+    for _ in range(2):
+        df = processor._read_mapped_excel(contenido, 'Hoja', {'a': 'A', 'b': 'B'}, {}, formato='xlsx')
+        assert df['A'].tolist() == ['x', 'y']
+
+    assert engines == ['calamine', 'openpyxl', 'openpyxl']
+    assert not file_processor.usar_calamine()
+
+
+def _extract_prefix_original(numero_factura) -> str:
+    """extract_prefix original (prefijos fijos, se aplicaba fila por fila), como referencia"""
+    if not isinstance(numero_factura, str):
+        return 'DESCONOCIDO'
+
+    numero_factura = numero_factura.strip().upper()
+
+    # Orden de prioridad de prefijos (más largo primero)
+    prefijos = ['NCFE', 'ITPA', 'ITGC', 'FE', 'GL']
+
+    for prefijo in prefijos:
+        if numero_factura.startswith(prefijo):
+            return prefijo
+
+    return 'DESCONOCIDO'
+
+
+def _extract_consecutive_original(numero_factura):
+    """extract_consecutive original, como referencia"""
+    if not isinstance(numero_factura, str):
+        return None
+
+    # Buscar secuencia de dígitos al final
+    match = re.search(r'(\d+)$', numero_factura.strip())
+
+    if match:
+        try:
+            return int(match.group(1))
+        except ValueError:
+            return None
+
+    return None
+
+
+@pytest.mark.parametrize('valores', [
+    ['FE9133', ' itpa5678 ', 'NCFE12', 'ncfe0045', 'ITGC1', 'GL-0012', 'FE', 'FE12A', 'XX99',
+     'NC FE 77', 'fe 3 4', '', None, np.nan, 123, 45.0],
+    ['FE1', 'FE2', 'ITPA3'],
+])
+def test_prefijo_y_consecutivo_iguales_al_original(processor, valores):
+    rng = np.random.default_rng(1)
+    numeros = pd.Series(rng.choice(np.array(valores, dtype=object), 300), index=pd.RangeIndex(5, 305))
+
+    partes = processor.extract_prefix_and_consecutive(numeros)
+
+    pd.testing.assert_series_equal(
+        partes['prefijo'], numeros.apply(_extract_prefix_original), check_names=False
+    )
+    pd.testing.assert_series_equal(
+        partes['consecutivo'], numeros.apply(_extract_consecutive_original),
+        check_names=False, check_dtype=False
+    )
+    assert numeros.map(processor.extract_prefix).tolist() == numeros.map(_extract_prefix_original).tolist()
+
+
+def _classify_by_product_code_original(product_classification: dict, codigo_producto):
+    """normalize_product_code + classify_by_product_code originales, como referencia"""
+    def normalize_product_code(codigo_producto):
+        if pd.isna(codigo_producto):
+            return None
+
+        try:
+            # Convertir a string y eliminar espacios
+            codigo_str = str(codigo_producto).strip()
+
+            # Si es 'nan', retornar None
+            if codigo_str.lower() == 'nan':
+                return None
+
+            # Convertir a entero y luego a string para eliminar ceros iniciales
+            codigo_int = int(float(codigo_str))
+            return str(codigo_int)
+        except (ValueError, TypeError):
+            return None
+
+    # Normalizar código de producto
+    codigo_normalizado = normalize_product_code(codigo_producto)
+
+    if not codigo_normalizado:
+        return ('sin_clasificar', 'Sin Clasificar', 'Sin codigo producto')
+
+    # Buscar en la clasificación de productos
+    productos = product_classification.get('clasificacion_productos', {})
+
+    if codigo_normalizado in productos:
+        producto_info = productos[codigo_normalizado]
+        categoria = producto_info.get('categoria', 'sin_clasificar')
+        descripcion = producto_info.get('descripcion', 'Sin descripcion')
+
+        # Obtener nombre de columna destino
+        mapeo_columnas = product_classification.get('mapeo_categoria_columna', {})
+        columna_destino = mapeo_columnas.get(categoria, 'Sin Clasificar')
+
+        return (categoria, columna_destino, descripcion)
+
+    # Si no se encuentra el código, es no clasificado
+    return ('sin_clasificar', 'Sin Clasificar', f'Codigo {codigo_normalizado} no encontrado')
+
+
+def test_clasificacion_de_productos_igual_a_la_original(processor):
+    conocidos = list(processor.product_classification['clasificacion_productos'])
+    valores = np.array(
+        conocidos + ['0' + conocidos[0], f' {conocidos[1]} ', float(conocidos[2]), int(conocidos[3]),
+                     '999', '1e2', 'abc', 'nan', '', True, None, np.nan],
+        dtype=object
+    )
+    rng = np.random.default_rng(4)
+    codigos = pd.Series(rng.choice(valores, 500), index=pd.RangeIndex(3, 503))
+
+    resultado = processor.classify_products(codigos)
+
+    original = codigos.apply(lambda c: _classify_by_product_code_original(processor.product_classification, c))
+    esperado = pd.DataFrame({
+        'categoria': original.apply(lambda x: x[0]),
+        'columna_destino': original.apply(lambda x: x[1]),
+        'descripcion_producto': original.apply(lambda x: x[2]),
+    })
+    pd.testing.assert_frame_equal(resultado, esperado)
+    assert set(esperado['categoria']) - {'sin_clasificar'}
+
+
+def _read_netsuite_original(file_path, config) -> pd.DataFrame:
+    """read_netsuite_file original (openpyxl y, si falla, xlrd), como referencia"""
+    sheet_name = config['sheet_name']
+    cols = config['columns']
+
+    # Intentar leer con openpyxl primero (soporta .xls y .xlsx modernos)
+    # Si falla, intentar con xlrd (archivos .xls antiguos)
+    try:
+        df = pd.read_excel(file_path, sheet_name=sheet_name, engine='openpyxl')
+    except Exception as e1:
+        try:
+            df = pd.read_excel(file_path, sheet_name=sheet_name, engine='xlrd')
+        except Exception as e2:
+            raise Exception(f"No se pudo leer el archivo con ningún engine. Openpyxl: {str(e1)}, Xlrd: {str(e2)}")
+
+    # Renombrar columnas según mapeo
+    df_renamed = df.rename(columns={
+        cols['numero_factura']: 'numero_factura',
+        cols['moneda']: 'moneda',
+        cols['valor']: 'valor_netsuite'
+    })
+
+    # Seleccionar solo las columnas necesarias
+    df_result = df_renamed[['numero_factura', 'moneda', 'valor_netsuite']].copy()
+
+    # Limpiar y normalizar numero_factura
+    df_result['numero_factura'] = df_result['numero_factura'].astype(str).str.strip().str.upper()
+
+    # Convertir valor a numérico
+    df_result['valor_netsuite'] = pd.to_numeric(df_result['valor_netsuite'], errors='coerce')
+
+    # Remover filas sin número de factura válido
+    df_result = df_result[df_result['numero_factura'].notna()]
+    df_result = df_result[df_result['numero_factura'] != 'NAN']
+
+    return df_result
+
+
+def _export_netsuite(processor: FileProcessor, filas: int = 120) -> pd.DataFrame:
+    """Export de Netsuite con columnas que no se usan, facturas vacías y valores en texto"""
+    cols = processor.column_mapping['netsuite']['columns']
+    rng = np.random.default_rng(2)
+    numeros = np.array([f' fe{i} ' if i % 11 == 0 else f'FE{i}' for i in range(filas)], dtype=object)
+    numeros[rng.random(filas) < 0.1] = None
+    valores = rng.normal(1e6, 1e5, filas).round(2).astype(object)
+    valores[::13] = 'pendiente'
+    return pd.DataFrame({
+        'Fecha': pd.Timestamp('2024-08-01') + pd.to_timedelta(np.arange(filas) % 30, unit='D'),
+        cols['numero_factura']: numeros,
+        'Nombre': [f'Cliente {i % 5}' for i in range(filas)],
+        cols['moneda']: np.where(np.arange(filas) % 4, 'COP', 'USD'),
+        cols['valor']: valores,
+    })
+
+
+@pytest.mark.parametrize('calamine', [False, True])
+def test_netsuite_xlsx_igual_al_original(processor, monkeypatch, tmp_path, calamine):
+    if calamine and not file_processor.CALAMINE_DISPONIBLE:
+        pytest.skip('python-calamine no está instalado')
+    monkeypatch.setattr(file_processor, '_calamine_activo', calamine)
+
+    ruta = tmp_path / 'netsuite.xls'  # Netsuite exporta .xlsx con extensión .xls
+    _export_netsuite(processor).to_excel(
+        ruta, sheet_name=processor.column_mapping['netsuite']['sheet_name'], index=False, engine='openpyxl'
+    )
+    assert file_processor.detect_excel_format(str(ruta)) == 'xlsx'
+
+    for leer, config_key in ((processor.read_netsuite_file, 'netsuite'),
+                             (processor.read_netsuite_nc_file, 'netsuite_nc')):
+        esperado = _read_netsuite_original(str(ruta), processor.column_mapping[config_key])
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+        for origen in (str(ruta), contenido):
+            pd.testing.assert_frame_equal(leer(origen), esperado, check_dtype=False)
+
+
+def test_netsuite_html_con_extension_xls(processor, tmp_path):
+    # El original no podía leerlo (openpyxl y xlrd fallan con HTML): se compara con el .xlsx
+    export = _export_netsuite(processor)
+    ruta_html = tmp_path / 'netsuite.xls'
+    ruta_html.write_text(
+        '<html><body><table><tr><td>Vista predeterminada</td></tr></table>'
+        + export.to_html(index=False) + '</body></html>',
+        encoding='utf-8'
+    )
+    ruta_xlsx = tmp_path / 'netsuite.xlsx'
+    export.to_excel(ruta_xlsx, sheet_name=processor.column_mapping['netsuite']['sheet_name'], index=False)
+
+    assert file_processor.detect_excel_format(str(ruta_html)) == 'html'
+    assert file_processor.detect_excel_format(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'\x00' * 8) == 'xls'
+    with pytest.raises(Exception):
+        _read_netsuite_original(str(ruta_html), processor.column_mapping['netsuite'])
+
+    resultado = processor.read_netsuite_file(str(ruta_html))
+    esperado = _read_netsuite_original(str(ruta_xlsx), processor.column_mapping['netsuite'])
+    pd.testing.assert_frame_equal(resultado, esperado, check_dtype=False)
+
+
+class _ArchivoCargado(io.BytesIO):
+    """Archivo cargado en Streamlit (UploadedFile es un BytesIO con nombre)"""
+
+    def __init__(self, contenido: bytes, name: str):
+        super().__init__(contenido)
+        self.name = name
+
+
+def _export_noova(processor: FileProcessor, filas: int = 150) -> pd.DataFrame:
+    """Export de Noova con NIT numéricos, códigos de producto decimales y facturas vacías"""
+    cols = processor.column_mapping['noova_facturas']['columns']
+    rng = np.random.default_rng(5)
+    numeros = np.array([f'fk-{i}' if i % 9 == 0 else f'FK-{i}' for i in range(filas)], dtype=object)
+    numeros[rng.random(filas) < 0.1] = None
+    productos = np.array([103, 309.0, '101', 999, None], dtype=object)[rng.integers(0, 5, filas)]
+    return pd.DataFrame({
+        cols['fecha']: pd.Timestamp('2024-08-01') + pd.to_timedelta(np.arange(filas) % 45, unit='D'),
+        cols['numero_factura']: numeros,
+        cols['nit']: np.where(np.arange(filas) % 3, 900123456, 800999).astype(object),
+        cols['nombre_cliente']: [f'Cliente {i % 7}' for i in range(filas)],
+        cols['email']: 'cliente@example.com',
+        cols['estado']: 'Emitida',
+        cols['envio']: 'Enviada',
+        cols['codigo_operacion']: [f'CO:900{i % 7}:1:{i % 3}:AA' for i in range(filas)],
+        cols['codigo_producto']: productos,
+        cols['concepto']: 'Costos fijos',
+        'VALOR': rng.normal(1e5, 1e4, filas).round(2),
+    })
+
+
+def _cargas(processor: FileProcessor) -> dict:
+    """Los cuatro archivos tal como llegan de st.file_uploader: {tipo: (nombre, contenido)}"""
+    cargas = {}
+    for tipo, nombre, export, config_key in (
+        ('netsuite_facturas', 'netsuite.xls', _export_netsuite(processor), 'netsuite'),
+        ('netsuite_nc', 'netsuite_nc.xls', _export_netsuite(processor, 60), 'netsuite_nc'),
+        ('noova_facturas', 'facturas.xlsx', _export_noova(processor), 'noova_facturas'),
+        ('noova_nc', 'notas.xlsx', _export_noova(processor, 40), 'noova_notas_credito'),
+    ):
+        buffer = io.BytesIO()
+        export.to_excel(buffer, sheet_name=processor.column_mapping[config_key]['sheet_name'], index=False)
+        cargas[tipo] = (nombre, buffer.getvalue())
+    return cargas
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_lectura_desde_memoria_igual_a_archivo_temporal(processor, tmp_path, max_workers):
+    cargas = _cargas(processor)
+
+    # Flujo original de app.py: cada carga se escribe en un directorio temporal y se lee por ruta
+    rutas = {}
+    for tipo, (nombre, contenido) in cargas.items():
+        rutas[tipo] = str(tmp_path / nombre)
+        with open(rutas[tipo], 'wb') as f:
+            f.write(_ArchivoCargado(contenido, nombre).getbuffer())
+    esperado, _ = processor.read_files_parallel(rutas, max_workers=max_workers, usar_cache=False)
+
+    resultado, _ = processor.read_files_parallel(
+        {tipo: _ArchivoCargado(contenido, nombre) for tipo, (nombre, contenido) in cargas.items()},
+        max_workers=max_workers, usar_cache=False
+    )
+
+    assert set(resultado) == set(esperado)
+    for tipo in cargas:
+        assert len(esperado[tipo]) > 0
+        pd.testing.assert_frame_equal(resultado[tipo], esperado[tipo])
+
+
+def test_lectores_aceptan_cualquier_buffer(processor, tmp_path):
+    nombre, contenido = _cargas(processor)['noova_facturas']
+    ruta = tmp_path / nombre
+    ruta.write_bytes(contenido)
+    esperado = processor.read_noova_file(str(ruta), 'facturas')
+
+    desplazado = _ArchivoCargado(contenido, nombre)
+    desplazado.seek(100)  # un archivo ya leído en parte (ej: tras calcular su hash)
+    for origen in (contenido, bytearray(contenido), memoryview(contenido), desplazado):
+        assert file_processor.detect_excel_format(origen) == 'xlsx'
+        pd.testing.assert_frame_equal(processor.read_noova_file(origen, 'facturas'), esperado)
@@ -0,0 +1,129 @@
+"""Pruebas del índice del Master (NIT, código de desembolso, fechas y facetas)"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import master_original
+from modules.master_store import MasterCache, compact_master_sheets
+
+
+def _hojas_con_fechas(filas: int = 300):
+    """Hojas con varias columnas de fecha: horas, vacíos, fechas en texto y texto"""
+    rng = np.random.default_rng(7)
+
+    def fechas(n, texto=False):
+        valores = (pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 400 * 24, n), unit='h')).to_pydatetime()
+        valores = valores.astype(object)
+        valores[rng.random(n) < 0.2] = None
+        if texto:
+            cambiar = rng.random(n) < 0.15
+            valores[cambiar] = [v.strftime('%Y-%m-%d') if v is not None else 'pendiente' for v in valores[cambiar]]
+            valores[rng.random(n) < 0.05] = 'pendiente'
+        return valores
+
+    return {
+        'Relacion facturas costos fijos': pd.DataFrame({
+            'Codigo del desembolso': [f'CO:{900 + i % 5}:{i}:1:AA' for i in range(filas)],
+            'NIT': [str(900 + i % 5) for i in range(filas)],
+            'Fecha Facturacion': fechas(filas, texto=True),
+            'Fecha de desembolso': fechas(filas),
+        }),
+        'Relacion facturas mandato': pd.DataFrame({
+            'Código del desembolso': [f'CO:{800 + i % 3}:{i}:2:BB' for i in range(filas // 2)],
+            'NIT': [str(800 + i % 3) for i in range(filas // 2)],
+            'Fecha Factura': fechas(filas // 2),
+        }),
+    }
+
+
+def test_cada_hoja_se_indexa_con_su_columna_de_nit():
+    hojas = {
+        'Mandato': pd.DataFrame({
+            'Codigo del desembolso': ['CO:900:1:1:AA', 'CO:800:2:1:BB'],
+            'NIT': ['900', 800.0],
+        }),
+        'Costos fijos': pd.DataFrame({
+            'Codigo del desembolso': ['X-1', 'X-2', 'X-3'],
+            'Nit Cliente': [700, '600', None],
+        }),
+    }
+    version = MasterCache().put('archivo', 't1', hojas)
+    indice = version.indice
+
+    assert version.esquema('Costos fijos').nit == 'Nit Cliente'
+    assert indice.filas_por_nit(['700']).tolist() == [2]
+    assert indice.filas_por_nit(['800']).tolist() == [1]
+    assert indice.nit.tolist()[:4] == ['900', '800', '700', '600']
+    assert pd.isna(indice.nit[4])
+
+    assert indice.facetas_de('Mandato').nits == ('800', '900')
+    assert indice.facetas_de('Costos fijos').nits == ('600', '700')
+    assert indice.facetas_de().nits == ('600', '700', '800', '900')
+
+
+@pytest.mark.filterwarnings('ignore::UserWarning')  # formatos de fecha que infiere el original
+def test_indice_de_fechas_igual_al_filtro_original():
+    hojas = _hojas_con_fechas()
+    version = MasterCache().put('archivo', 't1', compact_master_sheets(hojas)[0])
+    fechas = version.indice.fechas
+
+    rng = np.random.default_rng(11)
+    rangos_fecha = [(date(2023, 1, 1), date(2024, 12, 31)), (date(2023, 6, 1), date(2023, 6, 1)),
+                    (date(2025, 1, 1), date(2025, 2, 1))]
+    for _ in range(15):
+        desde = date(2023, 1, 1) + pd.Timedelta(days=int(rng.integers(0, 400)))
+        rangos_fecha.append((desde, desde + pd.Timedelta(days=int(rng.integers(0, 60)))))
+
+    for hoja in (None, *hojas):
+        seleccion = master_original.seleccion_original(hojas, hoja or master_original.CONSOLIDADO)
+        inicio, fin = version.rangos[hoja] if hoja else (0, len(version.consolidado))
+        filas_hoja = np.arange(inicio, fin)
+
+        minima, maxima = fechas.limites(hoja)
+        assert (minima.date(), maxima.date()) == master_original.limites_fechas_original(seleccion)
+
+        for desde, hasta in rangos_fecha:
+            esperado = master_original.filtrar_original(seleccion, fecha_desde=desde, fecha_hasta=hasta)
+            esperado = (esperado.index.to_numpy() + inicio).tolist()
+
+            desde_ts = pd.to_datetime(desde)
+            hasta_ts = pd.to_datetime(hasta) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+            en_rango = fechas.filas_en_rango(desde_ts, hasta_ts)
+            assert en_rango[(en_rango >= inicio) & (en_rango < fin)].tolist() == esperado
+            assert fechas.filtrar_en_rango(filas_hoja, desde_ts, hasta_ts).tolist() == esperado
+            assert fechas.contar_en_rango(desde_ts, hasta_ts) >= len(esperado)
+
+
+def test_facetas_iguales_a_las_opciones_originales():
+    rng = np.random.default_rng(5)
+    filas = 200
+    nits = np.array(['900', '800', 700.0, ' 600 ', '', None, 900.0, '500'], dtype=object)
+    # Las celdas vacías llegan como NaN (read_excel)
+    codigos = np.array([f'CO:{n}:{i}:1:AA' for i in range(30) for n in (900, 800, 700)] + ['', '  ', np.nan, 12345],
+                       dtype=object)
+    hojas = {
+        'Relacion facturas costos fijos': pd.DataFrame({
+            'Codigo del desembolso': rng.choice(codigos, filas),
+            'NIT': rng.choice(nits, filas),
+            'Valor': np.arange(filas, dtype=float),
+        }),
+        'Relacion facturas mandato': pd.DataFrame({
+            'Código del desembolso': rng.choice(codigos, filas // 2),
+            'NIT': rng.choice(nits, filas // 2),
+        }),
+    }
+    version = MasterCache().put('archivo', 't1', compact_master_sheets(hojas)[0])
+
+    for hoja in (None, *hojas):
+        facetas = version.indice.facetas_de(hoja)
+        seleccion = master_original.seleccion_original(hojas, hoja or master_original.CONSOLIDADO)
+
+        nits_originales, codigos_originales = master_original.opciones_original(seleccion)
+        assert list(facetas.nits) == nits_originales
+        assert list(facetas.codigos) == codigos_originales
+
+        for filtro_nit in (['900'], ['800', '700'], ['600'], ['no existe'], nits_originales):
+            assert facetas.codigos_de(filtro_nit) == master_original.opciones_original(seleccion, filtro_nit)[1]
@@ -0,0 +1,317 @@
+"""Pruebas del almacén del Master (caché de proceso, copia Parquet, compactación)"""
+
+import gc
+import json
+import os
+import weakref
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import file_processor
+from modules.master_query import FiltroMaster, MasterQueryEngine
+from modules.master_store import MasterCache, MasterSidecar, compact_master_sheets, read_master_sheets
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(scope='module')
+def master_config():
+    with open(os.path.join(RAIZ, 'config', 'column_mapping.json'), encoding='utf-8') as f:
+        return json.load(f)['master']
+
+
+def _hojas_master(filas: int = 60):
+    """Hojas del Master como vienen en el .xlsx, con columnas de tipos mezclados"""
+    rng = np.random.default_rng(3)
+    fechas = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 400, filas), unit='D')
+    valores = rng.normal(1e6, 2e5, filas).round(2).astype(object)
+    valores[::7] = 'sin valor'  # 'N/A' ya lo lee pandas como vacío
+
+    costos = pd.DataFrame({
+        'Codigo del desembolso': [f'CO:{900 + i % 4}:{i}:1:AA' for i in range(filas)],
+        'NIT': [str(900 + i % 4) for i in range(filas)],
+        'Cliente': [f'Cliente {i % 4}' for i in range(filas)],
+        'Fecha Facturacion': [f.to_pydatetime() if i % 9 else 'pendiente' for i, f in enumerate(fechas)],
+        '# Factura': [f'FE{i}' for i in range(filas)],
+        'Moneda': np.where(np.arange(filas) % 3, 'COP', 'USD'),
+        'Valor Neto Facturado': valores,
+        'Otros Valor': [1 if i % 5 else 'revisar' for i in range(filas)],
+    })
+    mandato = pd.DataFrame({
+        'Código del desembolso': [f'CO:{800 + i % 3}:{i}:2:BB' for i in range(filas // 2)],
+        'NIT': [str(800 + i % 3) for i in range(filas // 2)],
+        'Fecha Factura': fechas[:filas // 2],
+        'Valor Neto Facturado': rng.normal(5e5, 1e5, filas // 2).round(2),
+    })
+    return {'Relacion facturas costos fijos': costos, 'Relacion facturas mandato': mandato}
+
+
+def _escribir_xlsx(ruta, hojas, header_row: int):
+    with pd.ExcelWriter(ruta, engine='openpyxl') as writer:
+        pd.DataFrame({'x': ['Resumen']}).to_excel(writer, sheet_name='Resumen', index=False)
+        for nombre, df in hojas.items():
+            df.to_excel(writer, sheet_name=nombre, index=False, startrow=header_row)
+
+
+def test_sidecar_igual_al_xlsx_con_columnas_mezcladas(tmp_path, master_config):
+    ruta = tmp_path / 'master.xlsx'
+    _escribir_xlsx(ruta, _hojas_master(), master_config.get('header_row', 2))
+
+    hojas, _ = read_master_sheets(str(ruta), master_config)
+    desde_xlsx, memoria = compact_master_sheets(hojas)
+    assert desde_xlsx['Relacion facturas costos fijos']['Valor Neto Facturado'].map(type).isin([str]).any()
+
+    sidecar = MasterSidecar(str(tmp_path / 'sidecar'))
+    assert sidecar.save('archivo', 't1', desde_xlsx, 'cfg', memoria)
+    desde_parquet, _ = sidecar.load('archivo', 't1', 'cfg')
+
+    assert list(desde_parquet) == list(desde_xlsx)
+    for nombre, df in desde_xlsx.items():
+        pd.testing.assert_frame_equal(desde_parquet[nombre], df.reset_index(drop=True))
+        for columna in df.columns:
+            assert desde_parquet[nombre][columna].map(type).tolist() == df[columna].map(type).tolist(), columna
+
+    # Mismo reporte desde el .xlsx y desde la copia
+    motor = MasterQueryEngine()
+    canonicas = master_config.get('columnas_canonicas', ())
+    version_xlsx = MasterCache().put('archivo', 't1', desde_xlsx, 'cfg', memoria, canonicas)
+    version_parquet = MasterCache().put('archivo', 't1', desde_parquet, 'cfg', memoria, canonicas)
+    for filtro in (FiltroMaster(), FiltroMaster(nits=('901', '801')), FiltroMaster(hoja='Relacion facturas costos fijos')):
+        pd.testing.assert_frame_equal(
+            motor.reporte(version_parquet, motor.ejecutar(version_parquet, filtro)),
+            motor.reporte(version_xlsx, motor.ejecutar(version_xlsx, filtro))
+        )
+
+
+def test_sidecar_conserva_tipos_de_cada_celda(tmp_path):
+    df = pd.DataFrame({
+        'Valor Neto Facturado': pd.Series([1500.5, 'N/A', np.nan, 2, True, None], dtype=object),
+        'Fecha Factura': pd.Series(
+            [datetime(2024, 1, 2, 3, 4, 5), 'pendiente', datetime(2024, 5, 6).date(),
+             pd.Timestamp('2024-07-08'), pd.NaT, None],
+            dtype=object
+        ),
+        'NIT': pd.Series([900, '900A', 900, '900A', np.nan, 900], dtype=object).astype('category'),
+        'Cliente': pd.Series(['a', 'b', None, 'a', 'b', 'a']).astype('category'),
+        'Valor': np.arange(6.0),
+    })
+    sidecar = MasterSidecar(str(tmp_path))
+    assert sidecar.save('archivo', 't1', {'Hoja': df})
+    cargado = sidecar.load('archivo', 't1')[0]['Hoja']
+
+    pd.testing.assert_frame_equal(cargado, df)
+    for columna in df.columns:
+        assert cargado[columna].map(type).tolist() == df[columna].map(type).tolist(), columna
+
+
+def test_sidecar_de_otro_formato_se_ignora(tmp_path):
+    sidecar = MasterSidecar(str(tmp_path))
+    assert sidecar.save('archivo', 't1', {'Hoja': pd.DataFrame({'a': [1, 2]})})
+
+    manifiesto = os.path.join(tmp_path, [f for f in os.listdir(tmp_path) if f.endswith('.json')][0])
+    with open(manifiesto, encoding='utf-8') as f:
+        datos = json.load(f)
+    datos.pop('formato_sidecar')
+    with open(manifiesto, 'w', encoding='utf-8') as f:
+        json.dump(datos, f)
+
+    assert sidecar.load('archivo', 't1') is None
+
+
+def test_compactar_no_pierde_texto_en_columnas_de_fecha():
+    fechas = [datetime(2023, 1, 5), 'pendiente', datetime(2023, 3, 1), np.nan, 'N/D']
+    hoja = pd.DataFrame({
+        'Codigo del desembolso': [f'CO:900:{i}:1:AA' for i in range(5)],
+        'Fecha Facturacion': pd.Series(fechas, dtype=object),
+        'Fecha de desembolso': pd.Series([datetime(2023, 1, 1), np.nan, datetime(2023, 2, 1), np.nan, np.nan],
+                                         dtype=object),
+    })
+    compacta = compact_master_sheets({'Hoja': hoja})[0]['Hoja']
+
+    # Con texto: las celdas quedan como se leyeron
+    pd.testing.assert_series_equal(compacta['Fecha Facturacion'], hoja['Fecha Facturacion'])
+    # Solo fechas: se convierte sin cambiar valores
+    assert pd.api.types.is_datetime64_any_dtype(compacta['Fecha de desembolso'])
+    pd.testing.assert_series_equal(
+        compacta['Fecha de desembolso'], pd.to_datetime(hoja['Fecha de desembolso']), check_dtype=False
+    )
+
+    # El índice de fechas sí encuentra las fechas de la columna con texto
+    version = MasterCache().put('archivo', 't1', {'Hoja': compacta})
+    filas = version.indice.fechas.filas_en_rango(pd.Timestamp('2023-01-04'), pd.Timestamp('2023-03-01'))
+    assert filas.tolist() == [0, 2]
+    reporte = MasterQueryEngine().reporte(version, MasterQueryEngine().ejecutar(version, FiltroMaster()))
+    assert 'pendiente' in reporte['Fecha Factura'].tolist()
+
+
+def test_reporte_combina_columnas_de_fecha_con_texto():
+    filas = 40
+    hoja = pd.DataFrame({
+        'Codigo del desembolso': [f'CO:900:{i}:1:AA' for i in range(filas)],
+        'Fecha Factura': pd.Series([np.nan if i % 2 else 'pendiente' for i in range(filas)], dtype=object),
+        'Fecha Facturacion': pd.Series([datetime(2023, 1, 1 + i % 3) if i % 4 else 'N/D' for i in range(filas)],
+                                       dtype=object),
+    })
+    compacta = compact_master_sheets({'Hoja': hoja})[0]['Hoja']
+    assert compacta['Fecha Factura'].dtype == object
+    assert compacta['Fecha Facturacion'].dtype == object
+
+    version = MasterCache().put('archivo', 't1', {'Hoja': compacta})
+    reporte = MasterQueryEngine().reporte(version, MasterQueryEngine().ejecutar(version, FiltroMaster()))
+    assert reporte['Fecha Factura'].tolist() == hoja['Fecha Factura'].fillna(hoja['Fecha Facturacion']).tolist()
+
+
+def test_escribir_en_el_master_compartido_falla():
+    hojas = {
+        'Mandato': pd.DataFrame({
+            'NIT': ['900', '800'],
+            'Valor Neto Facturado': [10.0, 20.0],
+            'Fecha Factura': pd.to_datetime(['2023-01-05', '2023-02-10']),
+        }),
+    }
+    version = MasterCache().put('archivo', 't1', hojas)
+
+    with pytest.raises(ValueError, match='read-only'):
+        version.consolidado.loc[0, 'Valor Neto Facturado'] = 99.0
+    with pytest.raises(ValueError, match='read-only'):
+        version.hojas['Mandato'].iloc[1, 1] = 99.0
+    with pytest.raises(ValueError, match='read-only'):
+        version.consolidado['Valor Neto Facturado'].to_numpy()[0] = 99.0
+
+    assert version.consolidado['Valor Neto Facturado'].tolist() == [10.0, 20.0]
+    pd.testing.assert_frame_equal(version.hojas['Mandato'][list(hojas['Mandato'])], hojas['Mandato'])
+
+
+def test_cache_retiene_version_anterior_mientras_haya_handles():
+    cache = MasterCache()
+    hojas = {'Mandato': pd.DataFrame({'NIT': ['900'], 'Valor': [1.0]})}
+    assert cache.acquire('archivo') is None
+
+    v1 = cache.put('archivo', 't1', hojas, 'cfg')
+    h1 = cache.acquire('archivo')
+    h1b = cache.acquire('archivo')
+    assert cache.referencias('archivo') == 2
+    assert cache.resolve(h1) is v1
+
+    # Una versión nueva reemplaza a la anterior; la anterior sigue disponible para sus handles
+    v2 = cache.put('archivo', 't2', hojas, 'cfg')
+    assert cache.get('archivo', 't1', 'cfg') is None
+    assert cache.get('archivo', 't2', 'cfg') is v2
+    assert cache.resolve(h1) is v1
+    h2 = cache.acquire('archivo')
+    assert cache.resolve(h2) is v2
+    assert cache.referencias('archivo') == 3
+
+    cache.release(h1)
+    cache.release(h1)  # liberar dos veces no resta dos referencias
+    assert cache.resolve(h1) is v1  # h1b sigue reteniendo la versión t1
+    assert cache.referencias('archivo') == 2
+
+    # Sin handles la versión t1 se descarta de la caché
+    anterior = weakref.ref(v1)
+    del v1
+    cache.release(h1b)
+    assert cache.resolve(h1b) is None
+    assert cache.referencias('archivo') == 1
+    gc.collect()
+    assert anterior() is None
+
+    # Handle descartado sin release (sesión cerrada): se suelta al recolectarlo
+    del h2
+    gc.collect()
+    assert cache.referencias('archivo') == 0
+    assert cache.get_latest('archivo') is v2
+
+
+def test_cache_clear_conserva_versiones_referenciadas():
+    cache = MasterCache()
+    hojas = {'Mandato': pd.DataFrame({'NIT': ['900'], 'Valor': [1.0]})}
+    version = cache.put('archivo', 't1', hojas)
+    handle = cache.acquire('archivo')
+
+    cache.clear()
+    assert cache.get_latest('archivo') is None
+    assert cache.resolve(handle) is version
+
+    anterior = weakref.ref(version)
+    del version
+    cache.release(handle)
+    assert cache.resolve(handle) is None
+    gc.collect()
+    assert anterior() is None
+
+
+@pytest.mark.parametrize('calamine', [False, True])
+def test_leer_master_solo_hojas_y_columnas_usadas(tmp_path, master_config, monkeypatch, calamine):
+    if calamine and not file_processor.CALAMINE_DISPONIBLE:
+        pytest.skip('python-calamine no está instalado')
+    monkeypatch.setattr(file_processor, '_calamine_activo', calamine)
+
+    costos = pd.DataFrame({
+        'Codigo del desembolso': ['CO:900:1:1:AA', 'CO:800:2:1:BB'],
+        'NIT': ['900', '800'],
+        'Mes facturacion': ['ene-23', 'feb-23'],
+        'Fecha Facturacion': [datetime(2023, 1, 5), datetime(2023, 2, 10)],
+        'Validacion Consecutivo': ['ok', 'ok'],
+        'Estado': ['Enviada', 'Enviada'],
+        'Valor Neto Facturado': [1500.5, 2000.0],
+    })
+    ruta = tmp_path / 'master.xlsx'
+    header_row = master_config.get('header_row', 2)
+    with pd.ExcelWriter(ruta, engine='openpyxl') as writer:
+        pd.DataFrame({'x': ['Resumen']}).to_excel(writer, sheet_name='Resumen', index=False)
+        costos.to_excel(writer, sheet_name='Relacion facturas costos fijos', index=False, startrow=header_row)
+        costos.to_excel(writer, sheet_name='Otra hoja', index=False, startrow=header_row)
+
+    with open(ruta, 'rb') as f:
+        hojas, nombres = read_master_sheets(f, master_config)
+
+    assert nombres == ['Resumen', 'Relacion facturas costos fijos', 'Otra hoja']
+    assert list(hojas) == ['Relacion facturas costos fijos']
+
+    # Mismos valores que la lectura original (read_excel con header=2), sin las columnas excluidas
+    original = pd.read_excel(ruta, sheet_name='Relacion facturas costos fijos', header=2, engine='openpyxl')
+    esperado = original.drop(columns=['Mes facturacion', 'Validacion Consecutivo', 'Estado'])
+    # Las columnas de texto se leen como str (el original convertía '900' en número)
+    esperado = esperado.astype({c: str for c in master_config['dtypes'] if c in esperado.columns})
+    pd.testing.assert_frame_equal(hojas['Relacion facturas costos fijos'], esperado, check_dtype=False)
+    assert hojas['Relacion facturas costos fijos']['NIT'].map(type).eq(str).all()
+
+
+def test_hojas_son_rangos_del_consolidado():
+    hojas = {
+        'Mandato': pd.DataFrame({
+            'Codigo del desembolso': ['CO:900:1:1:AA', None, 'CO:800:2:1:BB'],
+            'NIT': ['900', '900', '800'],
+            'Valor Neto Facturado': [10.0, 20.0, 30.0],
+        }),
+        'Costos fijos': pd.DataFrame({
+            'Código del desembolso': ['CO:900:3:1:CC', 'CO:700:4:1:DD'],
+            'NIT': ['900', '700'],
+            'Moneda': ['COP', 'USD'],
+            'Valor Neto Facturado': [1.5, 2.5],
+        }),
+    }
+    version = MasterCache().put('archivo', 't1', hojas, columnas_canonicas=('Codigo del desembolso',))
+    consolidado = version.consolidado
+
+    assert dict(version.rangos) == {'Mandato': (0, 3), 'Costos fijos': (3, 5)}
+    assert version.columnas['Costos fijos'] == ('Codigo del desembolso', 'NIT', 'Moneda', 'Valor Neto Facturado')
+    assert consolidado['Tipo Factura'].tolist() == ['Mandato'] * 3 + ['Costos fijos'] * 2
+
+    for nombre, df in hojas.items():
+        hoja = version.hojas[nombre]
+        inicio, fin = version.rangos[nombre]
+        # La hoja es un rango del consolidado: mismas etiquetas de fila y mismos arreglos
+        assert hoja.index.tolist() == list(range(inicio, fin))
+        assert np.shares_memory(
+            hoja['Valor Neto Facturado'].to_numpy(), consolidado['Valor Neto Facturado'].to_numpy()
+        )
+        # Con sus propias columnas tiene los valores de la hoja original
+        original = df.set_axis(list(version.columnas[nombre]), axis=1)
+        pd.testing.assert_frame_equal(
+            hoja[list(version.columnas[nombre])].reset_index(drop=True), original, check_dtype=False
+        )
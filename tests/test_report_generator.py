@@ -0,0 +1,51 @@
+"""Pruebas del generador de reportes"""
+
+import pandas as pd
+
+import modules.report_generator as report_generator
+from modules.report_generator import build_cached_export, get_cached_export
+
+
+def test_exportacion_se_genera_una_vez_por_huella_y_formato(monkeypatch):
+    df = pd.DataFrame({'NIT': ['900', '800'], 'Valor': [1.5, 2.0]})
+    cache = {}
+
+    llamadas = []
+    build_export = report_generator.build_export
+
+    def contar(*args, **kwargs):
+        llamadas.append(args[1])
+        return build_export(*args, **kwargs)
+
+    monkeypatch.setattr(report_generator, 'build_export', contar)
+
+    assert get_cached_export('filtro-1', 'csv', cache) is None
+    exportado = build_cached_export(df, 'csv', 'filtro-1', cache)
+    assert exportado['extension'] == '.csv'
+    assert build_cached_export(df, 'csv', 'filtro-1', cache) is exportado
+    assert get_cached_export('filtro-1', 'csv', cache) is exportado
+    assert llamadas == ['csv']
+
+    # Otro formato u otro filtro: se genera de nuevo y reemplaza al anterior
+    build_cached_export(df, 'parquet', 'filtro-1', cache)
+    assert get_cached_export('filtro-1', 'csv', cache) is None
+    build_cached_export(df, 'parquet', 'filtro-2', cache)
+    assert llamadas == ['csv', 'parquet', 'parquet']
+
+
+def test_reporte_excel_usa_la_huella_calculada_al_procesar(monkeypatch):
+    datos_por_hoja = {'Relacion facturas costos fijos': pd.DataFrame({'NIT': ['900'], 'Valor': [1.5]})}
+    huella = report_generator.fingerprint_hojas(datos_por_hoja)
+    cache = {}
+
+    def no_recalcular(*args, **kwargs):
+        raise AssertionError('la huella ya se calculó al procesar los archivos')
+
+    monkeypatch.setattr(report_generator, 'fingerprint_hojas', no_recalcular)
+
+    assert report_generator.get_cached_excel_report(huella, cache) is None
+    reporte = report_generator.build_cached_excel_report(datos_por_hoja, huella, cache)
+    assert reporte['fingerprint'] == huella
+    assert report_generator.get_cached_excel_report(huella, cache) is reporte
+    assert report_generator.build_cached_excel_report(datos_por_hoja, huella, cache) is reporte
+    assert report_generator.get_cached_excel_report('otra-huella', cache) is None
@@ -0,0 +1,12 @@
+"""Pruebas de la caché de archivos cargados"""
+
+from modules import upload_cache
+from modules.upload_cache import UploadCache
+
+
+def test_make_key_cambia_con_la_version(monkeypatch):
+    llave = UploadCache.make_key('abc', 'cfg', 'noova_facturas')
+    assert llave == UploadCache.make_key('abc', 'cfg', 'noova_facturas')
+
+    monkeypatch.setattr(upload_cache, 'CACHE_VERSION', upload_cache.CACHE_VERSION + 1)
+    assert UploadCache.make_key('abc', 'cfg', 'noova_facturas') != llave